@@ -0,0 +1,241 @@
+"""
+Content-addressed archive of raw HTTP responses.
+
+With recording enabled every response that goes through the shared HTTP layer
+(forum pages, ContentDB and forge API responses, conf files) is stored in an
+archive directory:
+
+    objects/<aa>/<sha256>.z   zlib-compressed response body, named by the
+                              SHA-256 of the uncompressed body (identical
+                              bodies are stored once)
+    index.db                  SQLite index: method, URL, fetch time, status,
+                              headers, elapsed time and body hash
+
+Replay mode answers requests from the archive and never touches the network;
+URLs that were not archived fail with a ConnectionError. By default every
+request gets the most recent fetch of its URL (the reprocess command uses this
+to re-run extraction and parsing on old data); ordered replay hands out the
+fetches of a URL in recording order instead (see replay.py).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import http_client
+
+INDEX_NAME = "index.db"
+OBJECTS_DIR = "objects"
+COMPRESSION_LEVEL = 6
+# Response headers that describe the transfer rather than the stored body
+_TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+_directory = None
+_replay_directory = None
+_replay_ordered = False
+_replay_latency = False
+_replay_lock = threading.Lock()
+# Ordered replay: recorded entries and the next position per (method, URL)
+_replay_entries = {}
+_replay_positions = {}
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+def _timestamp():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _connect(directory):
+    conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), timeout=30)
+    with _init_lock:
+        if directory not in _initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    method TEXT,
+                    url TEXT,
+                    status INTEGER,
+                    reason TEXT,
+                    headers TEXT,
+                    content_hash TEXT,
+                    size INTEGER,
+                    elapsed REAL,
+                    fetched_at TIMESTAMP
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_url ON responses (url, method, fetched_at)")
+            conn.commit()
+            _initialized.add(directory)
+    return conn
+
+
+def _object_path(directory, content_hash):
+    return os.path.join(directory, OBJECTS_DIR, content_hash[:2], f"{content_hash}.z")
+
+
+def store(directory, method, url, status, reason, headers, body, elapsed=0.0, fetched_at=None):
+    """Store a response body (once per content) and index it; returns the body hash"""
+    content_hash = hashlib.sha256(body).hexdigest()
+    path = _object_path(directory, content_hash)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(body, COMPRESSION_LEVEL))
+        os.replace(tmp_path, path)
+    headers = {key: value for key, value in headers.items() if key.lower() not in _TRANSFER_HEADERS}
+    conn = _connect(directory)
+    conn.execute("""
+        INSERT INTO responses (method, url, status, reason, headers, content_hash, size, elapsed, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (method, url, status, reason, json.dumps(headers), content_hash, len(body), elapsed,
+          fetched_at or _timestamp()))
+    conn.commit()
+    conn.close()
+    return content_hash
+
+
+def read_body(directory, content_hash):
+    """Return the uncompressed body stored under `content_hash`"""
+    with open(_object_path(directory, content_hash), "rb") as f:
+        return zlib.decompress(f.read())
+
+
+def lookup(directory, url, method="GET", as_of=None):
+    """
+    Return the index entry (dict) of the most recent fetch of `url`, or of the
+    most recent one at or before `as_of` ("YYYY-MM-DD HH:MM:SS"); None if the
+    URL was never archived.
+    """
+    query = "SELECT * FROM responses WHERE url=? AND method=?"
+    params = [url, method]
+    if as_of:
+        query += " AND fetched_at <= ?"
+        params.append(as_of)
+    conn = _connect(directory)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute(query + " ORDER BY fetched_at DESC, id DESC LIMIT 1", params).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    entry = dict(row)
+    entry["headers"] = json.loads(entry["headers"])
+    return entry
+
+
+def recorded_entries(directory, url, method="GET"):
+    """All index entries of `url` in recording order"""
+    conn = _connect(directory)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM responses WHERE url=? AND method=? ORDER BY id",
+                        (url, method)).fetchall()
+    conn.close()
+    entries = [dict(row) for row in rows]
+    for entry in entries:
+        entry["headers"] = json.loads(entry["headers"])
+    return entries
+
+
+def archived_urls(directory, like="%"):
+    """Distinct archived GET URLs matching a SQL LIKE pattern"""
+    conn = _connect(directory)
+    urls = [row[0] for row in conn.execute(
+        "SELECT DISTINCT url FROM responses WHERE method='GET' AND url LIKE ? ORDER BY url", (like,))]
+    conn.close()
+    return urls
+
+
+def build_response(entry, body, request):
+    """Build a requests.Response for an archived entry"""
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.reason = entry["reason"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response.headers["Content-Length"] = str(len(body))
+    response._content = body
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    return response
+
+
+def http_middleware(send, request, **kwargs):
+    """Shared HTTP layer middleware storing every (non-streamed) response in the archive"""
+    response = send(request, **kwargs)
+    if _directory and not kwargs.get("stream"):
+        store(_directory, request.method, request.url, response.status_code, response.reason,
+              response.headers, response.content, response.elapsed.total_seconds())
+    return response
+
+
+def _replay_entry(method, url):
+    """The archived entry answering a replayed request, or None"""
+    if not _replay_ordered:
+        return lookup(_replay_directory, url, method)
+    key = (method, url)
+    with _replay_lock:
+        if key not in _replay_entries:
+            _replay_entries[key] = recorded_entries(_replay_directory, url, method)
+        entries = _replay_entries[key]
+        if not entries:
+            return None
+        position = _replay_positions.get(key, 0)
+        _replay_positions[key] = position + 1
+        return entries[min(position, len(entries) - 1)]
+
+
+def replay_middleware(send, request, **kwargs):
+    """Shared HTTP layer middleware answering requests from the archive, without network access"""
+    entry = _replay_entry(request.method, request.url)
+    if entry is None:
+        raise requests.exceptions.ConnectionError(f"Not in archive: {request.method} {request.url}",
+                                                  request=request)
+    if _replay_latency and entry["elapsed"]:
+        time.sleep(entry["elapsed"])
+    return build_response(entry, read_body(_replay_directory, entry["content_hash"]), request)
+
+
+def enable(directory):
+    """Archive all responses in `directory` from now on"""
+    global _directory
+    os.makedirs(directory, exist_ok=True)
+    _connect(directory).close()
+    _directory = directory
+    http_client.add_middleware(http_middleware)
+
+
+def enable_replay(directory, ordered=False, latency=False):
+    """
+    Answer all requests from the archive in `directory` (no network access).
+    With ordered=True the n-th request for a URL gets its n-th fetch (further
+    requests the last one) instead of the most recent fetch; with latency=True
+    every response is delayed by the time its fetch took.
+    """
+    global _replay_directory, _replay_ordered, _replay_latency
+    if not os.path.exists(os.path.join(directory, INDEX_NAME)):
+        raise FileNotFoundError(f"No archive in {directory}")
+    with _replay_lock:
+        _replay_directory = directory
+        _replay_ordered = ordered
+        _replay_latency = latency
+        _replay_entries.clear()
+        _replay_positions.clear()
+    http_client.add_middleware(replay_middleware)
+
+
+def disable():
+    """Stop recording and replaying"""
+    global _directory, _replay_directory
+    http_client.remove_middleware(http_middleware)
+    http_client.remove_middleware(replay_middleware)
+    _directory = None
+    _replay_directory = None
@@ -0,0 +1,4 @@
+"""
+Offline benchmarks: local stand-ins for the forum, ContentDB and git forges
+(standins.py) and the end-to-end crawl benchmark (crawl_benchmark.py).
+"""
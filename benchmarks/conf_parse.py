@@ -0,0 +1,132 @@
+"""
+Benchmark for the Luanti conf parser (luanti_conf.parse_conf).
+
+Parses a corpus of conf files and reports throughput and per-file latency:
+the *.conf files below a directory (e.g. a checkout of many mods), the conf
+files stored in a response archive (archive.py), or a synthetic corpus of
+realistic mod, modpack and game confs:
+
+    python -m benchmarks.conf_parse --count 5000
+    python -m benchmarks.conf_parse --dir ~/.minetest/mods --repeat 5
+    python -m benchmarks.conf_parse --archive archive/ --output conf.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive
+from benchmarks.stats import summarize
+from luanti_conf import parse_conf
+
+DEFAULT_COUNT = 5000
+CONF_KINDS = {"mod.conf": "mod", "modpack.conf": "modpack", "game.conf": "game"}
+WORDS = ["mobs", "farming", "mesecons", "technic", "pipeworks", "unified", "inventory", "doors",
+         "biome", "lib", "api", "nether", "skins", "armor", "moreores", "boats", "carts", "xdecor",
+         "default", "basic_materials", "digilines", "homedecor", "ethereal", "hunger", "3d_armor"]
+
+
+def synthetic_conf(rng, kind):
+    """A conf file of the given kind in one of the styles found in the wild"""
+    name = "_".join(rng.sample(WORDS, rng.randint(1, 2)))
+    lines = []
+    if rng.random() < 0.3:
+        lines.append(f"# {kind} configuration")
+    lines.append(f"name = {name}")
+    if rng.random() < 0.6:
+        lines.append(f"title = {name.replace('_', ' ').title()}")
+    description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 30)))
+    style = rng.random()
+    if style < 0.15:
+        lines += ['description = """', description, "", "# not a comment", description, '"""']
+    elif style < 0.35:
+        lines.append(f'description = "{description} \\"quoted\\"\\nsecond line"')
+    else:
+        lines.append(f"description = {description}")
+    lines.append(f"author = {rng.choice(WORDS)}")
+    if kind == "mod":
+        lines.append(f"depends = {', '.join(rng.sample(WORDS, rng.randint(0, 5)))}")
+        lines.append(f"optional_depends = {', '.join(rng.sample(WORDS, rng.randint(0, 8)))}")
+        if rng.random() < 0.3:
+            lines.append("min_minetest_version = 5.4")
+    if rng.random() < 0.1:
+        lines += ["settings = {", "    enabled = true", "}"]
+    return "\r\n".join(lines) if rng.random() < 0.1 else "\n".join(lines) + "\n"
+
+
+def synthetic_corpus(count, seed=0):
+    rng = random.Random(seed)
+    kinds = ["mod"] * 8 + ["modpack", "game"]
+    return [(kind, synthetic_conf(rng, kind)) for kind in (rng.choice(kinds) for _ in range(count))]
+
+
+def directory_corpus(directory):
+    corpus = []
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            if file_name in CONF_KINDS:
+                with open(os.path.join(root, file_name), encoding="utf-8", errors="replace") as f:
+                    corpus.append((CONF_KINDS[file_name], f.read()))
+    return corpus
+
+
+def archive_corpus(directory):
+    corpus = []
+    for url in archive.archived_urls(directory, "%.conf%"):
+        kind = next((kind for file_name, kind in CONF_KINDS.items() if file_name in url), None)
+        entry = archive.lookup(directory, url)
+        if kind and entry and entry["status"] == 200:
+            corpus.append((kind, archive.read_body(directory, entry["content_hash"]).decode("utf-8", "replace")))
+    return corpus
+
+
+def run(corpus, repeat=1):
+    """Parse the corpus `repeat` times; returns throughput and latency statistics"""
+    durations = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for kind, content in corpus:
+            start = time.perf_counter()
+            parse_conf(content, kind)
+            durations.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    report = summarize(durations)
+    report["files_per_s"] = round(len(durations) / elapsed) if elapsed else None
+    report["bytes"] = sum(len(content) for _, content in corpus) * repeat
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.conf_parse",
+                                     description="Benchmark the Luanti conf parser")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--dir", help="Parse the mod.conf/modpack.conf/game.conf files below this directory")
+    source.add_argument("--archive", metavar="DIR", help="Parse the conf files stored in this response archive")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT,
+                        help=f"Synthetic conf files (default: {DEFAULT_COUNT})")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus (default: 3)")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.dir:
+        corpus = directory_corpus(args.dir)
+    elif args.archive:
+        corpus = archive_corpus(args.archive)
+    else:
+        corpus = synthetic_corpus(args.count)
+    if not corpus:
+        parser.error("No conf files found")
+    report = run(corpus, args.repeat)
+    print(f"{len(corpus)} conf files x {args.repeat}: {report['files_per_s']} files/s, "
+          f"p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Offline end-to-end crawl benchmark.
+
+Runs the whole crawl (ContentDB sync, forum refresh, forum threads, git host
+search, git work queue) against the local stand-ins in benchmarks/standins.py
+with fresh databases in a temporary directory, and reports per phase the
+throughput and the number of HTTP requests (per host), and per stage the item
+latencies. A stored baseline makes regressions visible:
+
+    python -m benchmarks.crawl_benchmark                    # compare to baseline
+    python -m benchmarks.crawl_benchmark --update-baseline  # store a new baseline
+    python -m benchmarks.crawl_benchmark --check            # exit 1 on regressions
+
+Request counts are deterministic for a given dataset, so any increase is
+reported; throughput is compared with a tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+import http_client
+import metrics
+import profiling
+import tracing
+from contentdb.api import sync_contentdb_to_database
+from forum.search import fetch_forum_thread_list, process_forum_work_queue
+from git import canonical
+from git.search import process_git_work_queue, search_all_git_servers
+from benchmarks.standins import Dataset, StandIns, FORUM_URL
+from benchmarks.stats import summarize
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "crawl.json")
+DEFAULT_THREADS = 40
+DEFAULT_PACKAGES = 40
+DEFAULT_LATENCY = 0.005
+# Allowed throughput drop before a phase counts as regressed
+DEFAULT_TOLERANCE = 0.25
+# Phases shorter than this in the baseline are too noisy for a throughput comparison
+MIN_TIMED_SECONDS = 1.0
+BATCH_SIZE = 10
+SEARCH_KEYWORDS = ["bench"]
+_DB_PATH_NAMES = ("DB_PATH", "FORUM_QUEUE_DB", "GIT_QUEUE_DB", "GIT_HOSTS_DB", "NON_MOD_REPOS_DB")
+
+
+def _drain(process_batch):
+    """Process batches until the queue has no due items left; returns the number of items"""
+    def run():
+        processed = 0
+        while True:
+            results = process_batch(BATCH_SIZE)
+            if not results:
+                return processed
+            processed += len(results)
+    return run
+
+
+def _count(result):
+    if isinstance(result, tuple):
+        return sum(result)
+    if isinstance(result, int):
+        return result
+    return len(result)
+
+
+PHASES = [
+    ("contentdb_sync", sync_contentdb_to_database),
+    ("forum_refresh", lambda: fetch_forum_thread_list(FORUM_URL)),
+    ("forum_threads", _drain(process_forum_work_queue)),
+    ("git_search", lambda: search_all_git_servers(SEARCH_KEYWORDS)),
+    ("git_repos", _drain(process_git_work_queue)),
+]
+
+
+@contextlib.contextmanager
+def _temporary_databases():
+    """Point db_utils at fresh databases in a temporary directory"""
+    saved = {name: getattr(db_utils, name) for name in _DB_PATH_NAMES}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in _DB_PATH_NAMES:
+            setattr(db_utils, name, os.path.join(temp_dir, os.path.basename(saved[name])))
+        db_utils.init_all_databases()
+        db_utils.clear_non_mod_repo_cache()
+        canonical._redirect_cache.clear()
+        try:
+            yield
+        finally:
+            for name, path in saved.items():
+                setattr(db_utils, name, path)
+            db_utils.clear_non_mod_repo_cache()
+            canonical._redirect_cache.clear()
+
+
+def _requests_by_host():
+    counts = {}
+    for counter in metrics.snapshot()["counters"]:
+        if counter["name"] == "http_requests_total":
+            host = counter["labels"]["host"]
+            counts[host] = counts.get(host, 0) + counter["value"]
+    return counts
+
+
+def _stage_latencies():
+    durations = {}
+    for event in tracing.events():
+        if event["cat"] == "stage":
+            durations.setdefault(event["name"], []).append(event["dur"] / 1000.0)
+    return {name: summarize(values) for name, values in sorted(durations.items())}
+
+
+def run_benchmark(threads=DEFAULT_THREADS, packages=DEFAULT_PACKAGES, latency=DEFAULT_LATENCY,
+                  rate_limit=None, verbose=False):
+    """Run the crawl against the stand-ins and return the report dict"""
+    dataset = Dataset(threads=threads, packages=packages)
+    report = {
+        "config": {"threads": threads, "packages": packages, "latency": latency,
+                   "rate_limit": rate_limit},
+        "phases": {},
+    }
+    metrics.reset()
+    metrics.install()
+    tracing.disable()
+    tracing.enable()
+    try:
+        with _temporary_databases(), StandIns(dataset, latency=latency, rate_limit=rate_limit) as standins:
+            started = time.perf_counter()
+            for name, phase in PHASES:
+                before = _requests_by_host()
+                phase_start = time.perf_counter()
+                with tracing.span(name, "phase"):
+                    if verbose:
+                        result = phase()
+                    else:
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            result = phase()
+                seconds = time.perf_counter() - phase_start
+                after = _requests_by_host()
+                by_host = {host: count - before.get(host, 0) for host, count in sorted(after.items())
+                           if count - before.get(host, 0)}
+                items = _count(result)
+                report["phases"][name] = {
+                    "items": items,
+                    "seconds": round(seconds, 4),
+                    "items_per_second": round(items / seconds, 2) if seconds else 0.0,
+                    "requests": sum(by_host.values()),
+                    "requests_by_host": by_host,
+                }
+            total_seconds = time.perf_counter() - started
+            conn = sqlite3.connect(db_utils.DB_PATH)
+            results = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            conn.close()
+            report["stages"] = _stage_latencies()
+            report["totals"] = {
+                "seconds": round(total_seconds, 4),
+                "requests": sum(phase["requests"] for phase in report["phases"].values()),
+                "rate_limited": sum(server.rate_limited_count for server in standins.servers.values()),
+                "results": results,
+            }
+    finally:
+        tracing.disable()
+        http_client.remove_middleware(metrics.http_middleware)
+    return report
+
+
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return a list of regression messages: more requests than the baseline in
+    any phase, a different number of items, or throughput below
+    (1 - tolerance) of the baseline in phases that ran long enough to time.
+    """
+    if baseline.get("config") != report["config"]:
+        return [f"Baseline was recorded with a different configuration: {baseline.get('config')}"]
+    regressions = []
+    for name, phase in report["phases"].items():
+        expected = baseline["phases"].get(name)
+        if expected is None:
+            continue
+        if phase["requests"] > expected["requests"]:
+            regressions.append(f"{name}: {phase['requests']} requests (baseline {expected['requests']})")
+        if phase["items"] != expected["items"]:
+            regressions.append(f"{name}: {phase['items']} items (baseline {expected['items']})")
+        minimum = expected["items_per_second"] * (1 - tolerance)
+        if expected["seconds"] >= MIN_TIMED_SECONDS and phase["items_per_second"] < minimum:
+            regressions.append(f"{name}: {phase['items_per_second']} items/s "
+                               f"(baseline {expected['items_per_second']}, minimum {minimum:.2f})")
+    return regressions
+
+
+def format_report(report, baseline=None):
+    lines = [f"{'phase':<16}{'items':>7}{'seconds':>10}{'items/s':>10}{'requests':>10}{'baseline/s':>12}"]
+    for name, phase in report["phases"].items():
+        expected = (baseline or {}).get("phases", {}).get(name, {}).get("items_per_second", "")
+        lines.append(f"{name:<16}{phase['items']:>7}{phase['seconds']:>10.3f}"
+                     f"{phase['items_per_second']:>10.2f}{phase['requests']:>10}{expected:>12}")
+    lines.append("")
+    lines.append(f"{'stage':<16}{'items':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, stage in report["stages"].items():
+        lines.append(f"{name:<16}{stage['items']:>7}{stage['mean_ms']:>10.2f}{stage['p50_ms']:>10.2f}"
+                     f"{stage['p95_ms']:>10.2f}{stage['max_ms']:>10.2f}")
+    totals = report["totals"]
+    lines.append("")
+    lines.append(f"Total: {totals['seconds']:.2f}s, {totals['requests']} requests "
+                 f"({totals['rate_limited']} rate limited), {totals['results']} results")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline crawl benchmark against local stand-in servers")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Number of forum threads")
+    parser.add_argument("--packages", type=int, default=DEFAULT_PACKAGES, help="Number of ContentDB packages")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help=f"Seconds added to every stand-in response (default: {DEFAULT_LATENCY})")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Requests per second allowed per stand-in server (default: unlimited)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if a regression is found")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed relative throughput drop (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show the crawler's output")
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    with profiling.profile(args.profile, args.profile_output):
+        report = run_benchmark(args.threads, args.packages, args.latency, args.rate_limit, args.verbose)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    regressions = compare_to_baseline(report, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1 if args.check else 0
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Synthetic load generator and benchmark for db_utils.
+
+Fills the results, forum queue, git queue and non-mod databases with realistic
+synthetic data at a configurable scale (queue states, priorities, backoff and
+recrawl timestamps, URLs spread over forges and self-hosted instances), then
+times the db_utils operations the crawler calls per item:
+
+    enqueue       add_forum_thread_to_queue, add_to_git_queue
+    dedup lookup  forum_thread_in_queue, forum_url_exists, contentdb_url_exists,
+                  is_git_repo_in_queue, is_known_non_mod_repo (database, no cache)
+    claim         get_unprocessed_forum_threads, get_due_git_queue_items
+    mark          mark_forum_thread_processed, mark_git_queue_item_processed
+    status        get_forum_queue_status, get_git_queue_status, get_mod_count
+    search        search_results (one or two words, prefix match)
+
+and reports latency percentiles per operation:
+
+    python -m benchmarks.db_load --scale 1000000 --dir /tmp/load --output load.json
+    python -m benchmarks.db_load --dir /tmp/load --no-generate --compare load.json
+
+Lookups use existing and new keys in equal parts.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+from retry_policy import MAX_ATTEMPTS
+from benchmarks.stats import summarize
+
+DEFAULT_SCALE = 100000
+DEFAULT_OPERATIONS = 1000
+# Status queries scan the tables, they are run this many times less often
+STATUS_DIVISOR = 20
+CLAIM_BATCH = 10
+INSERT_CHUNK = 10000
+
+# (host, share of repositories)
+HOSTS = [
+    ("github.com", 0.70),
+    ("gitlab.com", 0.10),
+    ("codeberg.org", 0.10),
+    ("notabug.org", 0.03),
+    ("git.minetest.land", 0.04),
+    ("git.example.org", 0.03),
+]
+# (queue state, share of items)
+FORUM_STATES = [("done", 0.70), ("pending", 0.20), ("waiting", 0.05), ("dead", 0.05)]
+GIT_STATES = [("done", 0.60), ("pending", 0.30), ("waiting", 0.05), ("dead", 0.05)]
+THREAD_TYPES = [("mod", 0.75), ("modpack", 0.10), ("game", 0.10), ("unknown", 0.05)]
+WORDS = ["mobs", "farming", "mesecons", "technic", "pipeworks", "unified", "inventory", "doors",
+         "biome", "lib", "api", "nether", "skins", "armor", "moreores", "boats", "carts", "xdecor",
+         "homedecor", "basic", "materials", "ethereal", "animal", "tools", "craft", "guide"]
+_DB_PATH_NAMES = ("DB_PATH", "FORUM_QUEUE_DB", "GIT_QUEUE_DB", "GIT_HOSTS_DB", "NON_MOD_REPOS_DB")
+
+
+def use_directory(directory):
+    """Point db_utils at the databases in `directory` and create them if needed"""
+    for name in _DB_PATH_NAMES:
+        setattr(db_utils, name, os.path.join(directory, os.path.basename(getattr(db_utils, name))))
+    db_utils.init_all_databases()
+    db_utils.clear_non_mod_repo_cache()
+
+
+def _choose(rng, weighted):
+    value = rng.random()
+    for choice, share in weighted:
+        value -= share
+        if value < 0:
+            return choice
+    return weighted[-1][0]
+
+
+def repo_url(n):
+    """Canonical URL of the n-th synthetic repository (the same for every run)"""
+    rng = random.Random(n)
+    host = _choose(rng, HOSTS)
+    owner = f"{rng.choice(WORDS)}{n % 9973}"
+    return f"https://{host}/{owner}/{rng.choice(WORDS)}_{rng.choice(WORDS)}_{n}"
+
+
+def forum_url(n):
+    return f"https://forum.luanti.org/viewtopic.php?t={n}"
+
+
+def contentdb_url(n):
+    return f"https://content.luanti.org/packages/author{n % 7919}/package_{n}"
+
+
+def _queue_columns(rng, state):
+    """(processed, attempts, next_attempt_at, error, last_checked, next_check_at) for a state"""
+    if state == "done":
+        checked = -rng.randint(0, 90 * 24 * 3600)
+        return (db_utils.QUEUE_DONE, 0, db_utils.EPOCH_TIMESTAMP, None, db_utils._timestamp(checked),
+                db_utils._timestamp(checked + db_utils.DEFAULT_CHECK_INTERVAL))
+    if state == "waiting":
+        return (db_utils.QUEUE_PENDING, rng.randint(1, 4), db_utils._timestamp(rng.randint(60, 86400)),
+                "HTTP 503", None, db_utils.EPOCH_TIMESTAMP)
+    if state == "dead":
+        return (db_utils.QUEUE_DEAD, MAX_ATTEMPTS, db_utils.EPOCH_TIMESTAMP, "HTTP 404", None,
+                db_utils.EPOCH_TIMESTAMP)
+    return (db_utils.QUEUE_PENDING, 0, db_utils.EPOCH_TIMESTAMP, None, None, db_utils.EPOCH_TIMESTAMP)
+
+
+def _insert(path, sql, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_CHUNK:
+            conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+    conn.commit()
+    conn.close()
+
+
+def generate(scale, seed=0):
+    """
+    Fill the databases with `scale` forum threads and git queue items,
+    scale/2 results and scale/4 non-mod repositories. Returns the row counts.
+    """
+    rng = random.Random(seed)
+
+    def forum_rows():
+        for n in range(scale):
+            kind = _choose(rng, THREAD_TYPES)
+            yield (forum_url(n), f"[{kind.capitalize()}] {rng.choice(WORDS)} {n}", kind,
+                   *_queue_columns(rng, _choose(rng, FORUM_STATES)))
+
+    def git_rows():
+        for n in range(scale):
+            source, priority = rng.choice([("contentdb", db_utils.PRIORITY_CONTENTDB),
+                                           (f"forum:{forum_url(n)}", db_utils.PRIORITY_FORUM),
+                                           ("search:https://github.com", db_utils.PRIORITY_SEARCH)])
+            url = repo_url(n)
+            yield (url, url, source, priority, *_queue_columns(rng, _choose(rng, GIT_STATES)))
+
+    def result_rows():
+        for n in range(0, scale, 2):
+            url = repo_url(n)
+            name = f"{rng.choice(WORDS)}_{n}"
+            yield (contentdb_url(n) if n % 4 == 0 else "", forum_url(n), url, url, name, name,
+                   _choose(rng, THREAD_TYPES), f"author{n % 7919}", f"Synthetic mod {name}", "forum")
+
+    def non_mod_rows():
+        for n in range(scale, scale + scale // 4):
+            url = repo_url(n)
+            reason = rng.choice(list(db_utils.NON_MOD_REASON_TTLS))
+            expires = db_utils._timestamp(rng.randint(-7 * 24 * 3600, db_utils.NON_MOD_REASON_TTLS[reason]))
+            yield (url, url, reason, expires)
+
+    _insert(db_utils.FORUM_QUEUE_DB, """
+        INSERT OR IGNORE INTO forum_threads (forum_url, title, type, processed, attempts,
+            next_attempt_at, error, last_checked, next_check_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, forum_rows())
+    _insert(db_utils.GIT_QUEUE_DB, """
+        INSERT OR IGNORE INTO git_work_queue (url, canonical_url, source, priority, processed, attempts,
+            next_attempt_at, error, last_checked, next_check_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, git_rows())
+    _insert(db_utils.DB_PATH, """
+        INSERT OR IGNORE INTO results (contentdb_url, forum_url, repo_url, canonical_url, name, title,
+            type, author, description, source)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, result_rows())
+    _insert(db_utils.NON_MOD_REPOS_DB, """
+        INSERT OR IGNORE INTO non_mod_repos (repo_url, canonical_url, reason, expires_at)
+        VALUES (?, ?, ?, ?)
+    """, non_mod_rows())
+    return {
+        "forum_threads": _count(db_utils.FORUM_QUEUE_DB, "forum_threads"),
+        "git_work_queue": _count(db_utils.GIT_QUEUE_DB, "git_work_queue"),
+        "results": _count(db_utils.DB_PATH, "results"),
+        "non_mod_repos": _count(db_utils.NON_MOD_REPOS_DB, "non_mod_repos"),
+    }
+
+
+def _count(path, table):
+    conn = sqlite3.connect(path)
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def _time(durations, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    durations.append((time.perf_counter() - start) * 1000.0)
+    return result
+
+
+def run_operations(scale, operations=DEFAULT_OPERATIONS, seed=1):
+    """Time each db_utils operation `operations` times; returns {operation: latency summary}"""
+    rng = random.Random(seed)
+    timings = {}
+
+    def timed(name):
+        return timings.setdefault(name, [])
+
+    def existing_or_new(first, count):
+        # Half of the lookups hit existing rows (numbered first..first+count), half miss
+        if rng.random() < 0.5:
+            return first + rng.randrange(max(1, count))
+        return scale * 2 + rng.randrange(scale)
+
+    new_key = scale * 10
+    for _ in range(operations):
+        new_key += 1
+        _time(timed("enqueue_forum_thread"), db_utils.add_forum_thread_to_queue,
+              forum_url(new_key), f"[Mod] load {new_key}", "mod")
+        _time(timed("enqueue_git_repo"), db_utils.add_to_git_queue, repo_url(new_key), "contentdb")
+
+        n = existing_or_new(0, scale)
+        _time(timed("dedup_forum_thread"), db_utils.forum_thread_in_queue, forum_url(n))
+        _time(timed("dedup_forum_result"), db_utils.forum_url_exists, forum_url(n))
+        _time(timed("dedup_contentdb_result"), db_utils.contentdb_url_exists, contentdb_url(n))
+        _time(timed("dedup_git_repo"), db_utils.is_git_repo_in_queue, repo_url(n))
+        n = existing_or_new(scale, scale // 4)
+        _time(timed("dedup_non_mod_repo"), db_utils.is_known_non_mod_repo, repo_url(n))
+
+    for _ in range(max(1, operations // CLAIM_BATCH)):
+        threads = _time(timed("claim_forum_threads"), db_utils.get_unprocessed_forum_threads, CLAIM_BATCH)
+        for thread in threads:
+            _time(timed("mark_forum_thread_processed"), db_utils.mark_forum_thread_processed, thread[0], "x")
+        items = _time(timed("claim_git_items"), db_utils.get_due_git_queue_items, CLAIM_BATCH)
+        for item in items:
+            _time(timed("mark_git_item_processed"), db_utils.mark_git_queue_item_processed, item[0], "x")
+
+    for _ in range(max(1, operations // STATUS_DIVISOR)):
+        _time(timed("status_forum_queue"), db_utils.get_forum_queue_status)
+        _time(timed("status_git_queue"), db_utils.get_git_queue_status)
+        _time(timed("status_mod_count"), db_utils.get_mod_count)
+
+    for _ in range(operations):
+        words = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+        _time(timed("search_results"), db_utils.search_results, words[:rng.randint(3, len(words))])
+
+    return {name: summarize(values) for name, values in timings.items()}
+
+
+def format_report(report, previous=None):
+    lines = [f"{'operation':<28}{'items':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+             f"{'p99 ms':>10}{'max ms':>10}" + ("  p95 vs previous" if previous else "")]
+    for name, stats in report["operations"].items():
+        line = (f"{name:<28}{stats['items']:>7}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}"
+                f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+        before = (previous or {}).get("operations", {}).get(name)
+        if before and before.get("p95_ms"):
+            line += f"  {stats['p95_ms'] / before['p95_ms']:>8.2f}x"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic load benchmark for the queue and results databases")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE,
+                        help=f"Forum threads and git repositories to generate (default: {DEFAULT_SCALE})")
+    parser.add_argument("--operations", type=int, default=DEFAULT_OPERATIONS,
+                        help=f"Timed calls per operation (default: {DEFAULT_OPERATIONS})")
+    parser.add_argument("--dir", help="Directory for the databases (default: a temporary directory)")
+    parser.add_argument("--no-generate", action="store_true",
+                        help="Benchmark the existing databases in --dir without adding data")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated data")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--compare", help="Previous JSON report to compare p95 latencies with")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = args.dir or temp_dir
+        os.makedirs(directory, exist_ok=True)
+        use_directory(directory)
+        report = {"config": {"scale": args.scale, "operations": args.operations, "seed": args.seed}}
+        if not args.no_generate:
+            start = time.perf_counter()
+            report["rows"] = generate(args.scale, args.seed)
+            report["generate_seconds"] = round(time.perf_counter() - start, 2)
+            print(f"Generated {report['rows']} in {report['generate_seconds']}s")
+        report["operations"] = run_operations(args.scale, args.operations, args.seed)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print(format_report(report, previous))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,517 @@
+"""
+Local stand-ins for the services the crawler talks to.
+
+One threaded HTTP server per service, all serving the same synthetic dataset:
+
+    forum     phpBB-like forum; pages are rendered from the saved pages in
+              forum_example/ with generated topics and first posts
+    contentdb ContentDB-like /api/packages/ endpoints
+    github    GitHub-like REST API (api.github.com) and repository pages
+    gitlab    GitLab-like /api/v4 API and /-/manifest.json
+    gitea     Gitea-like /api/v1 API and a "Powered by Gitea" front page
+
+Every server can add a fixed latency per request and enforce a rate limit
+(requests per second, answered with 429 and Retry-After when exceeded).
+route_middleware() sends the real host names (github.com, forum.luanti.org,
+...) to the stand-ins through the shared HTTP layer, so the crawler runs
+unmodified and no request leaves the machine.
+"""
+import base64
+import copy
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, urlunparse, parse_qs, unquote
+
+import requests
+from bs4 import BeautifulSoup
+
+import http_client
+
+FORUM_EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "forum_example")
+FORUM_LIST_TEMPLATE = "Mod Releases - Luanti Forums.html"
+FORUM_THREAD_TEMPLATE = "[Mod] Mobs Redo [1.62] [mobs] - Luanti Forums.html"
+_PLACEHOLDER = "@@STANDIN_CONTENT@@"
+_NEXT_PLACEHOLDER = "@@STANDIN_NEXT@@"
+# Topics per forum section page, as on the real forum
+FORUM_PAGE_SIZE = 30
+
+FORUM_HOST = "forum.luanti.org"
+FORUM_URL = f"https://{FORUM_HOST}/viewforum.php?f=11"
+FORGES = [("github", "github.com"), ("gitlab", "gitlab.com"), ("gitea", "codeberg.org")]
+# Links in first posts that are not repositories
+OTHER_HOST = "example.com"
+
+CONF_FILES = {"mod": "mod.conf", "modpack": "modpack.conf", "game": "game.conf"}
+TITLE_PREFIXES = {"mod": "[Mod]", "modpack": "[Modpack]", "game": "[Game]"}
+
+
+class Dataset:
+    """
+    Deterministic synthetic data: forum threads linking repositories on the
+    three forges, ContentDB packages (half of them pointing at repositories
+    that are also linked from the forum) and some repositories without conf
+    files.
+    """
+
+    def __init__(self, threads=40, packages=40, non_mods_every=5):
+        self.repos = {}  # (host, "owner/name") -> {"type", "files", "id"}
+        self.threads = []
+        self.packages = []
+        kinds = list(CONF_FILES)
+        for i in range(threads):
+            kind = kinds[i % len(kinds)]
+            links = [self._add_repo(i, f"{kind}_{i}", kind),
+                     f"https://{OTHER_HOST}/screenshots/{i}.png"]
+            if non_mods_every and i % non_mods_every == 0:
+                links.append(self._add_repo(i + 1, f"tools_{i}", None))
+            self.threads.append({"id": i + 1, "title": f"{TITLE_PREFIXES[kind]} Bench {kind} {i} [{kind}_{i}]",
+                                 "links": links})
+        for i in range(packages):
+            if i % 2 == 0 and i < threads:
+                repo_url = self.threads[i]["links"][0]
+            else:
+                repo_url = self._add_repo(i, f"cdb_{i}", "mod")
+            self.packages.append({"author": "bench", "name": f"cdb_{i}", "type": "mod",
+                                  "title": f"Bench package {i}", "repo": repo_url,
+                                  "short_description": f"Benchmark package {i}"})
+
+    def _add_repo(self, index, name, kind):
+        forge, host = FORGES[index % len(FORGES)]
+        files = {}
+        if kind:
+            files[CONF_FILES[kind]] = (f"name = {name}\ntitle = Bench {name}\n"
+                                       f"description = Synthetic {kind} {name}\n"
+                                       f"author = bench\ndepends = default\n")
+        # Modpacks and games contain two mods, one of them without mod.conf
+        if kind in ("modpack", "game"):
+            prefix = "mods/" if kind == "game" else ""
+            files[f"{prefix}{name}_core/mod.conf"] = f"name = {name}_core\ndepends = default\n"
+            files[f"{prefix}{name}_core/init.lua"] = ""
+            files[f"{prefix}{name}_extra/init.lua"] = ""
+        self.repos[(host, f"bench/{name}")] = {"type": kind, "files": files,
+                                               "id": len(self.repos) + 1}
+        return f"https://{host}/bench/{name}"
+
+    def repo(self, host, path):
+        return self.repos.get((host, path))
+
+    def repo_by_id(self, host, repo_id):
+        for (repo_host, path), repo in self.repos.items():
+            if repo_host == host and str(repo["id"]) == repo_id:
+                return path, repo
+        return None, None
+
+    def repos_on(self, host):
+        return [path for repo_host, path in self.repos if repo_host == host]
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second (None = unlimited)"""
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.tokens = rate or 0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, name, host, dataset, handler, latency=0.0, rate_limit=None):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.name = name
+        self.host = host
+        self.dataset = dataset
+        self.latency = latency
+        self.limiter = RateLimiter(rate_limit)
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.count_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05},
+                                       name=f"standin-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head):
+        server = self.server
+        with server.count_lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if not server.limiter.allow():
+            with server.count_lock:
+                server.rate_limited_count += 1
+            self._send(429, {"message": "rate limit exceeded"}, headers={"Retry-After": "1"}, head=head)
+            return
+        parsed = urlparse(self.path)
+        status, body = self.route(parsed.path, parse_qs(parsed.query))
+        self._send(status, body, head=head)
+
+    def route(self, path, query):
+        """Return (status, body) for a GET request; str bodies are HTML, others JSON"""
+        return 404, {"message": "Not Found"}
+
+    def _send(self, status, body, headers=None, head=False):
+        if isinstance(body, str):
+            data, content_type = body.encode("utf-8"), "text/html; charset=utf-8"
+        else:
+            data, content_type = json.dumps(body).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+
+
+def _load_template(file_name, prepare):
+    """Parse a saved forum page, let `prepare` insert the placeholder, return (head, tail)"""
+    with open(os.path.join(FORUM_EXAMPLE_DIR, file_name), encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    prepare(soup)
+    head, tail = str(soup).split(_PLACEHOLDER)
+    return head, tail
+
+
+def _prepare_list_template(soup):
+    # Drop the announcements and stickies, generated topics go into the last list
+    topic_lists = soup.select("ul.topiclist.topics")
+    for topics in topic_lists:
+        topics.clear()
+    topic_lists[-1].append(_PLACEHOLDER)
+    # The saved page links to its second page; the link is generated per page
+    for next_link in soup.select('a[rel="next"]'):
+        next_link.replace_with(_NEXT_PLACEHOLDER)
+
+
+def _prepare_thread_template(soup):
+    first_post = soup.select_one(".post .content")
+    first_post.clear()
+    first_post.append(_PLACEHOLDER)
+
+
+class ForumHandler(StandInHandler):
+    templates = {}
+
+    @classmethod
+    def template(cls, name):
+        if name not in cls.templates:
+            if name == "list":
+                cls.templates[name] = _load_template(FORUM_LIST_TEMPLATE, _prepare_list_template)
+            else:
+                cls.templates[name] = _load_template(FORUM_THREAD_TEMPLATE, _prepare_thread_template)
+        return cls.templates[name]
+
+    def route(self, path, query):
+        dataset = self.server.dataset
+        if path == "/viewforum.php":
+            start = int(query.get("start", ["0"])[0])
+            threads = dataset.threads[start:start + FORUM_PAGE_SIZE]
+            rows = "".join(
+                f'<li class="row bg{thread["id"] % 2 + 1}"><dl class="row-item topic_read"><dt>'
+                f'<div class="list-inner"><a href="./viewtopic.php?t={thread["id"]}" '
+                f'class="topictitle">{thread["title"]}</a></div></dt></dl></li>'
+                for thread in threads)
+            next_link = ""
+            if start + FORUM_PAGE_SIZE < len(dataset.threads):
+                next_link = (f'<a class="button button-icon-only" href="./viewforum.php?'
+                             f'f={query.get("f", ["11"])[0]}&amp;start={start + FORUM_PAGE_SIZE}" rel="next" '
+                             f'role="button">Next</a>')
+            head, tail = self.template("list")
+            return 200, (head + rows + tail).replace(_NEXT_PLACEHOLDER, next_link)
+        if path == "/viewtopic.php":
+            thread_id = int(query.get("t", ["0"])[0])
+            for thread in dataset.threads:
+                if thread["id"] == thread_id:
+                    links = "<br>".join(f'<a href="{link}" class="postlink">{link}</a>'
+                                        for link in thread["links"])
+                    head, tail = self.template("thread")
+                    return 200, f"{head}{thread['title']}<br>{links}{tail}"
+        if path == "/":
+            return 200, "<html><body>Luanti Forums</body></html>"
+        return 404, "<html><body>Not Found</body></html>"
+
+
+class ContentDBHandler(StandInHandler):
+    def route(self, path, query):
+        packages = self.server.dataset.packages
+        if path == "/api/packages/":
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("per_page", ["50"])[0])
+            listing = [{key: package[key] for key in ("author", "name", "type", "title", "short_description")}
+                       for package in packages]
+            return 200, listing[(page - 1) * per_page:page * per_page]
+        parts = _segments(path)
+        if len(parts) == 4 and parts[:2] == ["api", "packages"]:
+            for package in packages:
+                if package["author"] == parts[2] and package["name"] == parts[3]:
+                    return 200, dict(package, license="MIT", media_license="CC-BY-SA-4.0",
+                                     tags=[], downloads=0, score=0.0)
+        return 404, {"message": "Not Found"}
+
+
+def _segments(path):
+    """Decoded path segments; "%2F" inside a segment (GitLab project paths) stays one segment"""
+    return [unquote(segment) for segment in path.strip("/").split("/")]
+
+
+def _encoded(content):
+    return base64.b64encode(content.encode("utf-8")).decode("ascii")
+
+
+class GitHubHandler(StandInHandler):
+    """Serves both api.github.com (/repos, /search) and github.com repository pages"""
+
+    def route(self, path, query):
+        dataset = self.server.dataset
+        parts = _segments(path)
+        if parts[0] == "search" and parts[1:] == ["repositories"]:
+            keyword = query.get("q", [""])[0]
+            items = [self._repo_json(repo_path) for repo_path in dataset.repos_on("github.com")
+                     if keyword in repo_path]
+            return 200, {"total_count": len(items), "incomplete_results": False, "items": items}
+        if parts[0] == "repos" and len(parts) >= 3:
+            repo_path = "/".join(parts[1:3])
+            repo = dataset.repo("github.com", repo_path)
+            if repo is None:
+                return 404, {"message": "Not Found"}
+            if len(parts) == 3:
+                return 200, self._repo_json(repo_path)
+            if parts[3] == "contents":
+                file_path = "/".join(parts[4:])
+                if file_path not in repo["files"]:
+                    return 404, {"message": "Not Found"}
+                return 200, {"type": "file", "encoding": "base64", "name": file_path, "path": file_path,
+                             "content": _encoded(repo["files"][file_path]), "sha": "0" * 40,
+                             "size": len(repo["files"][file_path]),
+                             "url": f"https://api.github.com/repos/{repo_path}/contents/{file_path}"}
+            if parts[3:5] == ["git", "trees"]:
+                return 200, {"sha": "0" * 40, "url": f"https://api.github.com/repos/{repo_path}/git/trees/main",
+                             "tree": [{"path": file_path, "mode": "100644", "type": "blob", "sha": "0" * 40,
+                                       "size": len(content)} for file_path, content in repo["files"].items()],
+                             "truncated": False}
+            return 404, {"message": "Not Found"}
+        if dataset.repo("github.com", "/".join(parts[:2])) is not None:
+            return 200, "<html><body>GitHub repository</body></html>"
+        return 404, {"message": "Not Found"}
+
+    def _repo_json(self, repo_path):
+        owner, name = repo_path.split("/")
+        repo = self.server.dataset.repo("github.com", repo_path)
+        return {"id": repo["id"], "name": name, "full_name": repo_path, "owner": {"login": owner},
+                "url": f"https://api.github.com/repos/{repo_path}",
+                "html_url": f"https://github.com/{repo_path}",
+                "clone_url": f"https://github.com/{repo_path}.git",
+                "default_branch": "main", "open_issues_count": 0, "forks_count": 0}
+
+
+class GitLabHandler(StandInHandler):
+    def route(self, path, query):
+        dataset = self.server.dataset
+        host = self.server.host
+        if path == "/-/manifest.json":
+            return 200, {"name": "GitLab", "short_name": "GitLab"}
+        parts = _segments(path)
+        if parts[:3] == ["api", "v4", "projects"]:
+            if len(parts) == 3:
+                keyword = query.get("search", [""])[0]
+                return 200, [self._project_json(repo_path) for repo_path in dataset.repos_on(host)
+                             if keyword in repo_path]
+            # Projects are addressed by id or by "owner%2Fname"
+            repo_path, repo = dataset.repo_by_id(host, parts[3])
+            if repo is None:
+                repo_path, repo = parts[3], dataset.repo(host, parts[3])
+            if repo is None:
+                return 404, {"message": "404 Project Not Found"}
+            if len(parts) == 4:
+                return 200, self._project_json(repo_path)
+            if parts[4:6] == ["repository", "files"]:
+                file_path = "/".join(parts[6:])
+                if file_path not in repo["files"]:
+                    return 404, {"message": "404 File Not Found"}
+                return 200, {"file_name": file_path, "file_path": file_path, "encoding": "base64",
+                             "content": _encoded(repo["files"][file_path]), "ref": "main"}
+            if parts[4:6] == ["repository", "tree"]:
+                return 200, [{"id": "0" * 40, "name": file_path.split("/")[-1], "type": "blob",
+                              "path": file_path, "mode": "100644"} for file_path in repo["files"]]
+            return 404, {"message": "404 Not Found"}
+        if dataset.repo(host, "/".join(parts[:2])) is not None:
+            return 200, "<html><body>GitLab project</body></html>"
+        return 404, {"message": "404 Not Found"}
+
+    def _project_json(self, repo_path):
+        repo = self.server.dataset.repo(self.server.host, repo_path)
+        host = self.server.host
+        return {"id": repo["id"], "path_with_namespace": repo_path, "default_branch": "main",
+                "web_url": f"https://{host}/{repo_path}",
+                "http_url_to_repo": f"https://{host}/{repo_path}.git",
+                "open_issues_count": 0, "forks_count": 0}
+
+
+class GiteaHandler(StandInHandler):
+    def route(self, path, query):
+        dataset = self.server.dataset
+        host = self.server.host
+        if path == "/":
+            return 200, "<html><body><footer>Powered by Gitea</footer></body></html>"
+        parts = _segments(path)
+        if parts[:3] == ["api", "v1", "repos"]:
+            if parts[3:] == ["search"]:
+                keyword = query.get("q", [""])[0]
+                return 200, {"ok": True, "data": [self._repo_json(repo_path) for repo_path
+                                                  in dataset.repos_on(host) if keyword in repo_path]}
+            repo_path = "/".join(parts[3:5])
+            repo = dataset.repo(host, repo_path)
+            if repo is None:
+                return 404, {"message": "Not Found"}
+            if len(parts) == 5:
+                return 200, self._repo_json(repo_path)
+            if parts[5] == "contents":
+                file_path = "/".join(parts[6:])
+                if file_path not in repo["files"]:
+                    return 404, {"message": "Not Found"}
+                return 200, {"type": "file", "encoding": "base64", "name": file_path, "path": file_path,
+                             "content": _encoded(repo["files"][file_path])}
+            if parts[5:7] == ["git", "trees"]:
+                return 200, {"sha": "0" * 40, "tree": [{"path": file_path, "type": "blob", "mode": "100644"}
+                                                        for file_path in repo["files"]],
+                             "truncated": False, "page": 1, "total_count": len(repo["files"])}
+            return 404, {"message": "Not Found"}
+        if dataset.repo(host, "/".join(parts[:2])) is not None:
+            return 200, "<html><body>Gitea repository</body></html>"
+        return 404, "<html><body>Not Found</body></html>"
+
+    def _repo_json(self, repo_path):
+        host = self.server.host
+        return {"full_name": repo_path, "html_url": f"https://{host}/{repo_path}",
+                "clone_url": f"https://{host}/{repo_path}.git", "default_branch": "main",
+                "open_issues_count": 0, "forks_count": 0}
+
+
+class OtherHandler(StandInHandler):
+    """Non-forge web sites linked from forum posts"""
+
+    def route(self, path, query):
+        if path == "/":
+            return 200, "<html><body>Some web site</body></html>"
+        return 404, "<html><body>Not Found</body></html>"
+
+
+SERVICES = {
+    # name: (handler, host names routed to it)
+    "forum": (ForumHandler, [FORUM_HOST]),
+    "contentdb": (ContentDBHandler, ["content.minetest.net"]),
+    "github": (GitHubHandler, ["github.com", "api.github.com"]),
+    "gitlab": (GitLabHandler, ["gitlab.com"]),
+    "gitea": (GiteaHandler, ["codeberg.org"]),
+    "other": (OtherHandler, [OTHER_HOST]),
+}
+
+
+class StandIns:
+    """
+    Start all stand-in servers and route their host names to them.
+
+    `latency` and `rate_limit` are either one value for every service or a
+    dict per service name (e.g. {"github": 0.05}). Middlewares that should see
+    the original URLs (metrics, archive) must be added before start().
+    """
+
+    def __init__(self, dataset, latency=0.0, rate_limit=None):
+        self.dataset = dataset
+        self.servers = {}
+        self.routes = {}
+        for name, (handler, hosts) in SERVICES.items():
+            server = StandInServer(name, hosts[0], dataset, handler,
+                                   latency=_per_service(latency, name),
+                                   rate_limit=_per_service(rate_limit, name))
+            self.servers[name] = server
+            for host in hosts:
+                self.routes[host] = server
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        for server in self.servers.values():
+            server.start()
+        http_client.add_middleware(self.route_middleware)
+        return self
+
+    def stop(self):
+        http_client.remove_middleware(self.route_middleware)
+        for server in self.servers.values():
+            server.stop()
+
+    def request_counts(self):
+        return {name: server.request_count for name, server in self.servers.items()}
+
+    def route_middleware(self, send, request, **kwargs):
+        """
+        Shared HTTP layer middleware sending requests for the stand-in hosts to
+        the local servers. Requests for any other host fail so nothing leaves
+        the machine by accident.
+        """
+        parsed = urlparse(request.url)
+        server = self.routes.get(parsed.hostname)
+        if server is None:
+            raise requests.exceptions.ConnectionError(f"No stand-in for host {parsed.hostname}")
+        routed = copy.copy(request)
+        routed.url = urlunparse(parsed._replace(scheme="http", netloc=f"127.0.0.1:{server.server_port}"))
+        response = send(routed, **kwargs)
+        # Callers (redirect resolution, PyGithub) must see the URL they requested
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def _per_service(value, name):
+    if isinstance(value, dict):
+        return value.get(name)
+    return value
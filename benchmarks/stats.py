@@ -0,0 +1,24 @@
+"""
+Latency statistics shared by the benchmarks
+"""
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list (fraction in 0..1)"""
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(durations_ms):
+    """Count, mean, p50/p95/p99 and max of a list of durations in milliseconds"""
+    values = sorted(durations_ms)
+    if not values:
+        return {"items": 0}
+    return {
+        "items": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 0.5), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3),
+    }
@@ -1,5 +1,6 @@
 import requests
 import re
+import sqlite3
 from urllib.parse import urljoin, urlparse
 import sys
 import os
@@ -7,49 +8,61 @@ import os
 # Add parent directory to path to import db_utils
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from db_utils import add_mod_to_db
+from db_utils import (add_mods_to_db, add_to_git_queue, get_checkpoint, clear_checkpoint,
+                      CHECKPOINT_CONTENTDB)
+from retry_policy import is_not_found
 
 # ContentDB API base URL
 CONTENTDB_API_BASE = "https://content.minetest.net/api"
 
-def fetch_all_packages():
-    """Fetch all packages from ContentDB"""
-    packages = []
-    page = 1
-    
+# Packages per listing page
+PAGE_SIZE = 50
+
+def iter_package_pages(start_page=1, per_page=PAGE_SIZE):
+    """
+    Yield (page, packages) for the ContentDB package listing one page at a
+    time, starting at start_page, so callers can process each page as it
+    arrives. The page number is the cursor: after handling page N, start at
+    N + 1 to resume. Request errors are raised to the caller.
+    """
+    page = start_page
     while True:
         print(f"Fetching ContentDB page {page}...")
-        
-        try:
-            response = requests.get(f"{CONTENTDB_API_BASE}/packages/", 
-                                  params={"page": page, "per_page": 50})
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if not data:
-                break
-                
-            packages.extend(data)
-            
-            # If we got less than 50 items, we're on the last page
-            if len(data) < 50:
-                break
-                
-            page += 1
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching ContentDB packages: {e}")
-            break
-    
+        response = requests.get(f"{CONTENTDB_API_BASE}/packages/",
+                                params={"page": page, "per_page": per_page})
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            return
+        yield page, data
+        # A short page is the last one
+        if len(data) < per_page:
+            return
+        page += 1
+
+def iter_packages(start_page=1, per_page=PAGE_SIZE):
+    """Yield the ContentDB packages one by one, fetching a page at a time"""
+    for _, packages in iter_package_pages(start_page, per_page):
+        yield from packages
+
+def fetch_all_packages():
+    """Fetch all packages from ContentDB (up to the first failing page)"""
+    packages = []
+    try:
+        packages.extend(iter_packages())
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching ContentDB packages: {e}")
     return packages
 
+def _fetch_package_details(package_id):
+    response = requests.get(f"{CONTENTDB_API_BASE}/packages/{package_id}/")
+    response.raise_for_status()
+    return response.json()
+
 def get_package_details(package_id):
     """Get detailed information about a specific package"""
     try:
-        response = requests.get(f"{CONTENTDB_API_BASE}/packages/{package_id}/")
-        response.raise_for_status()
-        return response.json()
+        return _fetch_package_details(package_id)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching package details for {package_id}: {e}")
         return None
@@ -68,82 +81,157 @@ def search_packages(query, package_type=None):
         print(f"Error searching ContentDB: {e}")
         return []
 
-def sync_contentdb_to_database():
-    """Sync all ContentDB packages to local database"""
-    print("Starting ContentDB sync...")
-    
-    packages = fetch_all_packages()
-    print(f"Found {len(packages)} packages on ContentDB")
-    
-    added_count = 0
-    updated_count = 0
-    
+def package_record(package):
+    """
+    Fetch the details of a listed package and queue its repository; returns
+    the package's add_mod_to_db arguments (None if the package no longer
+    exists). Other request errors are raised to the caller.
+    """
+    try:
+        package_details = _fetch_package_details(f"{package['author']}/{package['name']}")
+    except requests.exceptions.RequestException as e:
+        if is_not_found(e):
+            return None
+        raise
+    if not package_details:
+        return None
+
+    # Determine package type
+    package_type = package_details.get('type', 'mod')
+
+    # Extract repository URL if available
+    repo_url = None
+    if 'repo' in package_details and package_details['repo']:
+        repo_url = package_details['repo']
+    elif 'website' in package_details and package_details['website']:
+        # Sometimes the website is the repo
+        website = package_details['website']
+        if any(host in website.lower() for host in ['github.com', 'gitlab.com', 'codeberg.org']):
+            repo_url = website
+
+    # Build metadata
+    metadata = {
+        'contentdb_id': package_details.get('name', ''),
+        'contentdb_author': package_details.get('author', ''),
+        'contentdb_url': f"https://content.minetest.net/packages/{package_details.get('author', '')}/{package_details.get('name', '')}",
+        'short_description': package_details.get('short_description', ''),
+        'tags': package_details.get('tags', []),
+        'license': package_details.get('license', ''),
+        'media_license': package_details.get('media_license', ''),
+        'created_at': package_details.get('created_at', ''),
+        'downloads': package_details.get('downloads', 0),
+        'score': package_details.get('score', 0),
+        'reviews': package_details.get('reviews', 0),
+        'min_minetest_version': package_details.get('min_minetest_version', ''),
+        'max_minetest_version': package_details.get('max_minetest_version', ''),
+    }
+
+    if repo_url:
+        metadata['git_url'] = repo_url
+        # ContentDB-linked repos are validated first (PRIORITY_CONTENTDB)
+        add_to_git_queue(repo_url, 'contentdb',
+                         metadata={'contentdb_url': metadata['contentdb_url']})
+
+    return {
+        'name': package_details.get('name', ''),
+        'mod_type': package_type,
+        'author': package_details.get('author', ''),
+        'description': package_details.get('short_description', ''),
+        'source': 'contentdb',
+        'url': f"https://content.minetest.net/packages/{package_details.get('author', '')}/{package_details.get('name', '')}",
+        'metadata': metadata,
+    }
+
+def _package_records(packages):
+    """
+    The add_mod_to_db arguments of listed packages, and the "author/name" ids
+    of the packages whose details could not be fetched or processed
+    """
+    records = []
+    failed = []
     for package in packages:
         try:
-            # Get detailed package info
-            package_details = get_package_details(f"{package['author']}/{package['name']}")
-            
-            if not package_details:
-                continue
-            
-            # Determine package type
-            package_type = package_details.get('type', 'mod')
-            
-            # Extract repository URL if available
-            repo_url = None
-            if 'repo' in package_details and package_details['repo']:
-                repo_url = package_details['repo']
-            elif 'website' in package_details and package_details['website']:
-                # Sometimes the website is the repo
-                website = package_details['website']
-                if any(host in website.lower() for host in ['github.com', 'gitlab.com', 'codeberg.org']):
-                    repo_url = website
-            
-            # Build metadata
-            metadata = {
-                'contentdb_id': package_details.get('name', ''),
-                'contentdb_author': package_details.get('author', ''),
-                'contentdb_url': f"https://content.minetest.net/packages/{package_details.get('author', '')}/{package_details.get('name', '')}",
-                'short_description': package_details.get('short_description', ''),
-                'tags': package_details.get('tags', []),
-                'license': package_details.get('license', ''),
-                'media_license': package_details.get('media_license', ''),
-                'created_at': package_details.get('created_at', ''),
-                'downloads': package_details.get('downloads', 0),
-                'score': package_details.get('score', 0),
-                'reviews': package_details.get('reviews', 0),
-                'min_minetest_version': package_details.get('min_minetest_version', ''),
-                'max_minetest_version': package_details.get('max_minetest_version', ''),
-            }
-            
-            if repo_url:
-                metadata['git_url'] = repo_url
-            
-            # Add to database
-            result = add_mod_to_db(
-                name=package_details.get('name', ''),
-                mod_type=package_type,
-                author=package_details.get('author', ''),
-                description=package_details.get('short_description', ''),
-                source='contentdb',
-                url=f"https://content.minetest.net/packages/{package_details.get('author', '')}/{package_details.get('name', '')}",
-                metadata=metadata
-            )
-            
-            if result:
-                if result == 'added':
-                    added_count += 1
-                else:
-                    updated_count += 1
-            
-            if (added_count + updated_count) % 50 == 0:
-                print(f"Processed {added_count + updated_count} packages...")
-        
+            record = package_record(package)
         except Exception as e:
             print(f"Error processing package {package.get('name', 'unknown')}: {e}")
+            failed.append(f"{package.get('author')}/{package.get('name')}")
             continue
+        if record:
+            records.append(record)
+    return records, failed
+
+def _sync_cursor(page, skipped):
+    cursor = {"page": page}
+    if skipped:
+        cursor["skipped"] = skipped
+    return cursor
+
+def sync_contentdb_to_database(start_page=1, on_page=None, resume=False):
+    """
+    Sync ContentDB packages to the local database, streaming: each listing
+    page is stored before the next one is fetched, so memory use stays flat
+    and an interrupted sync keeps what it stored. The packages of a page are
+    stored in one transaction with a checkpoint of the page and of the
+    packages skipped so far (their details could not be fetched); resume=True
+    retries the skipped packages and continues after the last stored page
+    (start_page continues from any page). on_page(page) is called after each
+    page is stored. A page that cannot be fetched or stored stops the sync
+    with the checkpoint at the page before it; the checkpoint is only cleared
+    when all pages were stored and no package was skipped. Returns (added,
+    updated) package counts.
+    """
+    retry = []
+    if resume:
+        checkpoint = get_checkpoint(CHECKPOINT_CONTENTDB)
+        if checkpoint:
+            start_page = checkpoint["page"] + 1
+            retry = checkpoint.get("skipped", [])
+            print(f"Resuming ContentDB sync at page {start_page}")
+    print("Starting ContentDB sync...")
     
-    print(f"ContentDB sync complete: {added_count} added, {updated_count} updated")
+    added_count = 0
+    updated_count = 0
+    next_page = start_page
+    skipped = []
+    complete = False
+    
+    try:
+        if retry:
+            print(f"Retrying {len(retry)} skipped packages...")
+            packages = [dict(zip(("author", "name"), package_id.split("/", 1))) for package_id in retry]
+            records, skipped = _package_records(packages)
+            added, updated = add_mods_to_db(
+                records, checkpoint=(CHECKPOINT_CONTENTDB, _sync_cursor(start_page - 1, skipped)))
+            added_count += added
+            updated_count += updated
+        for page, packages in iter_package_pages(start_page):
+            records, failed = _package_records(packages)
+            skipped += failed
+            try:
+                added, updated = add_mods_to_db(
+                    records, checkpoint=(CHECKPOINT_CONTENTDB, _sync_cursor(page, skipped)))
+            except sqlite3.Error as e:
+                # Nothing of the page was stored; the checkpoint stays at the previous one
+                print(f"Error storing ContentDB page {page}: {e}")
+                break
+            added_count += added
+            updated_count += updated
+            print(f"Processed {added_count + updated_count} packages...")
+            next_page = page + 1
+            if on_page:
+                on_page(page)
+        else:
+            complete = not skipped
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching ContentDB packages: {e}")
+    except sqlite3.Error as e:
+        print(f"Error storing skipped ContentDB packages: {e}")
+    if complete:
+        clear_checkpoint(CHECKPOINT_CONTENTDB)
+        print(f"ContentDB sync complete: {added_count} added, {updated_count} updated")
+    else:
+        print(f"ContentDB sync stopped with {added_count} added, {updated_count} updated, "
+              f"{len(skipped)} skipped; continue with --resume (page {next_page})")
     return added_count, updated_count
 
 def get_package_dependencies(package_id):
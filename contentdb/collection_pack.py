@@ -1,34 +1,160 @@
 """
 Entry point for generating a modpack or game from a ContentDB collection URL.
 """
+import argparse
 import sys
 import os
 import requests
 import re
 import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 from contentdb.api import fetch_collection_data
 from mod_type_detector import detect_repo_type
+from git.mirror import MirrorCache, git_env, parse_size
+from contentdb.release_download import download_all, MANIFEST_NAME
+from contentdb.dependencies import DependencyResolver
+import profiling
+
+# Concurrent git clones
+DEFAULT_CLONE_WORKERS = 8
+# Seconds before a single clone is given up
+CLONE_TIMEOUT = 600
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python -m contentdb.collection_pack <collection_url> [output_dir]")
-        sys.exit(1)
-    collection_url = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(prog="python -m contentdb.collection_pack",
+                                     description="Generate a modpack or game from a ContentDB collection")
+    parser.add_argument("collection_url", help="ContentDB collection URL")
+    parser.add_argument("output_dir", nargs="?", help="Output directory (default: ./collection_<id>)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_CLONE_WORKERS,
+                        help=f"Concurrent git clones (default: {DEFAULT_CLONE_WORKERS})")
+    parser.add_argument("--backend", choices=["git", "release"], default="git",
+                        help="git: clone repositories; release: download ContentDB release zips "
+                             "or forge tarballs (default: git)")
+    parser.add_argument("--resolve-deps", action="store_true",
+                        help="Add the packages providing missing hard dependencies of the collection")
+    parser.add_argument("--history", action="store_true",
+                        help="Clone the full history (blobless) instead of only the latest commit")
+    parser.add_argument("--mirror", metavar="DIR",
+                        help="Check out from a cache of bare mirrors in DIR, fetching only new commits")
+    parser.add_argument("--mirror-max-size", metavar="SIZE", type=parse_size,
+                        help="Evict least recently used mirrors beyond this size (e.g. 20G)")
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args()
+    mirror = MirrorCache(args.mirror, args.mirror_max_size) if args.mirror else None
     try:
-        generate_from_collection(collection_url, output_dir)
+        with profiling.profile(args.profile, args.profile_output):
+            failures = generate_from_collection(args.collection_url, args.output_dir,
+                                                workers=args.workers, shallow=not args.history, mirror=mirror,
+                                                backend=args.backend, resolve_deps=args.resolve_deps)
+        if mirror:
+            for path in mirror.evict():
+                print(f"Evicted mirror {os.path.basename(path)}")
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(2)
+    if failures:
+        sys.exit(1)
 
 
-def generate_from_collection(collection_url, output_dir=None):
+def clone_command(repo_url, target_dir, shallow=True):
+    """
+    git clone arguments: only the latest commit by default, with shallow=False
+    the full history without file contents (fetched on demand by checkout).
+    """
+    command = ["git", "clone", "--quiet"]
+    if shallow:
+        command += ["--depth", "1"]
+    else:
+        command += ["--filter=blob:none"]
+    return command + ["--", repo_url, target_dir]
+
+
+def clone_repo(repo_url, target_dir, shallow=True, timeout=CLONE_TIMEOUT):
+    """Clone a repository (no shell involved); returns None or an error message"""
+    try:
+        result = subprocess.run(clone_command(repo_url, target_dir, shallow), capture_output=True,
+                                text=True, env=git_env(), timeout=timeout, stdin=subprocess.DEVNULL)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        shutil.rmtree(target_dir, ignore_errors=True)
+        return str(e)
+    if result.returncode != 0:
+        shutil.rmtree(target_dir, ignore_errors=True)
+        return result.stderr.strip() or f"git clone exited with {result.returncode}"
+    return None
+
+
+def clone_all(items, workers=DEFAULT_CLONE_WORKERS, shallow=True, mirror=None):
+    """
+    Clone (repo_url, target_dir) pairs with up to `workers` concurrent clones,
+    printing progress. Directories that already exist are left alone. With a
+    MirrorCache the clones are checked out from its local mirrors.
+    Returns the failures as (repo_url, target_dir, error) tuples.
+    """
+    clone = mirror.checkout if mirror else clone_repo
+    pending = []
+    for repo_url, target_dir in items:
+        if os.path.exists(target_dir) and os.listdir(target_dir):
+            print(f"Skipping {os.path.basename(target_dir)}: {target_dir} already exists")
+        else:
+            pending.append((repo_url, target_dir))
+    failures = []
+    if not pending:
+        return failures
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(clone, repo_url, target_dir, shallow): (repo_url, target_dir)
+                   for repo_url, target_dir in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            repo_url, target_dir = futures[future]
+            error = future.result()
+            name = os.path.basename(target_dir)
+            if error:
+                failures.append((repo_url, target_dir, error))
+                print(f"[{done}/{len(pending)}] FAILED {name} ({repo_url}): {error}")
+            else:
+                print(f"[{done}/{len(pending)}] cloned {name}")
+    return failures
+
+
+def resolve_dependencies(entries, extra_git_mods, workers=DEFAULT_CLONE_WORKERS):
+    """
+    Collection-style entries of the packages that have to be added to provide
+    the hard dependencies of the collection entries and extra git mods.
+    """
+    resolver = DependencyResolver(workers)
+    package_ids = [f"{entry['author']}/{entry['name']}" for entry in entries if entry.get("author")]
+    provided = {git_url.rstrip("/").split("/")[-1] for git_url in extra_git_mods}
+    added, game_provided, unresolved = resolver.resolve(package_ids, resolver.conf_depends(extra_git_mods),
+                                                        provided)
+    added_entries = []
+    for package_id, details in zip(added, resolver.details(added)):
+        author, name = package_id.split("/", 1)
+        details = details or {}
+        added_entries.append({"type": details.get("type", "mod"), "author": author, "name": name,
+                              "repo_url": details.get("repo")})
+    print(f"Dependencies: added {len(added)} packages" + (f" ({', '.join(added)})" if added else ""))
+    if game_provided:
+        print(f"  Provided only by games: {', '.join(game_provided)}")
+    if unresolved:
+        print(f"  No provider found: {', '.join(unresolved)}")
+    return added_entries
+
+
+def generate_from_collection(collection_url, output_dir=None, workers=DEFAULT_CLONE_WORKERS, shallow=True,
+                             mirror=None, backend="git", resolve_deps=False):
     """
     Given a ContentDB collection URL, generate a modpack or game.
     If multiple games are present, raise an error.
     Also include extra mods from git links in the collection description.
+    With backend="release" packages are downloaded as release archives
+    instead of cloned (see contentdb.release_download). With resolve_deps
+    the packages providing missing hard dependencies are added as well (see
+    contentdb.dependencies).
+    Items that fail are reported and returned as (source, target_dir, error)
+    tuples, source being the repository URL or the release download source;
+    the rest of the pack is generated.
     """
     # 1. Parse collection ID from URL
     parsed = urlparse(collection_url)
@@ -63,7 +189,10 @@ def generate_from_collection(collection_url, output_dir=None):
     extra_section = re.search(r"# Additional Mods from git[\s\S]*?(?:##|$)", desc)
     if extra_section:
         # Find all raw git links in the section and avoid duplicates
-        extra_git_mods = list(set( re.findall(r"https?://[\w./-]+", extra_section.group(0)) ))
+        extra_git_mods = sorted(set( re.findall(r"https?://[\w./-]+", extra_section.group(0)) ))
+
+    if resolve_deps:
+        mods += resolve_dependencies(mods + modpacks + games, extra_git_mods, workers)
 
     # 5. Prepare output dir
     if not output_dir:
@@ -73,32 +202,32 @@ def generate_from_collection(collection_url, output_dir=None):
     # 6. Download/clone all mods, modpacks, games, and extra git mods
     all_items = []
     # Add ContentDB items
-    for mod in mods:
-        repo_url = mod.get("repo_url") or mod.get("url")
-        mod_name = mod["name"]
-        mod_dir = os.path.join(output_dir, mod_name)
-        all_items.append((repo_url, mod_dir))
-    for modpack in modpacks:
-        repo_url = modpack.get("repo_url") or modpack.get("url")
-        modpack_name = modpack["name"]
-        modpack_dir = os.path.join(output_dir, modpack_name)
-        all_items.append((repo_url, modpack_dir))
-    for game in games:
-        repo_url = game.get("repo_url") or game.get("url")
-        game_name = game["name"]
-        game_dir = os.path.join(output_dir, game_name)
-        all_items.append((repo_url, game_dir))
+    for entry in mods + modpacks + games:
+        repo_url = entry.get("repo_url") or entry.get("url")
+        all_items.append((entry, repo_url, os.path.join(output_dir, entry["name"])))
     # Add extra git mods
     for git_url in extra_git_mods:
         mod_name = git_url.rstrip("/").split("/")[-1]
         mod_dir = os.path.join(output_dir, mod_name)
-        all_items.append((git_url, mod_dir))
-    # Clone all repos
-    for repo_url, target_dir in all_items:
-        if repo_url:
-            os.system(f"git clone {repo_url} {target_dir}")
-        else:
-            os.makedirs(target_dir, exist_ok=True)
+        all_items.append((None, git_url, mod_dir))
+    if backend == "release":
+        # Download release archives: from ContentDB where possible, else forge tarballs
+        downloads = []
+        for entry, repo_url, target_dir in all_items:
+            if entry and entry.get("author"):
+                downloads.append((("contentdb", entry["author"], entry["name"]), target_dir))
+            elif repo_url:
+                downloads.append((("git", repo_url), target_dir))
+            else:
+                os.makedirs(target_dir, exist_ok=True)
+        failures = download_all(downloads, workers, os.path.join(output_dir, MANIFEST_NAME))
+    else:
+        # Clone all repos
+        for _, repo_url, target_dir in all_items:
+            if not repo_url:
+                os.makedirs(target_dir, exist_ok=True)
+        failures = clone_all([(repo_url, target_dir) for _, repo_url, target_dir in all_items if repo_url],
+                             workers, shallow, mirror)
 
     # 7. Generate modpack.conf or game.conf
     if games:
@@ -110,7 +239,13 @@ def generate_from_collection(collection_url, output_dir=None):
         with open(conf_path, "w", encoding="utf-8") as f:
             f.write(f"name = Collection {collection_id}\ndescription = {desc}\n")
 
-    print(f"Generated at {output_dir}")
+    if failures:
+        print(f"Generated at {output_dir}, {len(failures)} of {len(all_items)} repositories failed:")
+        for source, target_dir, error in failures:
+            print(f"  {os.path.basename(target_dir)}: {source}")
+    else:
+        print(f"Generated at {output_dir}")
+    return failures
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""
+Dependency closure for collection packs.
+
+Starting from the packages of a collection, the hard dependencies reported by
+ContentDB (get_package_dependencies) and the `depends` of mod.conf files of
+extra git mods are followed until every dependency is provided by a package
+in the pack. The closure is computed level by level: the dependencies of all
+packages of a level are fetched concurrently and every lookup is cached, so
+large collections need one round of requests per dependency depth.
+
+A dependency names a mod, which several packages may provide (virtual
+dependencies). A provider already in the pack wins; otherwise the package
+named like the mod, otherwise the first candidate ContentDB lists. Games are
+never added to a pack: mods only games provide are expected to come from the
+game the pack is played with.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from contentdb.api import get_package_dependencies, get_package_details, search_packages
+from db_utils import get_contentdb_packages_for_mod
+from mod_type_detector import detect_repo_type
+
+DEFAULT_WORKERS = 8
+
+
+class DependencyResolver:
+    """Cached, concurrent ContentDB dependency lookups"""
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self._dependencies = {}
+        self._details = {}
+        self._confs = {}
+        self._games = None
+        self._lock = threading.Lock()
+
+    def _fetch(self, cache, function, keys):
+        """Fill `cache` with function(key) for the keys not cached yet, concurrently"""
+        with self._lock:
+            missing = list(dict.fromkeys(key for key in keys if key not in cache))
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(missing)))) as pool:
+                for key, value in zip(missing, pool.map(function, missing)):
+                    with self._lock:
+                        cache[key] = value
+        return [cache[key] for key in keys]
+
+    def dependencies(self, package_ids):
+        """[(mod name, candidate package ids)] of the hard dependencies of each package"""
+        results = []
+        for package_id, response in zip(package_ids,
+                                        self._fetch(self._dependencies, get_package_dependencies, package_ids)):
+            entries = []
+            if isinstance(response, dict):
+                entries = next((deps for key, deps in response.items() if key.lower() == package_id.lower()), [])
+            results.append([(dep["name"], dep.get("packages", [])) for dep in entries
+                            if not dep.get("is_optional")])
+        return results
+
+    def details(self, package_ids):
+        """Package details (None if they could not be fetched)"""
+        return self._fetch(self._details, get_package_details, package_ids)
+
+    def conf_depends(self, repo_urls):
+        """Hard `depends` of the conf files of git repositories, fetched concurrently"""
+        results = self._fetch(self._confs, detect_repo_type, list(repo_urls))
+        return list(dict.fromkeys(dep for _, metadata in results for dep in metadata.get("depends", [])))
+
+    def game_ids(self):
+        """Lower-case ids of all games on ContentDB (one request)"""
+        if self._games is None:
+            self._games = {f"{game['author']}/{game['name']}".lower() for game in search_packages("", "game")}
+        return self._games
+
+    def choose_provider(self, mod_name, candidates):
+        """Package to add for a mod, or None if only games (or nothing) provide it"""
+        games = self.game_ids()
+        candidates = [candidate for candidate in candidates if candidate.lower() not in games]
+        for candidate in candidates:
+            if candidate.split("/")[-1].lower() == mod_name.lower():
+                return candidate
+        return candidates[0] if candidates else None
+
+    def resolve(self, package_ids, conf_depends=(), provided=()):
+        """
+        Dependency closure of the packages plus the mods in conf_depends; mods
+        named in `provided` (e.g. extra git mods) count as present.
+        Returns (added package ids, mods provided only by games, unresolved mods).
+        """
+        selected = {package_id.lower() for package_id in package_ids}
+        provided = set(provided)
+        added, game_provided, unresolved = [], [], []
+        wanted = [(mod, get_contentdb_packages_for_mod(mod)) for mod in dict.fromkeys(conf_depends)
+                  if mod not in provided]
+        level = list(package_ids)
+        while level or wanted:
+            for deps in self.dependencies(level):
+                wanted.extend(deps)
+            level = []
+            for mod, candidates in wanted:
+                if mod in provided or any(candidate.lower() in selected for candidate in candidates):
+                    continue
+                provider = self.choose_provider(mod, candidates)
+                if provider is None:
+                    target = game_provided if candidates else unresolved
+                    if mod not in target:
+                        target.append(mod)
+                    continue
+                selected.add(provider.lower())
+                added.append(provider)
+                level.append(provider)
+            wanted = []
+        return added, game_provided, unresolved
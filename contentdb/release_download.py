@@ -0,0 +1,258 @@
+"""
+Release-archive backend for collection packs.
+
+Instead of cloning repositories, packages are downloaded as release archives:
+the latest ContentDB release zip of a package, or a forge tarball (GitHub,
+GitLab, Gitea/Forgejo) of the latest release tag or the default branch for
+repositories outside ContentDB. Archives are hashed and extracted while they
+are downloaded (tarballs straight from the response stream, zips through a
+temporary file because their index is at the end) into <target>.part, which
+is renamed to the target only after the size and SHA-256 checks passed.
+
+Every download is recorded in a manifest (url, size, sha256) in the pack
+directory; rebuilding a pack verifies ContentDB releases and release-tag
+tarballs against it (default-branch tarballs change with every commit).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from contentdb.api import CONTENTDB_API_BASE
+from git.git_web import GitWeb
+
+DEFAULT_DOWNLOAD_WORKERS = 8
+MANIFEST_NAME = "release_downloads.json"
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+
+class VerificationError(Exception):
+    """A downloaded archive does not have the expected size or hash"""
+
+
+def contentdb_release(author, name):
+    """Download URL and size (None if unknown) of the latest ContentDB release of a package"""
+    response = requests.get(f"{CONTENTDB_API_BASE}/packages/{author}/{name}/releases/", timeout=DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+    releases = response.json()
+    if not releases:
+        raise ValueError(f"{author}/{name} has no releases on ContentDB")
+    return urljoin(CONTENTDB_API_BASE, releases[0]["url"]), releases[0].get("size")
+
+
+def _latest_tag(git):
+    """Tag of the latest release of a repository, or None"""
+    try:
+        latest = next(iter(git.get_releases() or []), None)
+    except Exception:
+        latest = None
+    if latest is None:
+        return None
+    return latest.get("tag_name") if isinstance(latest, dict) else getattr(latest, "tag_name", None)
+
+
+def forge_archive_url(repo_url, ref=None):
+    """Tarball URL of a repository at `ref` (default: latest release tag or default branch)"""
+    return forge_archive(repo_url, ref)[0]
+
+
+def forge_archive(repo_url, ref=None):
+    """
+    (tarball URL, pinned) of a repository at `ref` (default: latest release
+    tag or default branch). pinned is True for release tags, whose archives
+    do not change; a default-branch tarball changes with every commit.
+    """
+    from git.github_web import GitHubWeb
+    from git.gitlab_web import GitLabWeb
+
+    git = GitWeb.from_url(repo_url)
+    tag = None if ref else _latest_tag(git)
+    ref = ref or tag or git.branch or git._get_default_branch()
+    parsed = urlparse(repo_url)
+    base = f"{parsed.scheme}://{parsed.netloc}/{git.owner}/{git.repo}"
+    if isinstance(git, GitHubWeb):
+        return f"{base}/archive/{ref}.tar.gz", bool(tag)
+    if isinstance(git, GitLabWeb):
+        return f"{base}/-/archive/{ref}/{git.repo}-{ref.replace('/', '-')}.tar.gz", bool(tag)
+    return f"{base}/archive/{ref}.tar.gz", bool(tag)
+
+
+class _HashingReader:
+    """File-like view of a response body that hashes and counts what is read"""
+
+    def __init__(self, response):
+        self.raw = response.raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, amount=-1):
+        data = self.raw.read(None if amount is None or amount < 0 else amount, decode_content=True)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def drain(self):
+        while self.read(CHUNK_SIZE):
+            pass
+
+
+def _member_path(root, name):
+    """Path of an archive member below root, or None for absolute paths and .. components"""
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts or name.startswith(("/", "\\")):
+        return None
+    return os.path.join(root, *parts)
+
+
+def _write_member(source, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f, CHUNK_SIZE)
+
+
+def _extract_tar(stream, root):
+    # Streaming mode: members are read in order, nothing is buffered
+    with tarfile.open(fileobj=stream, mode="r|*") as tar:
+        for member in tar:
+            path = _member_path(root, member.name)
+            if path is None:
+                continue
+            if member.isdir():
+                os.makedirs(path, exist_ok=True)
+            elif member.isfile():
+                _write_member(tar.extractfile(member), path)
+            # Links and devices are skipped
+
+
+def _extract_zip(stream, root):
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(stream, spool, CHUNK_SIZE)
+        spool.seek(0)
+        with zipfile.ZipFile(spool) as archive:
+            for info in archive.infolist():
+                path = _member_path(root, info.filename)
+                if path is None or (info.external_attr >> 16) & 0o170000 == 0o120000:
+                    continue
+                if info.is_dir():
+                    os.makedirs(path, exist_ok=True)
+                else:
+                    with archive.open(info) as source:
+                        _write_member(source, path)
+
+
+def _move_into_place(part_dir, target_dir):
+    """Rename the extracted tree to target_dir, dropping a single top-level directory"""
+    entries = os.listdir(part_dir)
+    if len(entries) == 1 and os.path.isdir(os.path.join(part_dir, entries[0])):
+        os.replace(os.path.join(part_dir, entries[0]), target_dir)
+        os.rmdir(part_dir)
+    else:
+        os.replace(part_dir, target_dir)
+
+
+def download_archive(url, target_dir, expected_size=None, expected_sha256=None):
+    """
+    Download a zip or tar archive and extract it to target_dir.
+    Raises VerificationError if size or SHA-256 differ from the expected (or
+    announced) values; returns {"url", "size", "sha256"}.
+    """
+    part_dir = f"{target_dir}.part"
+    shutil.rmtree(part_dir, ignore_errors=True)
+    os.makedirs(part_dir)
+    try:
+        with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            if expected_size is None and "Content-Encoding" not in response.headers:
+                expected_size = response.headers.get("Content-Length")
+            stream = _HashingReader(response)
+            if urlparse(response.url).path.endswith(".zip") or \
+                    response.headers.get("Content-Type", "").startswith("application/zip"):
+                _extract_zip(stream, part_dir)
+            else:
+                _extract_tar(stream, part_dir)
+            stream.drain()
+        sha256 = stream.sha256.hexdigest()
+        if expected_size is not None and int(expected_size) != stream.size:
+            raise VerificationError(f"{url}: got {stream.size} bytes, expected {expected_size}")
+        if expected_sha256 and expected_sha256 != sha256:
+            raise VerificationError(f"{url}: SHA-256 {sha256} does not match {expected_sha256}")
+        _move_into_place(part_dir, target_dir)
+    except BaseException:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        raise
+    return {"url": url, "size": stream.size, "sha256": sha256}
+
+
+def resolve_source(source):
+    """
+    (download URL, expected size, pinned) of ("contentdb", author, name) or
+    ("git", repo_url) sources; only pinned archives (ContentDB releases,
+    release tags) always have the same content
+    """
+    if source[0] == "contentdb":
+        return contentdb_release(source[1], source[2]) + (True,)
+    url, pinned = forge_archive(source[1])
+    return url, None, pinned
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def download_all(items, workers=DEFAULT_DOWNLOAD_WORKERS, manifest_path=None):
+    """
+    Download (source, target_dir) pairs with up to `workers` concurrent
+    downloads, printing progress; existing directories are left alone. With
+    a manifest, pinned archives recorded in it are verified against their
+    hash and new downloads are added. Returns failures as (source, target_dir, error).
+    """
+    manifest = load_manifest(manifest_path) if manifest_path else {}
+    manifest_lock = threading.Lock()
+    pending = []
+    for source, target_dir in items:
+        if os.path.exists(target_dir) and os.listdir(target_dir):
+            print(f"Skipping {os.path.basename(target_dir)}: {target_dir} already exists")
+        else:
+            pending.append((source, target_dir))
+
+    def download(source, target_dir):
+        url, size, pinned = resolve_source(source)
+        recorded = manifest.get(os.path.basename(target_dir), {})
+        expected_sha256 = recorded.get("sha256") if pinned and recorded.get("url") == url else None
+        entry = download_archive(url, target_dir, size, expected_sha256)
+        with manifest_lock:
+            manifest[os.path.basename(target_dir)] = entry
+        return entry
+
+    failures = []
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(download, source, target_dir): (source, target_dir)
+                       for source, target_dir in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                source, target_dir = futures[future]
+                name = os.path.basename(target_dir)
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    failures.append((source, target_dir, str(e)))
+                    print(f"[{done}/{len(pending)}] FAILED {name}: {e}")
+                else:
+                    print(f"[{done}/{len(pending)}] downloaded {name} ({entry['size']} bytes)")
+    if manifest_path:
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    return failures
@@ -1,5 +1,14 @@
 import sqlite3
 import json
+import hashlib
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+from retry_policy import classify_error, retry_delay, should_dead_letter
+from git.canonical import canonicalize_repo_url, is_forge_url
+import metrics
+import tracing
 
 DB_PATH = "mod_list.db"
 FORUM_QUEUE_DB = "forum_queue.db"
@@ -7,14 +16,555 @@ GIT_QUEUE_DB = "git_queue.db"
 GIT_HOSTS_DB = "git_hosts.db"
 NON_MOD_REPOS_DB = "non_mod_repos.db"
 
+# Values of the `processed` column in the work queue tables
+QUEUE_PENDING = 0
+QUEUE_DONE = 1
+QUEUE_DEAD = 2
+
+# Default for next_attempt_at so that new items are due immediately
+EPOCH_TIMESTAMP = "1970-01-01 00:00:00"
+
+# Retry bookkeeping columns shared by the forum and git work queues
+RETRY_COLUMNS = [
+    ("attempts", "INTEGER DEFAULT 0"),
+    ("next_attempt_at", f"TIMESTAMP DEFAULT '{EPOCH_TIMESTAMP}'"),
+    ("error", "TEXT"),
+]
+
+# git_work_queue priorities by source (higher is processed first)
+PRIORITY_SEARCH = 1
+PRIORITY_FORUM = 2
+PRIORITY_CONTENTDB = 3
+SOURCE_PRIORITIES = {
+    "contentdb": PRIORITY_CONTENTDB,
+    "forum": PRIORITY_FORUM,
+}
+# Pending items gain one priority level per AGING_INTERVAL seconds of waiting,
+# up to MAX_AGED_PRIORITY, so low-priority items are not starved
+AGING_INTERVAL = 24 * 3600
+MAX_AGED_PRIORITY = PRIORITY_CONTENTDB
+
+# Recrawl scheduling for processed items: the interval halves when a revisit
+# finds changed content and doubles when it does not, within these bounds (seconds)
+MIN_CHECK_INTERVAL = 24 * 3600
+DEFAULT_CHECK_INTERVAL = 7 * 24 * 3600
+MAX_CHECK_INTERVAL = 90 * 24 * 3600
+
+# Recrawl bookkeeping columns shared by the forum and git work queues
+RECHECK_COLUMNS = [
+    ("last_checked", "TIMESTAMP"),
+    ("next_check_at", f"TIMESTAMP DEFAULT '{EPOCH_TIMESTAMP}'"),
+    ("check_interval", f"INTEGER DEFAULT {DEFAULT_CHECK_INTERVAL}"),
+    ("change_count", "INTEGER DEFAULT 0"),
+    ("content_hash", "TEXT"),
+]
+
+# Reasons for non_mod_repos entries and how long (seconds) each stays valid
+NON_MOD_NO_CONF = "no_conf"        # git repo without mod.conf/modpack.conf/game.conf
+NON_MOD_NOT_GIT = "not_git"        # link that is not on a supported git server
+NON_MOD_NOT_FOUND = "not_found"    # repo does not exist (any more)
+NON_MOD_REASON_TTLS = {
+    NON_MOD_NO_CONF: 30 * 24 * 3600,
+    NON_MOD_NOT_GIT: 180 * 24 * 3600,
+    NON_MOD_NOT_FOUND: 7 * 24 * 3600,
+}
+DEFAULT_NON_MOD_TTL = 30 * 24 * 3600
+
+# Resumable jobs; each checkpoint is kept in the database its data goes to
+# (see _checkpoint_db), so it commits with the data of its step
+CHECKPOINT_CONTENTDB = "contentdb_sync"
+CHECKPOINT_FORUM = "forum"            # one per forum section: "forum:<url>"
+CHECKPOINT_GIT_SEARCH = "git_search"
+
+# Columns of results covered by the results_fts full-text index and their
+# BM25 weights (matches in the name count more than in the long description)
+FTS_COLUMNS = [
+    ("name", 10.0),
+    ("title", 8.0),
+    ("author", 2.0),
+    ("short_description", 4.0),
+    ("description", 4.0),
+    ("long_description", 1.0),
+]
+
+# Dependency columns of results; depends and optional_depends hold JSON lists
+# of mod names, mirrored into the dependencies edge table by triggers
+RESULT_DEPENDENCY_COLUMNS = [
+    ("depends", "TEXT"),
+    ("optional_depends", "TEXT"),
+    ("min_version", "TEXT"),
+    ("max_version", "TEXT"),
+]
+
+# In-memory copy of unexpired non_mod_repos entries {canonical_url: expires_at},
+# filled by load_non_mod_repo_cache() so lookups cost no database access
+_non_mod_repo_cache = None
+
+def next_check_interval(interval, changed):
+    """Adapt a recheck interval to whether the last revisit found a change"""
+    interval = interval or DEFAULT_CHECK_INTERVAL
+    interval = interval // 2 if changed else interval * 2
+    return max(MIN_CHECK_INTERVAL, min(interval, MAX_CHECK_INTERVAL))
+
+def content_hash(text):
+    """Fingerprint of fetched content, used to detect changes between revisits"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def priority_for_source(source):
+    """Default git work queue priority for a source like 'contentdb' or 'forum:<url>'"""
+    kind = (source or "").split(":", 1)[0]
+    return SOURCE_PRIORITIES.get(kind, PRIORITY_SEARCH)
+
+def _timestamp(seconds_from_now=0):
+    """Return a UTC timestamp in SQLite's CURRENT_TIMESTAMP format"""
+    moment = datetime.now(timezone.utc) + timedelta(seconds=seconds_from_now)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+def _add_canonical_url_column(c, table, url_column, delete_duplicates):
+    """
+    Add and backfill the canonical_url column with a unique index.
+    Rows whose canonical URL is already taken are deleted (work queues) or
+    left without canonical_url (results, so no data is lost).
+    """
+    _add_missing_columns(c, table, [("canonical_url", "TEXT")])
+    c.execute(f"""
+        SELECT id, {url_column} FROM {table}
+        WHERE canonical_url IS NULL AND {url_column} IS NOT NULL AND {url_column} != ''
+        ORDER BY id
+    """)
+    rows = c.fetchall()
+    if rows:
+        c.execute(f"SELECT canonical_url FROM {table} WHERE canonical_url IS NOT NULL")
+        seen = {row[0] for row in c.fetchall()}
+        for row_id, url in rows:
+            canonical_url = canonicalize_repo_url(url)
+            if canonical_url in seen:
+                if delete_duplicates:
+                    c.execute(f"DELETE FROM {table} WHERE id=?", (row_id,))
+                continue
+            seen.add(canonical_url)
+            c.execute(f"UPDATE {table} SET canonical_url=? WHERE id=?", (canonical_url, row_id))
+    c.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_canonical_url
+        ON {table} (canonical_url) WHERE canonical_url IS NOT NULL
+    """)
+
+def _add_missing_columns(c, table, columns):
+    """Add columns to an existing table (simple migration for older databases)"""
+    c.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in c.fetchall()}
+    for name, declaration in columns:
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+
+def _init_checkpoints(c):
+    """Create the checkpoints table: the last completed step (JSON cursor) of each resumable job"""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            job TEXT PRIMARY KEY,
+            cursor TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _write_checkpoint(c, checkpoint):
+    """Store a (job, cursor) checkpoint in the caller's transaction"""
+    if checkpoint:
+        job, cursor = checkpoint
+        c.execute("INSERT OR REPLACE INTO checkpoints (job, cursor, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+                  (job, json.dumps(cursor)))
+
+def _checkpoint_db(job):
+    kind = job.split(":", 1)[0]
+    if kind == CHECKPOINT_CONTENTDB:
+        return DB_PATH
+    if kind == CHECKPOINT_FORUM:
+        return FORUM_QUEUE_DB
+    if kind == CHECKPOINT_GIT_SEARCH:
+        return GIT_QUEUE_DB
+    raise ValueError(f"Unknown checkpoint job: {job}")
+
+def _init_contents(c):
+    """
+    Create the contents relation: the mods and modpacks inside a modpack or
+    game result (from its repository tree), removed with their result.
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS contents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            result_id INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            name TEXT,
+            type TEXT,
+            title TEXT,
+            description TEXT,
+            author TEXT,
+            depends TEXT,
+            optional_depends TEXT,
+            UNIQUE (result_id, path)
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contents_name ON contents (name)")
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS results_contents_delete AFTER DELETE ON results BEGIN
+            DELETE FROM contents WHERE result_id = old.id;
+        END
+    """)
+
+def _init_entities(c):
+    """
+    Create the record linkage tables (see linkage.py): entities, the
+    results rows belonging to each (entity_members, with the match that put
+    them there), the blocking keys of every linked row (link_keys) and the
+    revision up to which results have been linked (linkage_state).
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS entities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            title TEXT,
+            type TEXT,
+            author TEXT,
+            canonical_url TEXT,
+            contentdb_url TEXT,
+            forum_url TEXT,
+            sources TEXT,
+            size INTEGER
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS entity_members (
+            result_id INTEGER PRIMARY KEY,
+            entity_id INTEGER NOT NULL,
+            source TEXT,
+            matched_id INTEGER,
+            score REAL,
+            rule TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_entity_members_entity ON entity_members (entity_id)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS link_keys (
+            key TEXT NOT NULL,
+            result_id INTEGER NOT NULL,
+            PRIMARY KEY (key, result_id)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_link_keys_result ON link_keys (result_id)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS linkage_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision INTEGER NOT NULL
+        )
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS results_linkage_delete AFTER DELETE ON results BEGIN
+            DELETE FROM link_keys WHERE result_id = old.id;
+            DELETE FROM entity_members WHERE result_id = old.id;
+        END
+    """)
+
+def _init_results_revision(c):
+    """
+    Number every insert and change of a results row from one database-wide
+    counter (the revision column, maintained by triggers), so exports can
+    continue from the highest revision they have seen.
+    """
+    c.execute("PRAGMA table_info(results)")
+    if "revision" not in {row[1] for row in c.fetchall()}:
+        c.execute("ALTER TABLE results ADD COLUMN revision INTEGER")
+        c.execute("UPDATE results SET revision = id")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_results_revision ON results (revision)")
+    bump = "UPDATE results SET revision = (SELECT COALESCE(MAX(revision), 0) + 1 FROM results) WHERE id = new.id"
+    tracked = RESULT_COLUMNS + ["canonical_url"]
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS results_revision_insert AFTER INSERT ON results BEGIN
+            {bump};
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS results_revision_update AFTER UPDATE OF {", ".join(tracked)} ON results
+        WHEN {" OR ".join(f"old.{column} IS NOT new.{column}" for column in tracked)}
+        BEGIN
+            {bump};
+        END
+    """)
+
+def _init_results_fts(c):
+    """
+    Create the results_fts FTS5 index over results (external content, kept in
+    sync by triggers) and fill it from existing rows when it is new.
+    """
+    c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='results_fts'")
+    exists = c.fetchone() is not None
+    columns = ", ".join(column for column, _ in FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column, _ in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column, _ in FTS_COLUMNS)
+    try:
+        c.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(
+                {columns}, content='results', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search not available (SQLite without FTS5?): {e}", file=sys.stderr)
+        return
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS results_fts_insert AFTER INSERT ON results BEGIN
+            INSERT INTO results_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS results_fts_delete AFTER DELETE ON results BEGIN
+            INSERT INTO results_fts (results_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS results_fts_update AFTER UPDATE OF {columns} ON results BEGIN
+            INSERT INTO results_fts (results_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO results_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """)
+    if not exists:
+        c.execute("INSERT INTO results_fts (results_fts) VALUES ('rebuild')")
+
+def _dependency_edges_sql(row):
+    """SELECT producing the dependency edges of a results row (`new` or `old` in triggers)"""
+    return " UNION ALL ".join(f"""
+        SELECT {row}.id, {row}.name, value, {optional}
+        FROM json_each(CASE WHEN json_valid({row}.{column}) THEN {row}.{column} ELSE '[]' END)
+        WHERE {row}.name != '' AND value != ''
+    """ for column, optional in (("depends", 0), ("optional_depends", 1)))
+
+def _init_dependencies(c):
+    """
+    Create the dependencies edge table (mod -> depends_on, one row per
+    dependency of a results row) and keep it in sync with results by
+    triggers. Every change is logged in dependency_changes so in-memory
+    graphs can be updated incrementally (see dependency_graph.py).
+    """
+    c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='dependencies'")
+    exists = c.fetchone() is not None
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS dependencies (
+            result_id INTEGER,
+            mod TEXT,
+            depends_on TEXT,
+            optional INTEGER DEFAULT 0
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dependencies_result ON dependencies (result_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dependencies_mod ON dependencies (mod)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dependencies_depends_on ON dependencies (depends_on)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS dependency_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            mod TEXT
+        )
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS results_dependencies_insert AFTER INSERT ON results BEGIN
+            INSERT INTO dependencies (result_id, mod, depends_on, optional) {_dependency_edges_sql("new")};
+            INSERT INTO dependency_changes (mod) SELECT new.name WHERE new.name != '';
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS results_dependencies_delete AFTER DELETE ON results BEGIN
+            DELETE FROM dependencies WHERE result_id = old.id;
+            INSERT INTO dependency_changes (mod) SELECT old.name WHERE old.name != '';
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS results_dependencies_update AFTER UPDATE OF name, depends, optional_depends
+        ON results WHEN old.name IS NOT new.name OR old.depends IS NOT new.depends
+            OR old.optional_depends IS NOT new.optional_depends
+        BEGIN
+            DELETE FROM dependencies WHERE result_id = old.id;
+            INSERT INTO dependencies (result_id, mod, depends_on, optional) {_dependency_edges_sql("new")};
+            INSERT INTO dependency_changes (mod) SELECT old.name WHERE old.name != '';
+            INSERT INTO dependency_changes (mod) SELECT new.name WHERE new.name != '' AND new.name IS NOT old.name;
+        END
+    """)
+    if not exists:
+        for column, optional in (("depends", 0), ("optional_depends", 1)):
+            c.execute(f"""
+                INSERT INTO dependencies (result_id, mod, depends_on, optional)
+                SELECT results.id, results.name, value, {optional}
+                FROM results, json_each(CASE WHEN json_valid(results.{column}) THEN results.{column} ELSE '[]' END)
+                WHERE results.name != '' AND value != ''
+            """)
+
+@tracing.traced("db")
+def get_dependency_edges(mods=None):
+    """
+    Distinct dependency edges (mod, depends_on, optional), of all mods or of
+    the given mod names. A required edge wins over an optional one.
+    """
+    query = "SELECT mod, depends_on, MIN(optional) FROM dependencies"
+    params = []
+    if mods is not None:
+        mods = list(mods)
+        if not mods:
+            return []
+        query += f" WHERE mod IN ({', '.join('?' * len(mods))})"
+        params = mods
+    conn = sqlite3.connect(DB_PATH)
+    edges = conn.execute(query + " GROUP BY mod, depends_on", params).fetchall()
+    conn.close()
+    return edges
+
+@tracing.traced("db")
+def get_dependency_changes(since_seq=0):
+    """Return (latest change number, names of mods whose dependencies changed after since_seq)"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("SELECT seq, mod FROM dependency_changes WHERE seq > ? ORDER BY seq",
+                        (since_seq,)).fetchall()
+    if rows:
+        latest = rows[-1][0]
+    else:
+        latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM dependency_changes").fetchone()[0]
+    conn.close()
+    return max(latest, since_seq), {mod for _, mod in rows}
+
+@tracing.traced("db")
+def get_contentdb_packages_for_mod(mod_name):
+    """ContentDB package ids ("author/name") of known results providing a mod name"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("""
+        SELECT contentdb_url, repo_url FROM results
+        WHERE name = ? AND (contentdb_url LIKE '%/packages/%' OR repo_url LIKE '%/packages/%')
+    """, (mod_name,)).fetchall()
+    conn.close()
+    packages = []
+    for row in rows:
+        for url in row:
+            match = re.search(r"/packages/([^/]+)/([^/]+)/?$", url or "")
+            if match and f"{match.group(1)}/{match.group(2)}" not in packages:
+                packages.append(f"{match.group(1)}/{match.group(2)}")
+    return packages
+
+def fts_query(text, prefix=True):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix
+    unless prefix=False. Words are quoted, so FTS5 operators in the input
+    have no effect.
+    """
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"' + ("*" if prefix else "") for word in words)
+
+def result_filters(mod_type=None, source=None, license=None, prefix=""):
+    """SQL conditions and parameters for the result filters: exact type and license, source prefix"""
+    conditions, params = [], []
+    if mod_type:
+        conditions.append(f"{prefix}type = ?")
+        params.append(mod_type)
+    if source:
+        conditions.append(f"{prefix}source LIKE ? ESCAPE '\\'")
+        params.append(source.replace("%", r"\%").replace("_", r"\_") + "%")
+    if license:
+        conditions.append(f"{prefix}license = ? COLLATE NOCASE")
+        params.append(license)
+    return conditions, params
+
+def has_search_index(conn):
+    """True if the results_fts index exists (it is not created when SQLite lacks FTS5)"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='results_fts'").fetchone() is not None
+
+def search_statement(conn, text, columns, filters, prefix=True):
+    """
+    SELECT of a search over the results: `columns` (of results r), rank and
+    snippet, best match first, with the result_filters conditions `filters`.
+    Returns (sql, params) to append LIMIT to, or None if text has no words.
+    Without the results_fts index every word is matched as a substring of
+    the FTS_COLUMNS with LIKE; name matches come first and there is no rank
+    or snippet.
+    """
+    conditions, params = filters
+    select = ", ".join(f"r.{column}" for column in columns)
+    if has_search_index(conn):
+        query = fts_query(text, prefix)
+        if not query:
+            return None
+        weights = ", ".join(str(weight) for _, weight in FTS_COLUMNS)
+        sql = f"""
+            SELECT {select},
+                   bm25(results_fts, {weights}) AS rank,
+                   snippet(results_fts, -1, '[', ']', '...', 12) AS snippet
+            FROM results_fts JOIN results r ON r.id = results_fts.rowid
+            WHERE results_fts MATCH ?
+        """
+        sql += "".join(f" AND {condition}" for condition in conditions) + " ORDER BY rank"
+        return sql, [query] + params
+    words = [word.replace("%", r"\%").replace("_", r"\_") for word in re.findall(r"\w+", text)]
+    if not words:
+        return None
+    matches = [" OR ".join(f"r.{column} LIKE ? ESCAPE '\\'" for column, _ in FTS_COLUMNS) for _ in words]
+    sql = f"SELECT {select}, NULL AS rank, '' AS snippet FROM results r WHERE "
+    sql += " AND ".join(f"({match})" for match in matches + conditions if match)
+    sql += " ORDER BY r.name LIKE ? ESCAPE '\\' DESC, r.name"
+    like_params = [f"%{word}%" for word in words for _ in FTS_COLUMNS]
+    return sql, like_params + params + [f"%{words[0]}%"]
+
+@tracing.traced("db")
+def search_results(text, mod_type=None, source=None, license=None, limit=20, prefix=True):
+    """
+    Full-text search over the results, best match first (BM25, weighted by
+    FTS_COLUMNS). Optional filters: exact type and license, source prefix.
+    Returns a list of dicts with the main result columns, the rank (lower is
+    better) and a snippet of the best matching column. SQLite without FTS5
+    falls back to a slower LIKE scan (see search_statement).
+    """
+    columns = ["id", "name", "title", "type", "source", "license", "author", "short_description",
+               "contentdb_url", "forum_url", "repo_url"]
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        statement = search_statement(conn, text, columns, result_filters(mod_type, source, license, "r."), prefix)
+        if statement is None:
+            return []
+        sql, params = statement
+        return [dict(row) for row in conn.execute(sql + " LIMIT ?", params + [limit])]
+    finally:
+        conn.close()
+
+@tracing.traced("db")
+def iter_results(columns, mod_type=None, source=None, license=None, since_revision=0, batch_size=1000):
+    """
+    Stream result rows as tuples of `columns`, fetching batch_size rows at a
+    time so memory use does not depend on the table size. Only rows whose
+    revision is greater than since_revision are returned, in revision order.
+    Filters as in search_results.
+    """
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown result columns: {', '.join(unknown)}")
+    filters, params = result_filters(mod_type, source, license)
+    sql = f"SELECT {', '.join(columns)} FROM results WHERE revision > ?"
+    sql += "".join(f" AND {condition}" for condition in filters) + " ORDER BY revision"
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        cursor = conn.execute(sql, [since_revision or 0] + params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+@tracing.traced("db")
 def init_all_databases():
     """Initialize all databases"""
     init_db()
     init_git_work_queue()
 
+@tracing.traced("db")
 def init_db():
     # Initialize main mod list database
     conn = sqlite3.connect(DB_PATH)
+    # WAL (persistent in the file): readers such as query_api are not blocked
+    # by the crawler's writes and do not block them
+    conn.execute("PRAGMA journal_mode=WAL")
     c = conn.cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS results (
@@ -42,6 +592,17 @@ def init_db():
             description TEXT
         )
     """)
+    _add_missing_columns(c, "results", RESULT_DEPENDENCY_COLUMNS)
+    _add_canonical_url_column(c, "results", "repo_url", delete_duplicates=False)
+    # Lookups by name and author (dependency resolution, query API)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_results_name ON results (name)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_results_author ON results (author COLLATE NOCASE)")
+    _init_results_fts(c)
+    _init_dependencies(c)
+    _init_contents(c)
+    _init_results_revision(c)
+    _init_entities(c)
+    _init_checkpoints(c)
     conn.commit()
     conn.close()
 
@@ -58,6 +619,16 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    _add_missing_columns(c, "forum_threads", RETRY_COLUMNS + RECHECK_COLUMNS)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_forum_threads_due
+        ON forum_threads (processed, next_attempt_at)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_forum_threads_recheck
+        ON forum_threads (processed, next_check_at)
+    """)
+    _init_checkpoints(c)
     conn.commit()
     conn.close()
 
@@ -74,6 +645,7 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    _add_canonical_url_column(c, "git_repos", "repo_url", delete_duplicates=True)
     conn.commit()
     conn.close()
 
@@ -102,13 +674,52 @@ def init_db():
             checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    _add_missing_columns(c, "non_mod_repos", [("expires_at", "TIMESTAMP")])
+    # Entries from before TTLs existed expire DEFAULT_NON_MOD_TTL after they were checked
+    c.execute("""
+        UPDATE non_mod_repos SET expires_at=datetime(checked_at, ?)
+        WHERE expires_at IS NULL
+    """, (f"+{DEFAULT_NON_MOD_TTL} seconds",))
+    c.execute("CREATE INDEX IF NOT EXISTS idx_non_mod_repos_expires ON non_mod_repos (expires_at)")
+    _add_canonical_url_column(c, "non_mod_repos", "repo_url", delete_duplicates=True)
+    # Entries of links that are not git repositories used to be keyed by their
+    # canonical URL, which could stand for a real repository; they are only a
+    # cache, so drop them
+    c.execute("DELETE FROM non_mod_repos WHERE reason = ? AND canonical_url IS NOT repo_url", (NON_MOD_NOT_GIT,))
     conn.commit()
     conn.close()
 
-def save_result(item, source):
+# Columns written by save_result; when a repository is saved again (same
+# canonical_url) empty columns of the existing row are filled in
+RESULT_COLUMNS = [
+    "contentdb_url", "forum_url", "repo_url", "name", "short_description", "dev_state", "tags",
+    "content_warnings", "license", "media_license", "long_description", "website", "issue_tracker",
+    "video_url", "donate_url", "translation_url", "source", "type", "title", "author", "description",
+    "depends", "optional_depends", "min_version", "max_version",
+]
+
+# Columns that can be exported with iter_results
+EXPORT_COLUMNS = ["id"] + RESULT_COLUMNS + ["canonical_url", "revision"]
+
+@tracing.traced("db")
+def save_result(item, source, replace=False):
+    """
+    Save a discovered item, merging it into an existing row for the same repository.
+    Empty columns of the existing row are filled in; with replace=True non-empty
+    new values overwrite the stored ones (used when re-extracting old data).
+    """
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute("INSERT INTO results (contentdb_url, forum_url, repo_url, name, short_description, dev_state, tags, content_warnings, license, media_license, long_description, website, issue_tracker, video_url, donate_url, translation_url, source, type, title, author, description) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+    _upsert_result(c, item, source, replace)
+    conn.commit()
+    conn.close()
+
+def _upsert_result(c, item, source, replace=False):
+    # Returns True if a new row was inserted, False if an existing one was merged into
+    canonical_url = item.get("canonical_url") or canonicalize_repo_url(item.get("repo_url", ""))
+    exists = canonical_url is not None and c.execute(
+        "SELECT 1 FROM results WHERE canonical_url=?", (canonical_url,)).fetchone() is not None
+    values = (
         item.get("contentdb_url", ""),
         item.get("forum_url", ""),
         item.get("repo_url", ""),
@@ -129,11 +740,274 @@ def save_result(item, source):
         item.get("type", "unknown"),
         item.get("title", item.get("name", "")),
         item.get("author", item.get("owner", {}).get("login", "")),
-        item.get("description", "")
-    ))
-    conn.commit()
+        item.get("description", ""),
+        json.dumps(item["depends"]) if "depends" in item else "",
+        json.dumps(item["optional_depends"]) if "optional_depends" in item else "",
+        item.get("min_version", ""),
+        item.get("max_version", ""),
+    )
+    if replace:
+        merge = ", ".join(f"{column}=COALESCE(NULLIF(excluded.{column}, ''), {column})"
+                          for column in RESULT_COLUMNS if column != "source")
+    else:
+        merge = ", ".join(f"{column}=COALESCE(NULLIF({column}, ''), excluded.{column})"
+                          for column in RESULT_COLUMNS if column != "source")
+    c.execute(f"""
+        INSERT INTO results ({", ".join(RESULT_COLUMNS)}, canonical_url)
+        VALUES ({", ".join("?" * (len(RESULT_COLUMNS) + 1))})
+        ON CONFLICT(canonical_url) WHERE canonical_url IS NOT NULL DO UPDATE SET {merge}
+    """, values + (canonical_url,))
+    return not exists
+
+CONTENT_COLUMNS = ["path", "name", "type", "title", "description", "author", "depends", "optional_depends"]
+
+def _content_values(child):
+    values = []
+    for column in CONTENT_COLUMNS:
+        value = child.get(column, "")
+        values.append(json.dumps(value) if isinstance(value, list) else value)
+    return tuple(values)
+
+@tracing.traced("db")
+def save_contents(canonical_url, contents):
+    """
+    Replace the stored contents of the result with this canonical URL by
+    `contents` (enumerate_contents metadata). Returns the number of rows
+    stored, None if there is no such result.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT id FROM results WHERE canonical_url = ?", (canonical_url,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("DELETE FROM contents WHERE result_id = ?", (row[0],))
+            conn.executemany(f"""
+                INSERT INTO contents (result_id, {", ".join(CONTENT_COLUMNS)})
+                VALUES (?, {", ".join("?" * len(CONTENT_COLUMNS))})
+            """, [(row[0],) + _content_values(child) for child in contents])
+        return len(contents)
+    finally:
+        conn.close()
+
+@tracing.traced("db")
+def get_contents(result_id):
+    """Mods and modpacks inside a result, by path"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(f"SELECT {', '.join(CONTENT_COLUMNS)} FROM contents WHERE result_id = ? ORDER BY path",
+                        (result_id,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+@tracing.traced("db")
+def find_containers(mod_name):
+    """The modpacks and games containing a mod (by its name): dicts with the container and the path"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("""
+        SELECT r.id, r.name, r.title, r.type, r.repo_url, c.path FROM contents c
+        JOIN results r ON r.id = c.result_id
+        WHERE c.name = ? ORDER BY r.name, c.path
+    """, (mod_name,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+# Columns of results rows read for record linkage
+LINK_COLUMNS = ["id", "name", "title", "author", "type", "source", "canonical_url", "repo_url",
+                "contentdb_url", "forum_url", "revision"]
+
+# Entity columns and how they are chosen from the members: the first
+# non-empty value in source order (ContentDB, git, forum), then by result id
+_SOURCE_RANK = "CASE r.source WHEN 'contentdb' THEN 0 WHEN 'git' THEN 1 ELSE 2 END"
+ENTITY_FIELDS = {
+    "name": "r.name",
+    "title": "r.title",
+    "type": "NULLIF(r.type, 'unknown')",
+    "author": "r.author",
+    # The canonical_url of a ContentDB row is its package page, not a repository
+    "canonical_url": "CASE WHEN r.source != 'contentdb' THEN r.canonical_url END",
+    "contentdb_url": "COALESCE(NULLIF(r.contentdb_url, ''), CASE WHEN r.source = 'contentdb' THEN r.repo_url END)",
+    "forum_url": "r.forum_url",
+}
+
+def _in_batches(values, size=500):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+@tracing.traced("db")
+def get_linkage_revision():
+    """Results revision up to which record linkage has run (0 if never)"""
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute("SELECT revision FROM linkage_state WHERE id = 1").fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+@tracing.traced("db")
+def get_link_rows(result_ids):
+    """LINK_COLUMNS dicts of the given results rows, by id"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    rows = {}
+    for batch in _in_batches(result_ids):
+        for row in conn.execute(f"SELECT {', '.join(LINK_COLUMNS)} FROM results "
+                                f"WHERE id IN ({', '.join('?' * len(batch))})", batch):
+            rows[row["id"]] = dict(row)
     conn.close()
+    return rows
 
+@tracing.traced("db")
+def get_link_blocks(keys):
+    """{blocking key: [result ids]} of the stored rows having any of the keys"""
+    conn = sqlite3.connect(DB_PATH)
+    blocks = {}
+    for batch in _in_batches(keys):
+        for key, result_id in conn.execute(f"SELECT key, result_id FROM link_keys "
+                                           f"WHERE key IN ({', '.join('?' * len(batch))})", batch):
+            blocks.setdefault(key, []).append(result_id)
+    conn.close()
+    return blocks
+
+@tracing.traced("db")
+def get_entity_ids(result_ids):
+    """{result id: entity id} of the given rows that are linked"""
+    conn = sqlite3.connect(DB_PATH)
+    entity_ids = {}
+    for batch in _in_batches(result_ids):
+        entity_ids.update(conn.execute(f"SELECT result_id, entity_id FROM entity_members "
+                                       f"WHERE result_id IN ({', '.join('?' * len(batch))})", batch))
+    conn.close()
+    return entity_ids
+
+@tracing.traced("db")
+def get_entity_member_rows(entity_ids):
+    """{entity id: LINK_COLUMNS dicts of all its members}"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    members = {}
+    for batch in _in_batches(entity_ids):
+        for row in conn.execute(f"""
+            SELECT m.entity_id, {', '.join(f'r.{column}' for column in LINK_COLUMNS)}
+            FROM entity_members m JOIN results r ON r.id = m.result_id
+            WHERE m.entity_id IN ({', '.join('?' * len(batch))})
+        """, batch):
+            row = dict(row)
+            members.setdefault(row.pop("entity_id"), []).append(row)
+    conn.close()
+    return members
+
+@tracing.traced("db")
+def save_linkage(keys, groups, revision):
+    """
+    Store a linkage run in one transaction: the blocking keys of the linked
+    rows ({result id: keys}), the groups (entity id or None for a new entity,
+    ids of entities merged into it, member rows (result_id, source,
+    matched_id, score, rule)) and the revision linked up to. Returns the ids
+    of the new entities.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    created = []
+    try:
+        with conn:
+            for batch in _in_batches(keys):
+                conn.execute(f"DELETE FROM link_keys WHERE result_id IN ({', '.join('?' * len(batch))})", batch)
+            conn.executemany("INSERT INTO link_keys (key, result_id) VALUES (?, ?)",
+                             [(key, result_id) for result_id, row_keys in keys.items() for key in row_keys])
+            touched = set()
+            for entity_id, merged, members in groups:
+                if entity_id is None:
+                    entity_id = conn.execute("INSERT INTO entities DEFAULT VALUES").lastrowid
+                    created.append(entity_id)
+                for batch in _in_batches(merged):
+                    placeholders = ", ".join("?" * len(batch))
+                    conn.execute(f"UPDATE entity_members SET entity_id = ? WHERE entity_id IN ({placeholders})",
+                                 [entity_id] + batch)
+                    conn.execute(f"DELETE FROM entities WHERE id IN ({placeholders})", batch)
+                conn.executemany("""
+                    INSERT OR REPLACE INTO entity_members (result_id, entity_id, source, matched_id, score, rule)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [(result_id, entity_id, source, matched_id, score, rule)
+                      for result_id, source, matched_id, score, rule in members])
+                touched.add(entity_id)
+            fields = ", ".join(f"""{column} = (
+                SELECT {expression} FROM entity_members m JOIN results r ON r.id = m.result_id
+                WHERE m.entity_id = entities.id AND COALESCE({expression}, '') != ''
+                ORDER BY {_SOURCE_RANK}, r.id LIMIT 1)""" for column, expression in ENTITY_FIELDS.items())
+            for batch in _in_batches(touched):
+                conn.execute(f"""
+                    UPDATE entities SET {fields},
+                        sources = (SELECT group_concat(DISTINCT r.source) FROM entity_members m
+                                   JOIN results r ON r.id = m.result_id WHERE m.entity_id = entities.id),
+                        size = (SELECT COUNT(*) FROM entity_members m WHERE m.entity_id = entities.id)
+                    WHERE id IN ({', '.join('?' * len(batch))})
+                """, batch)
+            # Entities whose rows were all deleted
+            conn.execute("DELETE FROM entities WHERE id NOT IN (SELECT entity_id FROM entity_members)")
+            conn.execute("INSERT OR REPLACE INTO linkage_state (id, revision) VALUES (1, ?)", (revision,))
+        return created
+    finally:
+        conn.close()
+
+@tracing.traced("db")
+def clear_linkage():
+    """Forget all entities and blocking keys (before linking everything again)"""
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        for table in ("entities", "entity_members", "link_keys", "linkage_state"):
+            conn.execute(f"DELETE FROM {table}")
+    conn.close()
+
+@tracing.traced("db")
+def get_entity_count():
+    """Count the linked entities (distinct mods)"""
+    conn = sqlite3.connect(DB_PATH)
+    count = conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+    conn.close()
+    return count
+
+@tracing.traced("db")
+def get_entity(result_id):
+    """
+    The entity a results row is linked to, with its members and how each
+    was matched (provenance), or None if the row is not linked yet
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        entity = conn.execute("""
+            SELECT e.* FROM entities e JOIN entity_members m ON m.entity_id = e.id WHERE m.result_id = ?
+        """, (result_id,)).fetchone()
+        if entity is None:
+            return None
+        entity = dict(entity)
+        entity["members"] = [dict(row) for row in conn.execute("""
+            SELECT m.result_id, m.source, m.matched_id, m.score, m.rule, r.name, r.repo_url,
+                   r.contentdb_url, r.forum_url
+            FROM entity_members m JOIN results r ON r.id = m.result_id
+            WHERE m.entity_id = ? ORDER BY m.result_id
+        """, (entity["id"],))]
+        return entity
+    finally:
+        conn.close()
+
+@tracing.traced("db")
+def get_checkpoint(job):
+    """The cursor of a job's last completed step, None if it has none (never ran or finished)"""
+    conn = sqlite3.connect(_checkpoint_db(job))
+    row = conn.execute("SELECT cursor FROM checkpoints WHERE job = ?", (job,)).fetchone()
+    conn.close()
+    return json.loads(row[0]) if row else None
+
+@tracing.traced("db")
+def clear_checkpoint(job):
+    """Forget a job's checkpoint, after it finished"""
+    conn = sqlite3.connect(_checkpoint_db(job))
+    with conn:
+        conn.execute("DELETE FROM checkpoints WHERE job = ?", (job,))
+    conn.close()
+
+@tracing.traced("db")
 def forum_url_exists(forum_url):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
@@ -142,6 +1016,17 @@ def forum_url_exists(forum_url):
     conn.close()
     return exists
 
+@tracing.traced("db")
+def get_mod_count():
+    """Count entries in the results table"""
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM results")
+    count = c.fetchone()[0]
+    conn.close()
+    return count
+
+@tracing.traced("db")
 def contentdb_url_exists(contentdb_url):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
@@ -150,7 +1035,17 @@ def contentdb_url_exists(contentdb_url):
     conn.close()
     return exists
 
+@tracing.traced("db")
+def canonical_url_exists(canonical_url):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM results WHERE canonical_url=?", (canonical_url,))
+    exists = c.fetchone() is not None
+    conn.close()
+    return exists
+
 # Forum queue functions
+@tracing.traced("db")
 def add_forum_thread_to_queue(forum_url, title, thread_type):
     """Add a forum thread to the work queue"""
     conn = sqlite3.connect(FORUM_QUEUE_DB)
@@ -166,23 +1061,110 @@ def add_forum_thread_to_queue(forum_url, title, thread_type):
     finally:
         conn.close()
 
+@tracing.traced("db")
+def add_forum_threads_to_queue(threads, checkpoint=None):
+    """
+    Add (forum_url, title, type) threads to the work queue in one transaction,
+    together with the (job, cursor) checkpoint. Returns the URLs added.
+    """
+    conn = sqlite3.connect(FORUM_QUEUE_DB)
+    added = []
+    try:
+        with conn:
+            for forum_url, title, thread_type in threads:
+                cursor = conn.execute("INSERT OR IGNORE INTO forum_threads (forum_url, title, type) VALUES (?, ?, ?)",
+                                      (forum_url, title, thread_type))
+                if cursor.rowcount:
+                    added.append(forum_url)
+            _write_checkpoint(conn, checkpoint)
+        return added
+    finally:
+        conn.close()
+
+@tracing.traced("db")
 def get_unprocessed_forum_threads(limit=10):
-    """Get unprocessed forum threads from the queue"""
+    """Get unprocessed forum threads from the queue that are due for an attempt"""
     conn = sqlite3.connect(FORUM_QUEUE_DB)
     c = conn.cursor()
-    c.execute("SELECT id, forum_url, title, type FROM forum_threads WHERE processed=0 LIMIT ?", (limit,))
+    c.execute("""
+        SELECT id, forum_url, title, type FROM forum_threads
+        WHERE processed=? AND next_attempt_at <= ?
+        LIMIT ?
+    """, (QUEUE_PENDING, _timestamp(), limit))
     results = c.fetchall()
     conn.close()
     return results
 
-def mark_forum_thread_processed(thread_id):
-    """Mark a forum thread as processed"""
+@tracing.traced("db")
+def mark_forum_thread_processed(thread_id, fingerprint=None):
+    """
+    Mark a forum thread as processed and schedule its next recrawl.
+    `fingerprint` is the content_hash of the first post, used to detect changes.
+    """
     conn = sqlite3.connect(FORUM_QUEUE_DB)
     c = conn.cursor()
-    c.execute("UPDATE forum_threads SET processed=1 WHERE id=?", (thread_id,))
+    now = _timestamp()
+    c.execute("""
+        UPDATE forum_threads SET processed=?, error=NULL,
+            last_checked=?, next_check_at=datetime(?, '+' || check_interval || ' seconds'),
+            content_hash=COALESCE(?, content_hash)
+        WHERE id=?
+    """, (QUEUE_DONE, now, now, fingerprint, thread_id))
     conn.commit()
     conn.close()
 
+@tracing.traced("db")
+def get_processed_forum_threads():
+    """Get all successfully processed forum threads"""
+    conn = sqlite3.connect(FORUM_QUEUE_DB)
+    c = conn.cursor()
+    c.execute("SELECT id, forum_url, title, type FROM forum_threads WHERE processed=? ORDER BY id",
+              (QUEUE_DONE,))
+    results = c.fetchall()
+    conn.close()
+    return results
+
+@tracing.traced("db")
+def get_forum_threads_due_for_recheck(limit=100):
+    """Get processed forum threads whose next recrawl is due, most overdue first"""
+    conn = sqlite3.connect(FORUM_QUEUE_DB)
+    c = conn.cursor()
+    c.execute("""
+        SELECT id, forum_url, next_check_at FROM forum_threads
+        WHERE processed=? AND next_check_at <= ?
+        ORDER BY next_check_at
+        LIMIT ?
+    """, (QUEUE_DONE, _timestamp(), limit))
+    results = c.fetchall()
+    conn.close()
+    return results
+
+@tracing.traced("db")
+def record_forum_thread_check(thread_id, fingerprint):
+    """Record a recrawl of a forum thread; see _record_check"""
+    return _record_check(FORUM_QUEUE_DB, "forum_threads", thread_id, fingerprint)
+
+@tracing.traced("db")
+def postpone_forum_thread_check(thread_id):
+    """Retry a failed recrawl of a forum thread after MIN_CHECK_INTERVAL"""
+    _postpone_check(FORUM_QUEUE_DB, "forum_threads", thread_id)
+
+@tracing.traced("db")
+def record_forum_thread_failure(thread_id, error, kind=None):
+    """Record a failed attempt for a forum thread; see _record_failure"""
+    return _record_failure(FORUM_QUEUE_DB, "forum_threads", thread_id, error, kind)
+
+@tracing.traced("db")
+def requeue_dead_forum_threads():
+    """Move dead-lettered forum threads back into the queue"""
+    return _requeue_dead(FORUM_QUEUE_DB, "forum_threads")
+
+@tracing.traced("db")
+def get_forum_queue_status():
+    """Count forum threads by queue state"""
+    return _queue_status(FORUM_QUEUE_DB, "forum_threads")
+
+@tracing.traced("db")
 def forum_thread_in_queue(forum_url):
     """Check if a forum thread is already in the queue"""
     conn = sqlite3.connect(FORUM_QUEUE_DB)
@@ -193,13 +1175,14 @@ def forum_thread_in_queue(forum_url):
     return exists
 
 # Git queue functions
+@tracing.traced("db")
 def add_git_repo_to_queue(repo_url, source):
     """Add a git repo to the work queue"""
     conn = sqlite3.connect(GIT_QUEUE_DB)
     c = conn.cursor()
     try:
-        c.execute("INSERT INTO git_repos (repo_url, source) VALUES (?, ?)", 
-                 (repo_url, source))
+        c.execute("INSERT INTO git_repos (repo_url, source, canonical_url) VALUES (?, ?, ?)", 
+                 (repo_url, source, canonicalize_repo_url(repo_url) or repo_url))
         conn.commit()
         return True
     except sqlite3.IntegrityError:
@@ -208,6 +1191,7 @@ def add_git_repo_to_queue(repo_url, source):
     finally:
         conn.close()
 
+@tracing.traced("db")
 def get_unprocessed_git_repos(limit=10):
     """Get unprocessed git repos from the queue"""
     conn = sqlite3.connect(GIT_QUEUE_DB)
@@ -217,6 +1201,7 @@ def get_unprocessed_git_repos(limit=10):
     conn.close()
     return results
 
+@tracing.traced("db")
 def mark_git_repo_processed(repo_id, is_luanti_mod=None):
     """Mark a git repo as processed"""
     conn = sqlite3.connect(GIT_QUEUE_DB)
@@ -226,16 +1211,19 @@ def mark_git_repo_processed(repo_id, is_luanti_mod=None):
     conn.commit()
     conn.close()
 
+@tracing.traced("db")
 def git_repo_in_queue(repo_url):
     """Check if a git repo is already in the queue"""
     conn = sqlite3.connect(GIT_QUEUE_DB)
     c = conn.cursor()
-    c.execute("SELECT 1 FROM git_repos WHERE repo_url=?", (repo_url,))
+    c.execute("SELECT 1 FROM git_repos WHERE canonical_url=?",
+              (canonicalize_repo_url(repo_url) or repo_url,))
     exists = c.fetchone() is not None
     conn.close()
     return exists
 
 # Git hosts functions
+@tracing.traced("db")
 def add_git_host(host_url, host_type):
     """Add a discovered git host"""
     conn = sqlite3.connect(GIT_HOSTS_DB)
@@ -251,6 +1239,7 @@ def add_git_host(host_url, host_type):
     finally:
         conn.close()
 
+@tracing.traced("db")
 def get_git_hosts():
     """Get all discovered git hosts"""
     conn = sqlite3.connect(GIT_HOSTS_DB)
@@ -261,31 +1250,96 @@ def get_git_hosts():
     return results
 
 # Non-mod repos functions
+def _non_mod_repo_key(repo_url, reason=None):
+    """
+    Key of a non_mod_repos entry: the canonical URL of a repository on a
+    known forge, else the exact URL. Links that are not git repositories
+    (NON_MOD_NOT_GIT) always use the exact URL, so a link into a repository
+    (/tree/master, /issues) does not hide the repository itself.
+    """
+    if reason != NON_MOD_NOT_GIT and is_forge_url(repo_url):
+        return canonicalize_repo_url(repo_url)
+    return repo_url
+
+@tracing.traced("db")
 def add_non_mod_repo(repo_url, reason):
-    """Add a repo known to not be a mod"""
+    """
+    Add a repo known to not be a mod. The entry expires after the TTL for its
+    reason (NON_MOD_REASON_TTLS); expired entries are refreshed.
+    Returns False if an unexpired entry already exists.
+    """
+    now = _timestamp()
+    expires_at = _timestamp(NON_MOD_REASON_TTLS.get(reason, DEFAULT_NON_MOD_TTL))
+    key = _non_mod_repo_key(repo_url, reason)
     conn = sqlite3.connect(NON_MOD_REPOS_DB)
     c = conn.cursor()
     try:
-        c.execute("INSERT INTO non_mod_repos (repo_url, reason) VALUES (?, ?)", 
-                 (repo_url, reason))
+        c.execute("""
+            INSERT INTO non_mod_repos (repo_url, reason, checked_at, expires_at, canonical_url)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(canonical_url) WHERE canonical_url IS NOT NULL DO UPDATE SET
+                reason=excluded.reason, checked_at=excluded.checked_at, expires_at=excluded.expires_at
+            WHERE non_mod_repos.expires_at <= ?
+        """, (repo_url, reason, now, expires_at, key, now))
         conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        # Repo already exists
-        return False
+        added = c.rowcount > 0
     finally:
         conn.close()
+    if added and _non_mod_repo_cache is not None:
+        _non_mod_repo_cache[key] = expires_at
+    return added
 
+@tracing.traced("db")
 def is_known_non_mod_repo(repo_url):
-    """Check if a repo is known to not be a mod"""
+    """Check if a repo is known to not be a mod (and the entry has not expired)"""
+    now = _timestamp()
+    keys = list({repo_url, _non_mod_repo_key(repo_url)})
+    if _non_mod_repo_cache is not None:
+        hit = any(_non_mod_repo_cache.get(key, "") > now for key in keys)
+        metrics.cache_lookup("non_mod_repos", hit)
+        return hit
     conn = sqlite3.connect(NON_MOD_REPOS_DB)
     c = conn.cursor()
-    c.execute("SELECT 1 FROM non_mod_repos WHERE repo_url=?", (repo_url,))
+    c.execute(f"SELECT 1 FROM non_mod_repos WHERE canonical_url IN ({', '.join('?' * len(keys))}) AND expires_at > ?",
+              keys + [now])
     exists = c.fetchone() is not None
     conn.close()
+    metrics.cache_lookup("non_mod_repos", exists)
     return exists
 
+@tracing.traced("db")
+def load_non_mod_repo_cache():
+    """
+    Load unexpired non_mod_repos entries into memory. Afterwards
+    is_known_non_mod_repo() answers from memory and add_non_mod_repo() keeps
+    the cache in sync. Returns the number of cached entries.
+    """
+    global _non_mod_repo_cache
+    conn = sqlite3.connect(NON_MOD_REPOS_DB)
+    c = conn.cursor()
+    c.execute("SELECT canonical_url, expires_at FROM non_mod_repos WHERE expires_at > ?", (_timestamp(),))
+    _non_mod_repo_cache = dict(c.fetchall())
+    conn.close()
+    return len(_non_mod_repo_cache)
+
+def clear_non_mod_repo_cache():
+    """Drop the in-memory cache; lookups go to the database again"""
+    global _non_mod_repo_cache
+    _non_mod_repo_cache = None
+
+@tracing.traced("db")
+def purge_expired_non_mod_repos():
+    """Delete expired non_mod_repos entries; returns the number deleted"""
+    conn = sqlite3.connect(NON_MOD_REPOS_DB)
+    c = conn.cursor()
+    c.execute("DELETE FROM non_mod_repos WHERE expires_at <= ?", (_timestamp(),))
+    count = c.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
 # Enhanced Git work queue functions
+@tracing.traced("db")
 def init_git_work_queue():
     """Initialize enhanced git work queue database"""
     conn = sqlite3.connect(GIT_QUEUE_DB)
@@ -303,83 +1357,392 @@ def init_git_work_queue():
             processed_date TIMESTAMP
         )
     """)
+    _add_missing_columns(c, "git_work_queue",
+                         RETRY_COLUMNS + RECHECK_COLUMNS + [("aged_at", "TIMESTAMP")])
+    _add_canonical_url_column(c, "git_work_queue", "url", delete_duplicates=True)
+    # Dequeue walks pending items in priority order and skips those not yet due
+    c.execute("DROP INDEX IF EXISTS idx_git_work_queue_due")
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_git_work_queue_priority
+        ON git_work_queue (processed, priority DESC, next_attempt_at)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_git_work_queue_recheck
+        ON git_work_queue (processed, next_check_at)
+    """)
+    _init_checkpoints(c)
+    conn.commit()
+    conn.close()
+
+def _enqueue_git_repo(c, url, source, priority, metadata):
+    if priority is None:
+        priority = priority_for_source(source)
+    canonical_url = canonicalize_repo_url(url) or url
+    metadata_str = json.dumps(metadata) if metadata else None
+    c.execute("""
+        INSERT OR IGNORE INTO git_work_queue (url, source, priority, metadata, canonical_url)
+        VALUES (?, ?, ?, ?, ?)
+    """, (url, source, priority, metadata_str, canonical_url))
+    if c.rowcount:
+        return True
+    # Repository (or another spelling of its URL) already exists
+    c.execute("UPDATE git_work_queue SET priority=? WHERE canonical_url=? AND priority<?",
+              (priority, canonical_url, priority))
+    if metadata:
+        _merge_git_queue_metadata(c, canonical_url, metadata)
+    return False
+
+def _merge_git_queue_metadata(c, canonical_url, metadata):
+    # New metadata keys (e.g. the forum thread of a ContentDB repo) are added;
+    # a processed repository is validated again so the result gets them
+    row = c.execute("SELECT id, metadata FROM git_work_queue WHERE canonical_url=?", (canonical_url,)).fetchone()
+    existing = json.loads(row[1]) if row[1] else {}
+    merged = dict(metadata, **existing)
+    if merged == existing:
+        return
+    c.execute("""
+        UPDATE git_work_queue SET metadata=?,
+            processed=CASE WHEN processed=? THEN ? ELSE processed END,
+            next_attempt_at=CASE WHEN processed=? THEN ? ELSE next_attempt_at END
+        WHERE id=?
+    """, (json.dumps(merged), QUEUE_DONE, QUEUE_PENDING, QUEUE_DONE, EPOCH_TIMESTAMP, row[0]))
+
+@tracing.traced("db")
+def add_to_git_queue(url, source, priority=None, metadata=None):
+    """
+    Add a repository to the git work queue.
+    The priority defaults to the source's priority (see SOURCE_PRIORITIES).
+    URLs are deduplicated by canonical_url. If the repository is already queued,
+    its priority is raised if the new one is higher and new metadata keys are
+    added (a processed repository is then validated again).
+    """
+    conn = sqlite3.connect(GIT_QUEUE_DB)
+    try:
+        with conn:
+            return _enqueue_git_repo(conn.cursor(), url, source, priority, metadata)
+    finally:
+        conn.close()
+
+@tracing.traced("db")
+def add_repos_to_git_queue(urls, source, checkpoint=None):
+    """
+    Add repositories found by one source to the git work queue (as
+    add_to_git_queue) in one transaction, together with the (job, cursor)
+    checkpoint. Returns the number of new queue items.
+    """
+    conn = sqlite3.connect(GIT_QUEUE_DB)
+    try:
+        with conn:
+            c = conn.cursor()
+            added = sum(_enqueue_git_repo(c, url, source, None, None) for url in urls)
+            _write_checkpoint(c, checkpoint)
+        return added
+    finally:
+        conn.close()
+
+@tracing.traced("db")
+def get_due_git_queue_items(limit=10):
+    """Get due unprocessed items from the git work queue, highest priority first"""
+    conn = sqlite3.connect(GIT_QUEUE_DB)
+    c = conn.cursor()
+    c.execute("""
+        SELECT id, url, source, metadata FROM git_work_queue
+        WHERE processed=? AND next_attempt_at <= ?
+        ORDER BY priority DESC
+        LIMIT ?
+    """, (QUEUE_PENDING, _timestamp(), limit))
+    results = c.fetchall()
+    conn.close()
+    return results
+
+@tracing.traced("db")
+def mark_git_queue_item_processed(item_id, fingerprint=None):
+    """
+    Mark a git work queue item as successfully processed and schedule its next recrawl.
+    `fingerprint` is the content_hash of the detected metadata, used to detect changes.
+    """
+    conn = sqlite3.connect(GIT_QUEUE_DB)
+    c = conn.cursor()
+    now = _timestamp()
+    c.execute("""
+        UPDATE git_work_queue SET processed=?, error=NULL, processed_date=CURRENT_TIMESTAMP,
+            last_checked=?, next_check_at=datetime(?, '+' || check_interval || ' seconds'),
+            content_hash=COALESCE(?, content_hash)
+        WHERE id=?
+    """, (QUEUE_DONE, now, now, fingerprint, item_id))
     conn.commit()
     conn.close()
 
-def add_to_git_queue(url, source, priority=1, metadata=None):
-    """Add a repository to the git work queue"""
+@tracing.traced("db")
+def get_processed_git_queue_items():
+    """Get all successfully processed git work queue items"""
     conn = sqlite3.connect(GIT_QUEUE_DB)
     c = conn.cursor()
+    c.execute("SELECT id, url, metadata FROM git_work_queue WHERE processed=? ORDER BY id",
+              (QUEUE_DONE,))
+    results = c.fetchall()
+    conn.close()
+    return results
+
+@tracing.traced("db")
+def get_git_queue_items_due_for_recheck(limit=100):
+    """Get processed git work queue items (id, url, next_check_at, metadata) whose next recrawl is due, most overdue first"""
+    conn = sqlite3.connect(GIT_QUEUE_DB)
+    c = conn.cursor()
+    c.execute("""
+        SELECT id, url, next_check_at, metadata FROM git_work_queue
+        WHERE processed=? AND next_check_at <= ?
+        ORDER BY next_check_at
+        LIMIT ?
+    """, (QUEUE_DONE, _timestamp(), limit))
+    results = c.fetchall()
+    conn.close()
+    return results
+
+@tracing.traced("db")
+def record_git_queue_check(item_id, fingerprint):
+    """Record a recrawl of a git work queue item; see _record_check"""
+    return _record_check(GIT_QUEUE_DB, "git_work_queue", item_id, fingerprint)
+
+@tracing.traced("db")
+def postpone_git_queue_check(item_id):
+    """Retry a failed recrawl of a git work queue item after MIN_CHECK_INTERVAL"""
+    _postpone_check(GIT_QUEUE_DB, "git_work_queue", item_id)
+
+@tracing.traced("db")
+def age_git_queue_priorities():
+    """
+    Raise the priority of pending items by one level for every AGING_INTERVAL
+    they have waited since they were added (or last aged), up to MAX_AGED_PRIORITY.
+    Returns the number of aged items.
+    """
+    conn = sqlite3.connect(GIT_QUEUE_DB)
+    c = conn.cursor()
+    c.execute("""
+        UPDATE git_work_queue SET priority=priority+1, aged_at=?
+        WHERE processed=? AND priority<? AND COALESCE(aged_at, added_date) <= ?
+    """, (_timestamp(), QUEUE_PENDING, MAX_AGED_PRIORITY, _timestamp(-AGING_INTERVAL)))
+    count = c.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+@tracing.traced("db")
+def bump_git_queue_priorities(delta, source_prefix=None, urls=None):
+    """
+    Adjust the priority of pending git work queue items in bulk.
+
+    Args:
+        delta: Amount to add to the priority (negative to lower it)
+        source_prefix: Only items whose source starts with this (e.g. "forum")
+        urls: Only these repository URLs
+
+    Returns the number of updated items.
+    """
+    query = "UPDATE git_work_queue SET priority=priority+? WHERE processed=?"
+    params = [delta, QUEUE_PENDING]
+    if source_prefix:
+        query += " AND source LIKE ? ESCAPE '\\'"
+        params.append(source_prefix.replace("%", r"\%").replace("_", r"\_") + "%")
+    if urls is not None:
+        urls = list(urls)
+        if not urls:
+            return 0
+        query += f" AND url IN ({','.join('?' * len(urls))})"
+        params.extend(urls)
+    conn = sqlite3.connect(GIT_QUEUE_DB)
+    c = conn.cursor()
+    c.execute(query, params)
+    count = c.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+@tracing.traced("db")
+def record_git_queue_failure(item_id, error, kind=None):
+    """Record a failed attempt for a git work queue item; see _record_failure"""
+    return _record_failure(GIT_QUEUE_DB, "git_work_queue", item_id, error, kind)
+
+@tracing.traced("db")
+def requeue_dead_git_queue_items():
+    """Move dead-lettered git work queue items back into the queue"""
+    return _requeue_dead(GIT_QUEUE_DB, "git_work_queue")
+
+@tracing.traced("db")
+def get_git_queue_status():
+    """Count git work queue items by queue state"""
+    return _queue_status(GIT_QUEUE_DB, "git_work_queue")
+
+# Shared retry helpers for the work queue tables
+def _record_failure(db_path, table, item_id, error, kind=None):
+    """
+    Record a failed attempt: increment the attempt counter, store the error and
+    either schedule the next attempt with exponential backoff or move the item
+    to the dead-letter state (permanent error or too many attempts).
+
+    `kind` (TRANSIENT/PERMANENT) is derived from the error when not given.
+    Returns the new queue state (QUEUE_PENDING or QUEUE_DEAD).
+    """
+    kind = kind or classify_error(error)
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
     try:
-        metadata_str = json.dumps(metadata) if metadata else None
-        c.execute("""
-            INSERT INTO git_work_queue (url, source, priority, metadata) 
-            VALUES (?, ?, ?, ?)
-        """, (url, source, priority, metadata_str))
+        c.execute(f"SELECT attempts FROM {table} WHERE id=?", (item_id,))
+        row = c.fetchone()
+        attempts = ((row[0] if row else 0) or 0) + 1
+        if should_dead_letter(attempts, kind):
+            state = QUEUE_DEAD
+            next_attempt_at = EPOCH_TIMESTAMP
+        else:
+            state = QUEUE_PENDING
+            next_attempt_at = _timestamp(retry_delay(attempts))
+        c.execute(f"""
+            UPDATE {table} SET processed=?, attempts=?, next_attempt_at=?, error=?
+            WHERE id=?
+        """, (state, attempts, next_attempt_at, f"{kind}: {error}", item_id))
         conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False  # URL already exists
+        return state
+    finally:
+        conn.close()
+
+def _record_check(db_path, table, item_id, fingerprint):
+    """
+    Record a recrawl: adapt the check interval to whether the content changed
+    and schedule the next check. Changed items are put back into the work queue
+    so the regular workers re-extract them.
+
+    Returns True if the content changed since the last check.
+    """
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    try:
+        c.execute(f"SELECT content_hash, check_interval FROM {table} WHERE id=?", (item_id,))
+        row = c.fetchone()
+        if not row:
+            return False
+        old_fingerprint, interval = row
+        changed = old_fingerprint is not None and old_fingerprint != fingerprint
+        interval = next_check_interval(interval, changed)
+        now = _timestamp()
+        c.execute(f"""
+            UPDATE {table} SET content_hash=?, check_interval=?, last_checked=?, next_check_at=?
+            WHERE id=?
+        """, (fingerprint, interval, now, _timestamp(interval), item_id))
+        if changed:
+            c.execute(f"""
+                UPDATE {table} SET change_count=change_count+1,
+                    processed=?, attempts=0, next_attempt_at=?
+                WHERE id=?
+            """, (QUEUE_PENDING, EPOCH_TIMESTAMP, item_id))
+        conn.commit()
+        return changed
     finally:
         conn.close()
 
+def _postpone_check(db_path, table, item_id):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute(f"UPDATE {table} SET next_check_at=? WHERE id=?",
+              (_timestamp(MIN_CHECK_INTERVAL), item_id))
+    conn.commit()
+    conn.close()
+
+def _requeue_dead(db_path, table):
+    """Reset dead-lettered items so they are retried; returns the number requeued"""
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute(f"""
+        UPDATE {table} SET processed=?, attempts=0, next_attempt_at=?
+        WHERE processed=?
+    """, (QUEUE_PENDING, EPOCH_TIMESTAMP, QUEUE_DEAD))
+    count = c.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+def _queue_status(db_path, table):
+    """Return counts for pending (due now), waiting (backing off), processed and dead items"""
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    now = _timestamp()
+    c.execute(f"""
+        SELECT
+            SUM(processed=? AND next_attempt_at <= ?),
+            SUM(processed=? AND next_attempt_at > ?),
+            SUM(processed=?),
+            SUM(processed=?)
+        FROM {table}
+    """, (QUEUE_PENDING, now, QUEUE_PENDING, now, QUEUE_DONE, QUEUE_DEAD))
+    pending, waiting, processed, dead = c.fetchone()
+    conn.close()
+    return {
+        "pending": pending or 0,
+        "waiting": waiting or 0,
+        "processed": processed or 0,
+        "dead": dead or 0,
+    }
+
+@tracing.traced("db")
 def is_git_repo_in_queue(url):
     """Check if a git repository is already in the work queue"""
     conn = sqlite3.connect(GIT_QUEUE_DB)
     c = conn.cursor()
-    c.execute("SELECT 1 FROM git_work_queue WHERE url=?", (url,))
+    c.execute("SELECT 1 FROM git_work_queue WHERE canonical_url=?",
+              (canonicalize_repo_url(url) or url,))
     exists = c.fetchone() is not None
     conn.close()
     return exists
 
+@tracing.traced("db")
 def get_all_git_hosts(host_type=None):
-    """Get all git hosts, optionally filtered by type"""
+    """Get all git hosts (ordered by URL, so resumed searches see the same order), optionally filtered by type"""
     conn = sqlite3.connect(GIT_HOSTS_DB)
     c = conn.cursor()
     if host_type:
-        c.execute("SELECT host_url, host_type FROM git_hosts WHERE host_type=?", (host_type,))
+        c.execute("SELECT host_url, host_type FROM git_hosts WHERE host_type=? ORDER BY host_url", (host_type,))
     else:
-        c.execute("SELECT host_url, host_type FROM git_hosts")
+        c.execute("SELECT host_url, host_type FROM git_hosts ORDER BY host_url")
     results = c.fetchall()
     conn.close()
     return results
 
+def _insert_mod(c, name, mod_type, author, description, source, url, metadata=None):
+    # Parse metadata if it's a JSON string
+    if isinstance(metadata, str):
+        try:
+            metadata_dict = json.loads(metadata)
+        except:
+            metadata_dict = {}
+    else:
+        metadata_dict = metadata or {}
+
+    # Stored like save_result, so a package synced again updates its row
+    item = {
+        "repo_url": url,
+        "contentdb_url": metadata_dict.get('contentdb_url', ''),
+        "name": name,
+        "type": mod_type,
+        "author": author,
+        "description": description,
+        "short_description": metadata_dict.get('description', description),
+        "title": metadata_dict.get('title', name),
+        "tags": metadata_dict.get('tags', metadata_dict.get('topics', [])),
+        "license": metadata_dict.get('license', ''),
+        "media_license": metadata_dict.get('media_license', ''),
+        "depends": metadata_dict.get('depends', []),
+        "optional_depends": metadata_dict.get('optional_depends', []),
+        "min_version": metadata_dict.get('min_version', metadata_dict.get('min_minetest_version', '')),
+        "max_version": metadata_dict.get('max_version', metadata_dict.get('max_minetest_version', '')),
+    }
+    return _upsert_result(c, item, source, replace=True)
+
+@tracing.traced("db")
 def add_mod_to_db(name, mod_type, author, description, source, url, metadata=None):
     """Add a discovered mod to the main database"""
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     try:
-        # Parse metadata if it's a JSON string
-        if isinstance(metadata, str):
-            try:
-                metadata_dict = json.loads(metadata)
-            except:
-                metadata_dict = {}
-        else:
-            metadata_dict = metadata or {}
-        
-        # Insert the mod with all available information
-        c.execute("""
-            INSERT INTO results (
-                name, type, author, description, source, repo_url,
-                short_description, title, tags, depends, optional_depends,
-                min_version, max_version
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            name,
-            mod_type,
-            author,
-            description,
-            source,
-            url,
-            metadata_dict.get('description', description),
-            metadata_dict.get('title', name),
-            json.dumps(metadata_dict.get('topics', [])),
-            json.dumps(metadata_dict.get('depends', [])),
-            json.dumps(metadata_dict.get('optional_depends', [])),
-            metadata_dict.get('min_version', ''),
-            metadata_dict.get('max_version', '')
-        ))
+        _insert_mod(c, name, mod_type, author, description, source, url, metadata)
         conn.commit()
         return True
     except Exception as e:
@@ -387,3 +1750,21 @@ def add_mod_to_db(name, mod_type, author, description, source, url, metadata=Non
         return False
     finally:
         conn.close()
+
+@tracing.traced("db")
+def add_mods_to_db(mods, checkpoint=None):
+    """
+    Add discovered mods (dicts of add_mod_to_db's arguments) in one
+    transaction, together with the (job, cursor) checkpoint: either all of
+    them and the checkpoint are stored or none. Mods already stored (by
+    canonical URL) are updated. Returns (added, updated).
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        with conn:
+            c = conn.cursor()
+            added = sum(bool(_insert_mod(c, **mod)) for mod in mods)
+            _write_checkpoint(c, checkpoint)
+        return added, len(mods) - added
+    finally:
+        conn.close()
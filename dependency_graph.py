@@ -0,0 +1,237 @@
+"""
+In-memory dependency graph of the discovered mods.
+
+Mod names are interned to integers and the edges are kept in CSR form
+(compressed sparse rows: one offsets array per direction pointing into a flat
+targets array), so transitive closures, reverse dependencies and cycle
+checks are plain integer walks without database access.
+
+The graph is built from the dependencies edge table (see db_utils) and kept
+current incrementally: refresh() applies the mods logged in
+dependency_changes since the last refresh. Changed mods go into an overlay
+of adjacency lists; the CSR arrays are rebuilt once the overlay grows past
+REBUILD_FRACTION of the nodes.
+
+    graph = DependencyGraph.from_database()
+    graph.closure("mesecons_wires")         # everything it pulls in
+    graph.reverse_dependencies("default", transitive=True)
+    graph.find_cycle("a")                    # ["a", "b", "a"] or None
+"""
+from array import array
+
+from db_utils import get_dependency_changes, get_dependency_edges
+
+# Rebuild the CSR arrays when more than this fraction of nodes is patched
+REBUILD_FRACTION = 0.125
+MIN_REBUILD_PATCHES = 64
+
+
+class DependencyGraph:
+    """Directed graph mod -> dependency with required and optional edges"""
+
+    def __init__(self, edges=()):
+        self.ids = {}
+        self.names = []
+        self.seq = 0
+        self._forward_patch = {}
+        self._reverse_patch = {}
+        self._build([(self._intern(mod), self._intern(dep), bool(optional)) for mod, dep, optional in edges])
+
+    @classmethod
+    def from_database(cls):
+        """Build the graph from the dependencies table"""
+        seq, _ = get_dependency_changes()
+        graph = cls(get_dependency_edges())
+        graph.seq = seq
+        return graph
+
+    def refresh(self):
+        """Apply the dependency changes logged since the last refresh; returns the changed mods"""
+        seq, mods = get_dependency_changes(self.seq)
+        edges = {mod: ([], []) for mod in mods}
+        for mod, dep, optional in get_dependency_edges(mods):
+            edges[mod][1 if optional else 0].append(dep)
+        for mod, (depends, optional_depends) in edges.items():
+            self.update(mod, depends, optional_depends)
+        self.seq = seq
+        return mods
+
+    def _intern(self, name):
+        node = self.ids.get(name)
+        if node is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    def _build(self, edges):
+        """Build forward and reverse CSR arrays from (source, target, optional) node triples"""
+        self._forward = _csr(len(self.names), edges)
+        self._reverse = _csr(len(self.names), [(target, source, optional) for source, target, optional in edges])
+        self._forward_patch = {}
+        self._reverse_patch = {}
+
+    def _edges(self):
+        return [(node, target, optional) for node in range(len(self.names))
+                for target, optional in self._adjacent(self._forward, self._forward_patch, node)]
+
+    @staticmethod
+    def _adjacent(csr, patch, node):
+        """(target, optional) pairs of a node, from the overlay if it was patched"""
+        edges = patch.get(node)
+        if edges is not None:
+            return edges
+        offsets, targets, optional = csr
+        if node + 1 >= len(offsets):
+            return ()
+        start, end = offsets[node], offsets[node + 1]
+        return zip(targets[start:end], optional[start:end])
+
+    def update(self, mod, depends, optional_depends=()):
+        """Replace the dependencies of `mod`"""
+        node = self._intern(mod)
+        old = dict(self._adjacent(self._forward, self._forward_patch, node))
+        new = {self._intern(dep): False for dep in depends}
+        for dep in optional_depends:
+            new.setdefault(self._intern(dep), True)
+        if new == old:
+            return
+        self._forward_patch[node] = list(new.items())
+        for target in old.keys() | new.keys():
+            if old.get(target) == new.get(target):
+                continue
+            reverse = {source: optional for source, optional
+                       in self._adjacent(self._reverse, self._reverse_patch, target) if source != node}
+            if target in new:
+                reverse[node] = new[target]
+            self._reverse_patch[target] = list(reverse.items())
+        if len(self._forward_patch) + len(self._reverse_patch) > max(MIN_REBUILD_PATCHES,
+                                                                     REBUILD_FRACTION * len(self.names)):
+            self._build(self._edges())
+
+    def __contains__(self, mod):
+        return mod in self.ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def dependencies(self, mod, optional=False):
+        """Direct dependencies of `mod` (with optional=True including optional ones)"""
+        return self._walk(self._forward, self._forward_patch, mod, optional, transitive=False)
+
+    def closure(self, mod, optional=False):
+        """All mods `mod` pulls in, directly or transitively, in breadth-first order"""
+        return self._walk(self._forward, self._forward_patch, mod, optional, transitive=True)
+
+    def reverse_dependencies(self, mod, transitive=False, optional=False):
+        """Mods that depend on `mod` (directly, or also indirectly with transitive=True)"""
+        return self._walk(self._reverse, self._reverse_patch, mod, optional, transitive)
+
+    def _walk(self, csr, patch, mod, include_optional, transitive):
+        start = self.ids.get(mod)
+        if start is None:
+            return []
+        seen = {start}
+        order = []
+        queue = [start]
+        for node in queue:
+            for target, optional in self._adjacent(csr, patch, node):
+                if (optional and not include_optional) or target in seen:
+                    continue
+                seen.add(target)
+                order.append(target)
+                if transitive:
+                    queue.append(target)
+        return [self.names[node] for node in order]
+
+    def find_cycle(self, mod, optional=False):
+        """A dependency cycle through `mod` as a list of names (first == last), or None"""
+        start = self.ids.get(mod)
+        if start is None:
+            return None
+        parents = {}
+        queue = [start]
+        for node in queue:
+            for target, is_optional in self._adjacent(self._forward, self._forward_patch, node):
+                if is_optional and not optional:
+                    continue
+                if target == start:
+                    path = [start, node]
+                    while node != start:
+                        node = parents[node]
+                        path.append(node)
+                    return [self.names[node] for node in reversed(path)]
+                if target not in parents:
+                    parents[target] = node
+                    queue.append(target)
+        return None
+
+    def cycles(self, optional=False):
+        """All dependency cycles as lists of mutually dependent mods (strongly connected components)"""
+        # Iterative Tarjan
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+        counter = 0
+        for root in range(len(self.names)):
+            if root in index:
+                continue
+            work = [(root, iter(self._adjacent(self._forward, self._forward_patch, root)))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, edges = work[-1]
+                for target, is_optional in edges:
+                    if is_optional and not optional:
+                        continue
+                    if target not in index:
+                        index[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self._adjacent(self._forward, self._forward_patch, target))))
+                        break
+                    if target in on_stack:
+                        lowlink[node] = min(lowlink[node], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or self._has_self_loop(node, optional):
+                            components.append(sorted(self.names[member] for member in component))
+        return components
+
+    def _has_self_loop(self, node, optional):
+        return any(target == node and (optional or not is_optional)
+                   for target, is_optional in self._adjacent(self._forward, self._forward_patch, node))
+
+
+def _csr(node_count, edges):
+    """(offsets, targets, optional flags) arrays of edges sorted by source"""
+    counts = [0] * (node_count + 1)
+    for source, _, _ in edges:
+        counts[source + 1] += 1
+    for node in range(node_count):
+        counts[node + 1] += counts[node]
+    offsets = array("l", counts)
+    fill = list(counts[:-1])
+    targets = array("l", [0]) * len(edges)
+    optional = bytearray(len(edges))
+    for source, target, is_optional in edges:
+        position = fill[source]
+        targets[position] = target
+        optional[position] = is_optional
+        fill[source] += 1
+    return offsets, targets, optional
@@ -0,0 +1,149 @@
+"""
+Streaming export of the results table to JSON Lines, CSV or Parquet.
+
+Rows are read with fetchmany (db_utils.iter_results) and written as they
+arrive, so memory use is bounded by the batch size however large the table
+is. Every insert or change of a result gets a new revision; with a watermark
+file only rows changed since the previous export are written, and the file
+is advanced to the highest exported revision once the export is complete.
+Deleted results are not reported.
+
+Parquet needs pyarrow, which is optional; the other formats only use the
+standard library. Values are exported as stored (tags comma-separated,
+dependencies as JSON arrays).
+"""
+import csv
+import importlib.util
+import json
+import os
+import sys
+
+from db_utils import EXPORT_COLUMNS, iter_results
+
+FORMATS = ["jsonl", "csv", "parquet"]
+DEFAULT_COLUMNS = [column for column in EXPORT_COLUMNS if column != "canonical_url"]
+BATCH_SIZE = 1000
+_INTEGER_COLUMNS = {"id", "revision"}
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def parse_columns(text):
+    """Column list from "name,repo_url,..." (None: the default columns)"""
+    if not text:
+        return list(DEFAULT_COLUMNS)
+    columns = [column.strip() for column in text.split(",") if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)} (available: {', '.join(EXPORT_COLUMNS)})")
+    return columns
+
+
+def read_watermark(path):
+    """Revision stored in a watermark file, 0 if there is none"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_watermark(path, revision):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(f"{revision}\n")
+    os.replace(tmp, path)
+
+
+def write_jsonl(rows, columns, f):
+    count = 0
+    for row in rows:
+        f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(rows, columns, f):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_parquet(rows, columns, path, batch_size=BATCH_SIZE):
+    """Write row groups of batch_size rows; requires pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    schema = pa.schema([(column, pa.int64() if column in _INTEGER_COLUMNS else pa.string())
+                        for column in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema))
+            count += len(batch)
+    return count
+
+
+def export_results(output, fmt="jsonl", columns=None, mod_type=None, source=None, license=None,
+                   since_revision=0, batch_size=BATCH_SIZE):
+    """
+    Export results changed after since_revision to `output` (a path, or None /
+    "-" for stdout). Files are written under a temporary name and renamed when
+    complete. Returns (rows written, highest revision written or since_revision).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    columns = list(columns or DEFAULT_COLUMNS)
+    # The revision is always read to advance the watermark, even if not exported
+    query_columns = columns if "revision" in columns else columns + ["revision"]
+    revision_index = query_columns.index("revision")
+    last_revision = since_revision or 0
+
+    def rows():
+        nonlocal last_revision
+        for row in iter_results(query_columns, mod_type, source, license, since_revision, batch_size):
+            last_revision = row[revision_index]
+            yield row[:len(columns)]
+
+    to_stdout = output in (None, "-")
+    if fmt == "parquet":
+        if to_stdout:
+            raise ValueError("Parquet export needs an output file")
+        tmp = f"{output}.tmp"
+        try:
+            count = write_parquet(rows(), columns, tmp, batch_size)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        os.replace(tmp, output)
+        return count, last_revision
+
+    writer = write_jsonl if fmt == "jsonl" else write_csv
+    if to_stdout:
+        return writer(rows(), columns, sys.stdout), last_revision
+    tmp = f"{output}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            count = writer(rows(), columns, f)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, output)
+    return count, last_revision
@@ -5,26 +5,39 @@ from urllib.parse import urljoin
 import sys
 import os
 from git.git_web import GitWeb
+from retry_policy import PERMANENT
+import metrics
+import tracing
 
 # Add parent directory to path to import db_utils and git_utils
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from db_utils import (forum_url_exists, save_result, add_forum_thread_to_queue, 
+from db_utils import (forum_url_exists, add_forum_threads_to_queue, 
                       forum_thread_in_queue, get_unprocessed_forum_threads, 
-                      mark_forum_thread_processed, add_git_repo_to_queue)
+                      mark_forum_thread_processed, add_to_git_queue,
+                      record_forum_thread_failure, content_hash, QUEUE_DEAD,
+                      is_known_non_mod_repo, add_non_mod_repo,
+                      NON_MOD_NOT_GIT, get_checkpoint, clear_checkpoint,
+                      CHECKPOINT_FORUM)
 
 
 """
 Example HTML structure of the forum website can be found in forum_example
 """
 
-def fetch_forum_thread_list(forum_url="https://forum.luanti.org/viewforum.php?f=11", thread_types=None):
+def fetch_forum_thread_list(forum_url="https://forum.luanti.org/viewforum.php?f=11", thread_types=None,
+                            resume=False):
     """
     Fetch list of forum threads and add them to work queue.
+    All pages of the section are read (following the "next" links); the
+    threads of each page are queued in one transaction with a checkpoint
+    of the next page's URL.
     
     Args:
         forum_url: URL of the forum section
-        thread_types: List of thread types to look for (e.g., ["[mod]", "[game]", "[modpack]"])
+        thread_types: Title tags of the threads to queue (e.g., ["[mod]", "[game]", "[modpack]"]);
+            threads without one of them are skipped
+        resume: Continue at the page after the last one queued by an interrupted run
     
     Returns:
         List of thread URLs added to queue
@@ -32,41 +45,112 @@ def fetch_forum_thread_list(forum_url="https://forum.luanti.org/viewforum.php?f=
     if thread_types is None:
         thread_types = ["[mod]", "[mod pack]", "[modpack]", "[game]"]
     
-    resp = requests.get(forum_url)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+    job = f"{CHECKPOINT_FORUM}:{forum_url}"
+    page_url = forum_url
+    if resume:
+        checkpoint = get_checkpoint(job)
+        if checkpoint:
+            page_url = checkpoint["next"]
+            print(f"Resuming at {page_url}")
     
     added_threads = []
-    
-    for topic in soup.select(".topictitle"):
-        title = topic.text.strip()
-        link = topic.get("href")
-        
-        if not link.startswith("http"):
-            link = urljoin(forum_url, link)
-        
-        # Determine thread type
-        thread_type = "unknown"
-        title_lower = title.lower()
+    visited = set()
+    while page_url and page_url not in visited:
+        visited.add(page_url)
+        resp = requests.get(page_url)
+        resp.raise_for_status()
+        soup = BeautifulSoup(resp.text, "html.parser")
         
-        if any(prefix in title_lower for prefix in ["[mod]"]):
-            thread_type = "mod"
-        elif any(prefix in title_lower for prefix in ["[mod pack]", "[modpack]"]):
-            thread_type = "modpack"
-        elif "[game]" in title_lower:
-            thread_type = "game"
+        threads = []
+        for topic in soup.select(".topictitle"):
+            title = topic.text.strip()
+            link = topic.get("href")
+            
+            if not link.startswith("http"):
+                link = urljoin(page_url, link)
+            
+            # Determine thread type
+            thread_type = "unknown"
+            title_lower = title.lower()
+            # Only threads tagged with one of the requested types are queued
+            if not any(prefix in title_lower for prefix in thread_types):
+                continue
+            
+            if any(prefix in title_lower for prefix in ["[mod]"]):
+                thread_type = "mod"
+            elif any(prefix in title_lower for prefix in ["[mod pack]", "[modpack]"]):
+                thread_type = "modpack"
+            elif "[game]" in title_lower:
+                thread_type = "game"
+            
+            # Add to work queue if not already present
+            if not forum_thread_in_queue(link) and not forum_url_exists(link):
+                threads.append((link, title, thread_type))
         
-        # Add to work queue if not already present
-        if not forum_thread_in_queue(link) and not forum_url_exists(link):
-            if add_forum_thread_to_queue(link, title, thread_type):
-                added_threads.append(link)
+        next_link = soup.select_one('a[rel="next"]')
+        page_url = urljoin(page_url, next_link["href"]) if next_link and next_link.get("href") else None
+        added_threads += add_forum_threads_to_queue(threads, checkpoint=(job, {"next": page_url}) if page_url else None)
     
+    clear_checkpoint(job)
     return added_threads
 
+def parse_first_post(html):
+    """Return the content element of a thread page's first post, or None"""
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.select_one(".post .content")
+
+def first_post_links(first_post, forum_url):
+    """Absolute URLs of all links in a first post"""
+    links = []
+    for link in first_post.find_all("a", href=True):
+        href = link.get("href")
+        if not href:
+            continue
+        # Convert relative URLs to absolute
+        if not href.startswith("http"):
+            href = urljoin(forum_url, href)
+        links.append(href)
+    return links
+
+def first_post_fingerprint(first_post):
+    """Fingerprint of a thread's first post (text and links), used to detect changes"""
+    links = sorted(link.get("href") for link in first_post.find_all("a", href=True))
+    return content_hash(first_post.get_text() + "\n" + "\n".join(links))
+
+def fetch_forum_thread_fingerprint(forum_url):
+    """Fetch a forum thread and return the fingerprint of its first post"""
+    resp = requests.get(forum_url)
+    resp.raise_for_status()
+    first_post = parse_first_post(resp.text)
+    if not first_post:
+        raise ValueError("Could not find first post content")
+    return first_post_fingerprint(first_post)
+
+def forum_result(forum_url, repo_url, title, thread_type, mod_metadata):
+    """Build the results entry for a mod repository linked from a forum thread"""
+    result = {
+        "forum_url": forum_url,
+        "repo_url": repo_url,
+        "title": title,
+        "name": mod_metadata.get("name", title),
+        "description": mod_metadata.get("description", ""),
+        "author": mod_metadata.get("author", ""),
+        "type": mod_metadata.get("type", thread_type),
+        "short_description": mod_metadata.get("description", ""),
+    }
+    
+    # Add any additional metadata
+    for key in ("depends", "optional_depends", "min_version", "max_version"):
+        if key in mod_metadata:
+            result[key] = mod_metadata[key]
+    return result
+
+@tracing.traced("forum")
 def process_forum_thread(thread_id, forum_url, title, thread_type):
     """
     Process a single forum thread from the work queue.
-    Finds all git repository links in the first post and processes them.
+    Finds all git repository links in the first post and adds them to the
+    git work queue.
     
     Args:
         thread_id: Database ID of the thread
@@ -80,78 +164,62 @@ def process_forum_thread(thread_id, forum_url, title, thread_type):
     try:
         resp = requests.get(forum_url)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
         
         # Find the first post content
-        first_post = soup.select_one(".post .content")
+        first_post = parse_first_post(resp.text)
         if not first_post:
-            mark_forum_thread_processed(thread_id)
-            return {"status": "error", "message": "Could not find first post content"}
+            message = "Could not find first post content"
+            state = record_forum_thread_failure(thread_id, message, PERMANENT)
+            return {"status": "error", "message": message, "dead_lettered": state == QUEUE_DEAD}
         
-        # Extract all links from the first post
-        links = first_post.find_all("a", href=True)
         git_repos_found = []
-        luanti_mods_found = []
+        unchecked = []
         
-        for link in links:
-            href = link.get("href")
-            if not href:
+        for href in first_post_links(first_post, forum_url):
+            # Links known not to be Luanti repos cost no network requests
+            if is_known_non_mod_repo(href):
                 continue
             
-            # Convert relative URLs to absolute
-            if not href.startswith("http"):
-                href = urljoin(forum_url, href)
-            
-            # Check if it's a git repository
-            is_git = False
+            # Check if it's a git repository; only a definite answer is cached,
+            # hosts that could not be reached are checked again on retry
             try:
                 is_git = GitWeb.is_git_server(href)
             except Exception:
-                is_git = False
-            if is_git:
+                is_git = None
+            if is_git is None:
+                unchecked.append(href)
+            elif not is_git:
+                add_non_mod_repo(href, NON_MOD_NOT_GIT)
+            else:
                 git_repos_found.append(href)
                 
-                # Add to git work queue
-                add_git_repo_to_queue(href, f"forum:{forum_url}")
-                
-                # Check if it's a Luanti mod
-                is_mod, mod_metadata = check_luanti_mod_repository(href)
-                if is_mod:
-                    # Create result entry
-                    result = {
-                        "forum_url": forum_url,
-                        "repo_url": href,
-                        "title": title,
-                        "name": mod_metadata.get("name", title),
-                        "description": mod_metadata.get("description", ""),
-                        "author": mod_metadata.get("author", ""),
-                        "type": mod_metadata.get("type", thread_type),
-                        "short_description": mod_metadata.get("description", ""),
-                    }
-                    
-                    # Add any additional metadata
-                    if "depends" in mod_metadata:
-                        result["dependencies"] = ",".join(mod_metadata["depends"])
-                    if "optional_depends" in mod_metadata:
-                        result["optional_dependencies"] = ",".join(mod_metadata["optional_depends"])
-                    
-                    save_result(result, "forum")
-                    luanti_mods_found.append(result)
+                # Validated by the git work queue (forum-linked repos get
+                # PRIORITY_FORUM), which saves mods with the thread's URL
+                add_to_git_queue(href, f"forum:{forum_url}",
+                                 metadata={"forum_url": forum_url, "title": title, "thread_type": thread_type})
+        
+        if unchecked:
+            # Retry the thread later; repositories found so far stay queued
+            message = f"Could not check {len(unchecked)} link(s): {', '.join(unchecked)}"
+            state = record_forum_thread_failure(thread_id, message)
+            return {"status": "error", "message": message, "dead_lettered": state == QUEUE_DEAD,
+                    "git_repos_found": len(git_repos_found), "repos": git_repos_found}
         
         # Mark thread as processed
-        mark_forum_thread_processed(thread_id)
+        mark_forum_thread_processed(thread_id, first_post_fingerprint(first_post))
         
         return {
             "status": "success",
             "git_repos_found": len(git_repos_found),
-            "luanti_mods_found": len(luanti_mods_found),
-            "repos": git_repos_found,
-            "mods": luanti_mods_found
+            "repos": git_repos_found
         }
         
     except Exception as e:
         print(f"Error processing forum thread {forum_url}: {e}")
-        return {"status": "error", "message": str(e)}
+        # Schedule a retry with backoff (or dead-letter) so the thread is not
+        # re-fetched in every batch
+        state = record_forum_thread_failure(thread_id, e)
+        return {"status": "error", "message": str(e), "dead_lettered": state == QUEUE_DEAD}
 
 def process_forum_work_queue(batch_size=10):
     """
@@ -167,7 +235,10 @@ def process_forum_work_queue(batch_size=10):
     results = []
     
     for thread_id, forum_url, title, thread_type in threads:
-        result = process_forum_thread(thread_id, forum_url, title, thread_type)
+        with metrics.stage_item("forum_thread") as outcome, \
+                tracing.span("forum_thread", "stage", url=forum_url):
+            result = process_forum_thread(thread_id, forum_url, title, thread_type)
+            outcome["status"] = result.get("status", "unknown")
         result["thread_id"] = thread_id
         result["forum_url"] = forum_url
         result["title"] = title
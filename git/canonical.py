@@ -0,0 +1,116 @@
+"""
+Canonical repository URLs.
+
+The same repository is linked in many spellings: http/https, trailing slashes,
+a .git suffix, /tree/<branch> or /src/branch/<branch> paths, ssh clone URLs and
+different capitalisation of the owner. canonicalize_repo_url() maps all of them
+to one form so the databases can deduplicate on it.
+"""
+import re
+from urllib.parse import urlparse
+import requests
+
+import metrics
+
+GITHUB = 'github'
+GITLAB = 'gitlab'
+GITEA = 'gitea'
+BITBUCKET = 'bitbucket'
+
+# Known forge hosts; other hosts get the generic rules
+FORGE_HOSTS = {
+    'github.com': GITHUB,
+    'gitlab.com': GITLAB,
+    'framagit.org': GITLAB,
+    'salsa.debian.org': GITLAB,
+    'codeberg.org': GITEA,
+    'notabug.org': GITEA,
+    'gitea.com': GITEA,
+    'git.minetest.land': GITEA,
+    'bitbucket.org': BITBUCKET,
+}
+
+# Path segments that start a view inside a repository (branch, file, issues, ...)
+VIEW_SEGMENTS = {'-', 'tree', 'blob', 'src', 'raw', 'commits', 'commit', 'releases',
+                 'tags', 'issues', 'pulls', 'merge_requests', 'wiki', 'archive'}
+
+# Forge rules: number of path segments that name a repository (None = nested
+# namespaces up to the first view segment) and whether paths are case-insensitive
+FORGE_RULES = {
+    GITHUB: (2, True),
+    GITLAB: (None, True),
+    GITEA: (2, True),
+    BITBUCKET: (2, True),
+    None: (None, False),
+}
+
+_SCP_LIKE = re.compile(r'^(?:[\w.-]+@)?([\w.-]+):(?!//)(.+)$')
+
+_redirect_cache = {}
+
+
+def canonicalize_repo_url(url, resolve_redirects=False):
+    """
+    Return the canonical https URL of a repository, or None if `url` is empty
+    or has no host. With resolve_redirects=True the URL is requested once to
+    follow renames and transfers (results are cached per process).
+    """
+    canonical = _canonicalize(url)
+    if canonical and resolve_redirects:
+        return _resolve_redirects(canonical)
+    return canonical
+
+
+def is_forge_url(url):
+    """True if `url` is on a known forge host (FORGE_HOSTS), where canonical URLs name a repository"""
+    canonical = _canonicalize(url)
+    return bool(canonical) and urlparse(canonical).hostname in FORGE_HOSTS
+
+
+def _canonicalize(url):
+    if not url:
+        return None
+    url = url.strip()
+    scp = _SCP_LIKE.match(url)
+    if scp and '://' not in url:
+        # git@github.com:owner/repo.git
+        url = f"https://{scp.group(1)}/{scp.group(2)}"
+    elif '://' not in url:
+        url = f"https://{url}"
+
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if not host:
+        return None
+    if host.startswith('www.'):
+        host = host[4:]
+
+    segments = [segment for segment in parsed.path.split('/') if segment]
+    repo_segments, case_insensitive = FORGE_RULES[FORGE_HOSTS.get(host)]
+    for i, segment in enumerate(segments):
+        # Only cut after the owner/repo part so repos named e.g. "tree" survive
+        if i >= 2 and segment.lower() in VIEW_SEGMENTS:
+            segments = segments[:i]
+            break
+    if repo_segments:
+        segments = segments[:repo_segments]
+    if segments and segments[-1].lower().endswith('.git'):
+        segments[-1] = segments[-1][:-4]
+    path = '/'.join(segments)
+    if case_insensitive:
+        path = path.lower()
+    return f"https://{host}/{path}" if path else f"https://{host}"
+
+
+def _resolve_redirects(canonical):
+    metrics.cache_lookup("redirects", canonical in _redirect_cache)
+    if canonical not in _redirect_cache:
+        resolved = canonical
+        try:
+            resp = requests.head(canonical, allow_redirects=True, timeout=10)
+            if resp.status_code == 200 and resp.url:
+                resolved = _canonicalize(resp.url) or canonical
+        except requests.exceptions.RequestException:
+            pass
+        _redirect_cache[canonical] = resolved
+    return _redirect_cache[canonical]
@@ -1,4 +1,5 @@
 import abc
+import tracing
 
 class GitWeb(abc.ABC):
     def __init__(self, url, branch=None):
@@ -16,6 +17,11 @@ class GitWeb(abc.ABC):
     def get_folder(self, path, branch=None):
         pass
 
+    @abc.abstractmethod
+    def get_tree(self, branch=None):
+        """Paths of all files in the repository, from one recursive tree listing"""
+        pass
+
     @abc.abstractmethod
     def get_releases(self, branch=None):
         pass
@@ -29,6 +35,7 @@ class GitWeb(abc.ABC):
         pass
 
     @staticmethod
+    @tracing.traced("git", "GitWeb.from_url")
     def from_url(url, branch=None):
         from .github_web import GitHubWeb
         from .gitlab_web import GitLabWeb
@@ -43,11 +50,20 @@ class GitWeb(abc.ABC):
 
     @staticmethod
     def is_git_server(url):
+        """
+        Whether url is hosted on a supported git server.
+        Returns None instead of False when a probe could not reach the host,
+        so callers can tell "not a git server" from "could not check".
+        """
         from .github_web import GitHubWeb
         from .gitlab_web import GitLabWeb
         from .gitea_forgejo_web import GiteaForgejoWeb
-        return (
-            GitHubWeb.is_github_url(url) or
-            GitLabWeb.is_gitlab_url(url) or
-            GiteaForgejoWeb.is_gitea_or_forgejo_url(url)
-        )
+        if GitHubWeb.is_github_url(url):
+            return True
+        unknown = False
+        for probe in (GitLabWeb.is_gitlab_url, GiteaForgejoWeb.is_gitea_or_forgejo_url):
+            found = probe(url)
+            if found:
+                return True
+            unknown = unknown or found is None
+        return None if unknown else False
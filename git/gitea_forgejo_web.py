@@ -2,32 +2,36 @@ import requests
 from urllib.parse import urlparse
 from .git_web import GitWeb
 import base64
+import tracing
+from retry_policy import is_not_found
 
 class GiteaForgejoWeb(GitWeb):
     @staticmethod
+    @tracing.traced("probe")
     def is_gitea_or_forgejo_url(url):
         parsed = urlparse(url)
         
-        # Try to detect by making a request to the base URL
+        # Try to detect by making a request to the base URL; None means the
+        # host could not be checked (server or network error)
         base_url = f"{parsed.scheme}://{parsed.netloc}"
         try:
             resp = requests.get(base_url, timeout=5)
-            if resp.status_code == 200:
-                text = resp.text
-                # Recognize Gitea/Forgejo by common markers
-                if 'href="https://about.gitea.com/"' in text:
-                    return True
-                if 'href="https://forgejo.org/"' in text:
-                    return True
-                if 'Powered by Gitea' in text:
-                    return True
-                if 'Powered by Forgejo' in text:
-                    return True
-                # Check for meta generator tag
-                if 'content="Gitea"' in text or 'content="Forgejo"' in text:
-                    return True
-        except Exception:
-            pass
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            return False if is_not_found(e) else None
+        text = resp.text
+        # Recognize Gitea/Forgejo by common markers
+        if 'href="https://about.gitea.com/"' in text:
+            return True
+        if 'href="https://forgejo.org/"' in text:
+            return True
+        if 'Powered by Gitea' in text:
+            return True
+        if 'Powered by Forgejo' in text:
+            return True
+        # Check for meta generator tag
+        if 'content="Gitea"' in text or 'content="Forgejo"' in text:
+            return True
         return False
 
     def __init__(self, url, branch=None):
@@ -51,6 +55,7 @@ class GiteaForgejoWeb(GitWeb):
         self._fetch_repo_info()
         self.git_clone_url = self._repo_info.get('clone_url')
     
+    @tracing.traced("git")
     def _fetch_repo_info(self):
         """Fetch repository information from Gitea API"""
         api_url = f"{self.base_url}/api/v1/repos/{self.owner}/{self.repo}"
@@ -63,6 +68,7 @@ class GiteaForgejoWeb(GitWeb):
             return self._repo_info.get('default_branch', 'main')
         return 'main'
 
+    @tracing.traced("git")
     def get_file(self, path, branch=None):
         if not self.owner or not self.repo:
             return None
@@ -96,6 +102,25 @@ class GiteaForgejoWeb(GitWeb):
             return response.json()
         return None
 
+    @tracing.traced("git")
+    def get_tree(self, branch=None):
+        if not self.owner or not self.repo:
+            return None
+        branch = branch or getattr(self, 'branch', None) or self._get_default_branch()
+        api_url = f"{self.base_url}/api/v1/repos/{self.owner}/{self.repo}/git/trees/{branch}"
+        paths = []
+        page = 1
+        # Large trees are paginated
+        while True:
+            response = requests.get(api_url, params={"recursive": "true", "page": page, "per_page": 1000},
+                                    timeout=10)
+            response.raise_for_status()
+            tree = response.json()
+            paths += [entry["path"] for entry in tree.get("tree") or [] if entry.get("type") == "blob"]
+            if not tree.get("truncated") or not tree.get("tree"):
+                return paths
+            page += 1
+
     def get_releases(self, branch=None):
         if not self.owner or not self.repo:
             return None
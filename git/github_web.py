@@ -2,9 +2,11 @@ from github import Github
 import re
 import base64
 from .git_web import GitWeb
+import tracing
 
 class GitHubWeb(GitWeb):
     @staticmethod
+    @tracing.traced("probe")
     def is_github_url(url):
         return re.match(r'https://github\.com/[\w\-\.]+/[\w\-\.]+/?$', url)
 
@@ -14,7 +16,8 @@ class GitHubWeb(GitWeb):
         if match:
             self.owner, self.repo = match.groups()
             self.g = Github()
-            self.repo_obj = self.g.get_repo(f"{self.owner}/{self.repo}")
+            with tracing.span("Github.get_repo", "git", repo=f"{self.owner}/{self.repo}"):
+                self.repo_obj = self.g.get_repo(f"{self.owner}/{self.repo}")
             self.git_clone_url = self.repo_obj.clone_url
         else:
             raise ValueError(f"Invalid GitHub URL: {url}")
@@ -22,6 +25,7 @@ class GitHubWeb(GitWeb):
     def _get_default_branch(self):
         return self.repo_obj.default_branch
 
+    @tracing.traced("git")
     def get_file(self, path, branch=None):
         branch = branch or getattr(self, 'branch', None) or self._get_default_branch()
         file_content = self.repo_obj.get_contents(path, ref=branch)
@@ -31,6 +35,24 @@ class GitHubWeb(GitWeb):
         branch = branch or getattr(self, 'branch', None) or self._get_default_branch()
         return self.repo_obj.get_contents(path, ref=branch)
 
+    @tracing.traced("git")
+    def get_tree(self, branch=None):
+        branch = branch or getattr(self, 'branch', None) or self._get_default_branch()
+        tree = self.repo_obj.get_git_tree(branch, recursive=True)
+        if tree.truncated:
+            # Over the limit of one recursive listing: list one directory at a time
+            return self._walk_tree(branch)
+        return [element.path for element in tree.tree if element.type == "blob"]
+
+    def _walk_tree(self, sha, prefix=""):
+        paths = []
+        for element in self.repo_obj.get_git_tree(sha).tree:
+            if element.type == "blob":
+                paths.append(f"{prefix}{element.path}")
+            elif element.type == "tree":
+                paths += self._walk_tree(element.sha, f"{prefix}{element.path}/")
+        return paths
+
     def get_releases(self, branch=None):
         return self.repo_obj.get_releases()
 
@@ -3,22 +3,31 @@ import requests
 import base64
 from urllib.parse import urlparse
 from .git_web import GitWeb
+import tracing
+from retry_policy import is_not_found
 
 class GitLabWeb(GitWeb):
     @staticmethod
+    @tracing.traced("probe")
     def is_gitlab_url(url):
         # Accept any https://<domain>/<namespace>/<repo> and check manifest.json
         parsed = urlparse(url)
         path_parts = parsed.path.strip('/').split('/')
         if len(path_parts) < 2:
             return False
-        # Try to fetch manifest.json
+        # Try to fetch manifest.json; None means the host could not be checked
+        # (server or network error), False that it is definitely not GitLab
         manifest_url = f"{parsed.scheme}://{parsed.netloc}/-/manifest.json"
-        resp = requests.get(manifest_url, timeout=3)
-        if resp.status_code == 200:
+        try:
+            resp = requests.get(manifest_url, timeout=3)
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            return False if is_not_found(e) else None
+        try:
             manifest = resp.json()
-            return manifest.get("name") == "GitLab"
-        return False
+        except ValueError:
+            return False
+        return isinstance(manifest, dict) and manifest.get("name") == "GitLab"
 
     def __init__(self, url, branch=None):
         super().__init__(url, branch)
@@ -30,7 +39,8 @@ class GitLabWeb(GitWeb):
             self.base_url = f"{parsed.scheme}://{parsed.netloc}"
             self.project_path = f"{self.owner}/{self.repo}"
             self.gl = gitlab.Gitlab(self.base_url)
-            self.project = self.gl.projects.get(self.project_path)
+            with tracing.span("Gitlab.projects.get", "git", project=self.project_path):
+                self.project = self.gl.projects.get(self.project_path)
             self.git_clone_url = self.project.attributes.get('http_url_to_repo')
         else:
             raise ValueError("URL does not contain enough path parts to determine owner and repo.")
@@ -38,6 +48,7 @@ class GitLabWeb(GitWeb):
     def _get_default_branch(self):
         return self.project.attributes.get('default_branch', 'master')
 
+    @tracing.traced("git")
     def get_file(self, path, branch=None):
         branch = branch or getattr(self, 'branch', None) or self._get_default_branch()
         f = self.project.files.get(file_path=path, ref=branch)
@@ -47,6 +58,12 @@ class GitLabWeb(GitWeb):
         branch = branch or getattr(self, 'branch', None) or self._get_default_branch()
         return self.project.repository_tree(path=path, ref=branch)
 
+    @tracing.traced("git")
+    def get_tree(self, branch=None):
+        branch = branch or getattr(self, 'branch', None) or self._get_default_branch()
+        items = self.project.repository_tree(ref=branch, recursive=True, get_all=True, per_page=100)
+        return [item["path"] for item in items if item["type"] == "blob"]
+
     def get_releases(self, branch=None):
         return self.project.releases.list()
 
@@ -0,0 +1,186 @@
+"""
+Local cache of bare mirror repositories for pack builds.
+
+Every repository is mirrored once (git clone --mirror) into the cache
+directory and later only updated with incremental fetches. Pack builds check
+out from the mirror on local disk: a hardlinked local clone, or with
+shallow=True a --depth 1 clone over file://. Checkouts do not use alternates
+(--reference / worktrees), so packs stay valid when their mirror is evicted;
+their origin points at the real repository URL.
+
+Concurrent use is safe across threads and processes: each mirror has a lock
+file, held exclusively while the mirror is created, fetched or evicted and
+shared while a checkout reads from it. evict() removes the least recently
+used mirrors until the cache fits into max_bytes; mirrors in use are skipped.
+A mirror evicted between a checkout's update and its shared lock is created
+again.
+"""
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+
+from git.canonical import canonicalize_repo_url
+
+# Mirrors fetched less than this many seconds ago are used without fetching
+DEFAULT_REFRESH_AFTER = 600
+GIT_TIMEOUT = 600
+# Times a checkout re-creates a mirror that was evicted before it could read it
+CHECKOUT_ATTEMPTS = 3
+_FETCHED_MARKER = "mirror-fetched"
+
+
+def git_env():
+    """Environment for git subprocesses: never ask for credentials"""
+    return dict(os.environ, GIT_TERMINAL_PROMPT="0")
+
+
+def parse_size(text):
+    """Parse sizes like "500M", "20G" or "1048576" into bytes"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    factor = 1024 ** " KMGT".index(match.group(2).upper() or " ")
+    return int(float(match.group(1)) * factor)
+
+
+def _run_git(args, cwd=None):
+    try:
+        result = subprocess.run(["git"] + args, cwd=cwd, capture_output=True, text=True, env=git_env(),
+                                timeout=GIT_TIMEOUT, stdin=subprocess.DEVNULL)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(str(e))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"git {args[0]} exited with {result.returncode}")
+    return result.stdout
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class MirrorCache:
+    """Bare mirrors of remote repositories in `directory`"""
+
+    def __init__(self, directory, max_bytes=None, refresh_after=DEFAULT_REFRESH_AFTER):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.refresh_after = refresh_after
+        os.makedirs(directory, exist_ok=True)
+
+    def mirror_path(self, repo_url):
+        """Mirror directory of a repository; URL variants of one repository share it"""
+        key = canonicalize_repo_url(repo_url) or repo_url.rstrip("/")
+        slug = re.sub(r"[^\w.-]+", "_", key.split("://", 1)[-1]).strip("_")[-60:]
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.directory, f"{slug}-{digest}.git")
+
+    @contextmanager
+    def _lock(self, mirror, shared=False, blocking=True):
+        """Hold the lock of a mirror; yields False if blocking=False and it is taken"""
+        with open(f"{mirror}.lock", "a") as lock_file:
+            flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(self, repo_url):
+        """Create the mirror of `repo_url` or fetch new commits into it; returns its path"""
+        mirror = self.mirror_path(repo_url)
+        marker = os.path.join(mirror, _FETCHED_MARKER)
+        with self._lock(mirror):
+            if not os.path.isdir(mirror):
+                tmp = f"{mirror}.tmp"
+                shutil.rmtree(tmp, ignore_errors=True)
+                try:
+                    _run_git(["clone", "--quiet", "--mirror", "--", repo_url, tmp])
+                except RuntimeError:
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    raise
+                os.replace(tmp, mirror)
+            else:
+                try:
+                    fetched = os.path.getmtime(marker)
+                except OSError:
+                    fetched = 0
+                if time.time() - fetched >= self.refresh_after:
+                    _run_git(["fetch", "--quiet", "--prune", "origin"], cwd=mirror)
+            with open(marker, "w"):
+                pass
+        return mirror
+
+    def checkout(self, repo_url, target_dir, shallow=True):
+        """Update the mirror and clone it to `target_dir`; returns None or an error message"""
+        try:
+            for _ in range(CHECKOUT_ATTEMPTS):
+                mirror = self.update(repo_url)
+                with self._lock(mirror, shared=True):
+                    # evict() may have removed the mirror between update()
+                    # releasing its lock and this one being taken
+                    if not os.path.isdir(mirror):
+                        continue
+                    if shallow:
+                        _run_git(["clone", "--quiet", "--depth", "1", "--", f"file://{os.path.abspath(mirror)}",
+                                  target_dir])
+                    else:
+                        _run_git(["clone", "--quiet", "--local", "--", mirror, target_dir])
+                    # Marks the mirror as used for eviction
+                    os.utime(f"{mirror}.lock")
+                    break
+            else:
+                raise RuntimeError(f"{mirror} was evicted {CHECKOUT_ATTEMPTS} times during checkout")
+            _run_git(["remote", "set-url", "origin", repo_url], cwd=target_dir)
+        except RuntimeError as e:
+            shutil.rmtree(target_dir, ignore_errors=True)
+            return str(e)
+        return None
+
+    def mirrors(self):
+        """(path, size in bytes, last use) of all mirrors, least recently used first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".git") or not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.path.getmtime(f"{path}.lock")
+            except OSError:
+                last_used = 0
+            entries.append((path, _directory_size(path), last_used))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used mirrors until the cache fits into max_bytes; returns the removed paths"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return []
+        entries = self.mirrors()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            with self._lock(path, blocking=False) as locked:
+                if not locked:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed.append(path)
+        return removed
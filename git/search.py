@@ -0,0 +1,198 @@
+"""
+Git work queue processing for Luanti mod discovery
+"""
+import json
+import sys
+import os
+import requests
+
+# Add parent directory to path to import db_utils
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import metrics
+import tracing
+from db_utils import (get_due_git_queue_items, mark_git_queue_item_processed,
+                      record_git_queue_failure, add_non_mod_repo, save_result, save_contents,
+                      content_hash, is_known_non_mod_repo, is_git_repo_in_queue, canonical_url_exists,
+                      add_repos_to_git_queue, get_all_git_hosts, get_checkpoint, clear_checkpoint,
+                      NON_MOD_NO_CONF, NON_MOD_NOT_FOUND, QUEUE_DEAD, CHECKPOINT_GIT_SEARCH)
+from retry_policy import is_not_found
+from .utils import check_luanti_mod_repository
+from .canonical import canonicalize_repo_url
+
+
+def repo_fingerprint(metadata):
+    """Fingerprint of detected repository metadata, used to detect changes"""
+    return content_hash(json.dumps(metadata, sort_keys=True))
+
+
+def fetch_repo_fingerprint(url, branch=None):
+    """
+    Re-detect a repository and return the fingerprint of its metadata.
+    Contents are not enumerated; a change is re-queued and process_git_repo
+    lists them.
+    """
+    _is_mod, metadata = check_luanti_mod_repository(url, branch, raise_errors=True)
+    return repo_fingerprint(metadata)
+
+
+def git_result(url, canonical_url, queue_metadata, metadata):
+    """Build the results entry for a mod repository from the git work queue"""
+    result = {
+        "repo_url": url,
+        "canonical_url": canonical_url,
+        "forum_url": queue_metadata.get("forum_url", ""),
+        "contentdb_url": queue_metadata.get("contentdb_url", ""),
+        "name": metadata.get("name", ""),
+        "title": metadata.get("title") or queue_metadata.get("title", ""),
+        "description": metadata.get("description", ""),
+        "short_description": metadata.get("description", ""),
+        "author": metadata.get("author", ""),
+        "type": metadata.get("type", queue_metadata.get("thread_type", "unknown")),
+    }
+    for key in ("depends", "optional_depends", "min_version", "max_version"):
+        if key in metadata:
+            result[key] = metadata[key]
+    return result
+
+
+def process_git_repo(item_id, url, source, metadata=None):
+    """
+    Validate a single repository from the git work queue.
+    Failures are recorded on the queue item and retried later with backoff,
+    or dead-lettered if the error is permanent.
+
+    Args:
+        item_id: Database ID of the queue item
+        url: Repository URL
+        source: Where the repository was found (e.g. "contentdb", "forum:<url>")
+        metadata: Queue item metadata (may contain "branch", "forum_url", "contentdb_url",
+            and the forum thread's "title" and "thread_type")
+
+    Returns:
+        Dictionary with processing results
+    """
+    queue_metadata = metadata or {}
+    if is_known_non_mod_repo(url):
+        # Negative cache hit: no network requests until the entry expires
+        mark_git_queue_item_processed(item_id)
+        return {"status": "skipped", "is_luanti_mod": False, "metadata": {}}
+    try:
+        canonical_url = canonicalize_repo_url(url)
+        if not canonical_url_exists(canonical_url):
+            # Only repositories not stored under this URL are requested to
+            # follow renames: one already queued under its new URL does not
+            # need to be validated twice
+            resolved = canonicalize_repo_url(url, resolve_redirects=True)
+            if resolved != canonical_url and is_git_repo_in_queue(resolved):
+                mark_git_queue_item_processed(item_id)
+                return {"status": "duplicate", "canonical_url": resolved}
+            canonical_url = resolved
+        is_mod, metadata = check_luanti_mod_repository(url, queue_metadata.get("branch"),
+                                                       raise_errors=True, contents=True)
+        if is_mod:
+            save_result(git_result(url, canonical_url, queue_metadata, metadata), "git")
+            if "contents" in metadata:
+                save_contents(canonical_url, metadata["contents"])
+        else:
+            add_non_mod_repo(url, NON_MOD_NO_CONF)
+        # The fingerprint leaves out the contents, as fetch_repo_fingerprint does
+        fingerprint = repo_fingerprint({key: value for key, value in metadata.items() if key != "contents"})
+        mark_git_queue_item_processed(item_id, fingerprint)
+        return {"status": "success", "is_luanti_mod": is_mod, "metadata": metadata}
+    except Exception as e:
+        print(f"Error processing git repository {url}: {e}")
+        if is_not_found(e):
+            # Deleted or private repositories are not requested again until the entry expires
+            add_non_mod_repo(url, NON_MOD_NOT_FOUND)
+        state = record_git_queue_failure(item_id, e)
+        return {"status": "error", "message": str(e), "dead_lettered": state == QUEUE_DEAD}
+
+
+def process_git_work_queue(batch_size=10):
+    """
+    Process a batch of due repositories from the git work queue, highest priority first.
+
+    Args:
+        batch_size: Number of repositories to process in this batch
+
+    Returns:
+        List of processing results
+    """
+    items = get_due_git_queue_items(batch_size)
+    results = []
+
+    for item_id, url, source, metadata in items:
+        with metrics.stage_item("git_repo") as outcome, tracing.span("git_repo", "stage", url=url):
+            result = process_git_repo(item_id, url, source, json.loads(metadata) if metadata else None)
+            outcome["status"] = result.get("status", "unknown")
+        result["item_id"] = item_id
+        result["url"] = url
+        results.append(result)
+
+    return results
+
+
+# Hosts searched in addition to the discovered hosts in git_hosts.db
+DEFAULT_SEARCH_HOSTS = [
+    ("https://github.com", "github"),
+    ("https://gitlab.com", "gitlab"),
+    ("https://codeberg.org", "gitea"),
+]
+
+
+def _search_host(host_url, host_type, keyword, max_results):
+    """Return repository URLs on one git host matching a keyword"""
+    if host_type == "github":
+        from github import Github
+        repos = Github().search_repositories(query=keyword)
+        return [repo.html_url for repo in repos[:max_results]]
+    if host_type == "gitlab":
+        import gitlab
+        projects = gitlab.Gitlab(host_url).projects.list(search=keyword, per_page=max_results,
+                                                         get_all=False)
+        return [project.web_url for project in projects]
+    response = requests.get(f"{host_url}/api/v1/repos/search",
+                            params={"q": keyword, "limit": max_results}, timeout=10)
+    response.raise_for_status()
+    return [repo["html_url"] for repo in response.json().get("data", [])]
+
+
+def search_all_git_servers(keywords, max_results_per_host=50, resume=False):
+    """
+    Search all known git hosts for repositories matching the keywords and add
+    them to the git work queue (as low-priority search hits).
+    The hits of each (host, keyword) search are queued in one transaction
+    with a checkpoint; resume=True skips the searches an interrupted run
+    completed. A failed search stops the checkpoint from advancing, so a
+    resumed run repeats it.
+
+    Returns:
+        List of repository URLs found
+    """
+    hosts = dict(DEFAULT_SEARCH_HOSTS)
+    hosts.update(get_all_git_hosts())
+    searches = [(host_url, host_type, keyword) for host_url, host_type in hosts.items() for keyword in keywords]
+    if resume:
+        checkpoint = get_checkpoint(CHECKPOINT_GIT_SEARCH)
+        steps = [(host_url, keyword) for host_url, _, keyword in searches]
+        if checkpoint and (checkpoint["host"], checkpoint["keyword"]) in steps:
+            done = steps.index((checkpoint["host"], checkpoint["keyword"])) + 1
+            print(f"Resuming git search after {done} of {len(searches)} searches")
+            searches = searches[done:]
+    found = []
+    complete = True
+    for host_url, host_type, keyword in searches:
+        try:
+            urls = _search_host(host_url, host_type, keyword, max_results_per_host)
+        except Exception as e:
+            print(f"Error searching {host_url} for '{keyword}': {e}")
+            complete = False
+            continue
+        add_repos_to_git_queue(urls, f"search:{host_url}",
+                               checkpoint=(CHECKPOINT_GIT_SEARCH, {"host": host_url, "keyword": keyword})
+                               if complete else None)
+        found.extend(urls)
+    if complete:
+        clear_checkpoint(CHECKPOINT_GIT_SEARCH)
+    return found
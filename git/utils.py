@@ -0,0 +1,32 @@
+"""
+Helpers for checking git repositories for Luanti content
+"""
+from mod_type_detector import detect_repo_type, RepoType
+from .git_web import GitWeb
+
+
+def check_luanti_mod_repository(repo_url, branch=None, raise_errors=False, contents=False):
+    """
+    Check if a repository contains a Luanti mod, modpack or game.
+    With contents=True the mods inside modpacks and games are listed in
+    metadata["contents"].
+    Returns: (is_luanti_content, metadata)
+    """
+    repo_type, metadata = detect_repo_type(repo_url, branch, raise_errors=raise_errors, contents=contents)
+    if repo_type == RepoType.UNKNOWN:
+        return False, metadata
+    metadata.setdefault('type', repo_type)
+    return True, metadata
+
+
+def get_repository_info(repo_url, branch=None):
+    """Get basic information about a repository from its git server"""
+    git = GitWeb.from_url(repo_url, branch)
+    return {
+        'url': git.url,
+        'owner': git.owner,
+        'repo': git.repo,
+        'clone_url': git.git_clone_url,
+        'issues': git.get_issue_count(),
+        'forks': git.get_forks(),
+    }
@@ -0,0 +1,54 @@
+"""
+Shared HTTP layer.
+
+All HTTP traffic of the crawler goes through requests: our own modules call
+requests directly and PyGithub / python-gitlab use requests sessions
+internally. Instead of wrapping every call site, this module hooks
+requests.adapters.HTTPAdapter.send once and runs it through a chain of
+middlewares, so instrumentation sees every request regardless of which
+library made it.
+
+A middleware is a callable `middleware(send, request, **kwargs)` that must
+call `send(request, **kwargs)` (or return a response of its own) and return
+the response.
+"""
+import threading
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+_original_send = HTTPAdapter.send
+_middlewares = []
+_lock = threading.Lock()
+
+
+def add_middleware(middleware):
+    """Register a middleware (once) and make sure the adapter hook is installed"""
+    with _lock:
+        if middleware not in _middlewares:
+            _middlewares.append(middleware)
+        HTTPAdapter.send = _send
+
+
+def remove_middleware(middleware):
+    """Unregister a middleware; the hook is removed with the last one"""
+    with _lock:
+        if middleware in _middlewares:
+            _middlewares.remove(middleware)
+        if not _middlewares:
+            HTTPAdapter.send = _original_send
+
+
+def host_of(url):
+    """Host name of a URL, used as a metrics/trace label"""
+    return urlparse(url).hostname or ""
+
+
+def _send(adapter, request, **kwargs):
+    def call(index, request, **kwargs):
+        if index == len(middlewares):
+            return _original_send(adapter, request, **kwargs)
+        return middlewares[index](lambda req, **kw: call(index + 1, req, **kw), request, **kwargs)
+
+    middlewares = list(_middlewares)
+    return call(0, request, **kwargs)
@@ -0,0 +1,215 @@
+"""
+Record linkage of the results rows that describe the same mod.
+
+A mod found on ContentDB, in a forum thread and by the git search is stored
+as separate results rows. link() groups them into entities (the entities
+table, see db_utils) without comparing every pair of rows: each row gets
+blocking keys (its repository, ContentDB and forum URLs, its normalized name
+and title, its author with the start of its name) and only rows sharing a
+key are scored. A shared URL is a match; otherwise names, author and type
+are compared fuzzily and pairs scoring at least MATCH_THRESHOLD are merged,
+unless the merged entity would hold two different ContentDB packages or two
+different authors (cannot-link).
+Each entity member records the row and rule that matched it (provenance).
+
+Linking is incremental: only rows inserted or changed since the last run
+(by results revision) are keyed and scored against the stored blocks, so a
+run after a crawl costs about as much as the number of new rows.
+
+    stats = link()           # new and changed rows only
+    stats = link(full=True)  # forget all entities and link everything again
+"""
+import re
+from difflib import SequenceMatcher
+
+from db_utils import (LINK_COLUMNS, clear_linkage, get_entity_ids, get_entity_member_rows, get_link_blocks,
+                      get_link_rows, get_linkage_revision, iter_results, save_linkage)
+
+# Pairs scoring at least this are the same mod
+MATCH_THRESHOLD = 0.85
+NAME_WEIGHT = 0.5
+AUTHOR_WEIGHT = 0.3
+TYPE_WEIGHT = 0.2
+# Blocks larger than this (a very common name) are not compared pairwise
+MAX_BLOCK_SIZE = 200
+# Characters of the normalized name in the author blocking key
+AUTHOR_KEY_PREFIX = 4
+
+_NAME_PREFIXES = ("minetest_mod_", "minetest_", "luanti_", "mt_")
+_NAME_SUFFIXES = ("_mod",)
+
+
+def normalize_name(text):
+    """Compare form of a mod name or title: "[Mod] Minetest-Mesecons" -> "mesecons" """
+    text = re.sub(r"\[[^\]]*\]", " ", (text or "").casefold())
+    text = re.sub(r"[^\w]+", "_", text).strip("_")
+    for prefix in _NAME_PREFIXES:
+        if text.startswith(prefix) and len(text) > len(prefix):
+            text = text[len(prefix):]
+            break
+    for suffix in _NAME_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix):
+            text = text[:-len(suffix)]
+    return text
+
+
+def contentdb_id(url):
+    """"author/name" of a ContentDB package URL (any ContentDB host), else None"""
+    match = re.search(r"/packages/([^/?#]+)/([^/?#]+)", url or "")
+    return f"{match.group(1)}/{match.group(2)}".casefold() if match else None
+
+
+def forum_id(url):
+    """Topic id of a forum thread URL, else the URL itself"""
+    match = re.search(r"[?&]t=(\d+)", url or "")
+    return f"t{match.group(1)}" if match else (url or "").casefold()
+
+
+def _identifiers(row):
+    """(rule, value) pairs that identify a mod on their own"""
+    canonical_url = row.get("canonical_url") or ""
+    contentdb = contentdb_id(row.get("contentdb_url"))
+    if not contentdb and row.get("source") == "contentdb":
+        contentdb = contentdb_id(row.get("repo_url"))
+    return [("repo_url", None if contentdb_id(canonical_url) else canonical_url),
+            ("contentdb_url", contentdb),
+            ("forum_url", forum_id(row.get("forum_url")))]
+
+
+def blocking_keys(row):
+    """The blocks a results row (LINK_COLUMNS dict) is compared within"""
+    keys = {f"{rule}:{value}" for rule, value in _identifiers(row) if value}
+    names = {normalize_name(row.get("name")), normalize_name(row.get("title"))} - {""}
+    keys.update(f"name:{name}" for name in names)
+    author = (row.get("author") or "").casefold()
+    if author:
+        keys.update(f"author:{author}:{name[:AUTHOR_KEY_PREFIX]}" for name in names)
+    return keys
+
+
+def cannot_link(row):
+    """(ContentDB ids, authors) of a row; an entity never holds two different of either"""
+    contentdb = {value for rule, value in _identifiers(row) if rule == "contentdb_url" and value}
+    author = (row.get("author") or "").casefold()
+    return contentdb, {author} if author else set()
+
+
+def score(a, b):
+    """(score from 0 to 1, rule) for two results rows being the same mod"""
+    for (rule, value), (_, other) in zip(_identifiers(a), _identifiers(b)):
+        if value and value == other:
+            return 1.0, rule
+    names_a = {normalize_name(a.get("name")), normalize_name(a.get("title"))} - {""}
+    names_b = {normalize_name(b.get("name")), normalize_name(b.get("title"))} - {""}
+    name = max((SequenceMatcher(None, x, y).ratio() for x in names_a for y in names_b), default=0.0)
+    author_a, author_b = (a.get("author") or "").casefold(), (b.get("author") or "").casefold()
+    if author_a and author_b:
+        author = 1.0 if author_a == author_b else 0.0
+    else:
+        # A missing author is weak evidence: a name alone never reaches MATCH_THRESHOLD
+        author = 0.25
+    types = {a.get("type"), b.get("type")} - {"", None, "unknown"}
+    kind = 1.0 if len(types) < 2 else 0.0
+    return round(NAME_WEIGHT * name + AUTHOR_WEIGHT * author + TYPE_WEIGHT * kind, 4), "fuzzy"
+
+
+def link(full=False, threshold=MATCH_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Link the results rows inserted or changed since the last run (all rows
+    with full=True) into entities. Returns statistics of the run.
+    """
+    if full:
+        clear_linkage()
+    since = get_linkage_revision()
+    rows = {row[0]: dict(zip(LINK_COLUMNS, row)) for row in iter_results(LINK_COLUMNS, since_revision=since)}
+    stats = {"results": len(rows), "pairs": 0, "matches": 0, "new_entities": 0, "merged": 0, "conflicts": 0,
+             "skipped_blocks": 0}
+    if not rows:
+        return stats
+
+    keys = {result_id: blocking_keys(row) for result_id, row in rows.items()}
+    # Stored blocks without the rows being (re)linked, plus those rows' current keys
+    blocks = {key: [result_id for result_id in block if result_id not in rows]
+              for key, block in get_link_blocks({key for row_keys in keys.values() for key in row_keys}).items()}
+    for result_id, row_keys in keys.items():
+        for key in row_keys:
+            blocks.setdefault(key, []).append(result_id)
+    pairs = set()
+    for key, block in blocks.items():
+        if len(block) > max_block_size:
+            stats["skipped_blocks"] += 1
+            continue
+        for result_id in block:
+            if result_id in rows:
+                pairs.update((min(result_id, other), max(result_id, other)) for other in block if other != result_id)
+    stats["pairs"] = len(pairs)
+
+    all_rows = get_link_rows({result_id for pair in pairs for result_id in pair} - rows.keys())
+    all_rows.update(rows)
+    entity_ids = get_entity_ids(all_rows)
+    parent = {}
+    # Cannot-link sets of each component, seeded with all members of the stored entities
+    constraints = {}
+    entity_roots = {}
+    members = get_entity_member_rows(set(entity_ids.values()))
+    for result_id in sorted(all_rows):
+        entity_id = entity_ids.get(result_id)
+        if entity_id in entity_roots:
+            parent[result_id] = entity_roots[entity_id]
+            continue
+        if entity_id:
+            entity_roots[entity_id] = result_id
+        contentdb, authors = set(), set()
+        for row in members[entity_id] if entity_id else [all_rows[result_id]]:
+            row_contentdb, row_authors = cannot_link(row)
+            contentdb |= row_contentdb
+            authors |= row_authors
+        constraints[result_id] = (contentdb, authors)
+
+    def find(node):
+        root = node
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while node != root:
+            parent[node], node = root, parent.get(node, node)
+        return root
+
+    best = {}
+    for a, b in sorted(pairs):
+        pair_score, rule = score(all_rows[a], all_rows[b])
+        if pair_score < threshold:
+            continue
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            contentdb = constraints[root_a][0] | constraints[root_b][0]
+            authors = constraints[root_a][1] | constraints[root_b][1]
+            if len(contentdb) > 1 or len(authors) > 1:
+                stats["conflicts"] += 1
+                continue
+            parent[root_b] = root_a
+            constraints[root_a] = (contentdb, authors)
+        stats["matches"] += 1
+        for result_id, other in ((a, b), (b, a)):
+            if result_id in rows and pair_score > best.get(result_id, (0,))[0]:
+                best[result_id] = (pair_score, other, rule)
+
+    components = {}
+    for result_id in all_rows:
+        components.setdefault(find(result_id), []).append(result_id)
+    groups = []
+    for members in components.values():
+        existing = sorted({entity_ids[result_id] for result_id in members if result_id in entity_ids})
+        target = existing[0] if existing else None
+        # Rows already in the entity keep their provenance unless they matched again
+        changed = [result_id for result_id in members
+                   if result_id not in entity_ids or (result_id in rows and result_id in best)]
+        if not changed and len(existing) < 2:
+            continue
+        stats["merged"] += len(existing[1:])
+        groups.append((target, existing[1:], [
+            (result_id, all_rows[result_id]["source"], best.get(result_id, (None, None))[1],
+             best.get(result_id, (None,))[0], best.get(result_id, (None, None, None))[2])
+            for result_id in sorted(changed)]))
+    revision = max(row["revision"] for row in rows.values())
+    stats["new_entities"] = len(save_linkage(keys, groups, revision))
+    return stats
@@ -0,0 +1,124 @@
+"""
+Parser for Luanti settings files: mod.conf, modpack.conf and game.conf.
+
+One pass over the lines handles the whole syntax of Luanti's Settings
+format: `key = value` lines, `#` comment lines, multi-line values (a value
+of three double quotes, up to a line holding only three double quotes; taken
+verbatim, `#` lines included) and `key = {` ... `}` groups, which are
+skipped. Values wrapped in double quotes are unquoted with backslash escapes
+(\\n, \\t, \\", \\\\) decoded; single-quoted values are unquoted. Unquoted
+values are used as they are, like Luanti does.
+
+Which keys are read, into which field and how they are converted is
+table-driven (KEYS), per file kind.
+"""
+import re
+from dataclasses import dataclass, fields
+
+_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+
+
+@dataclass(slots=True)
+class ConfMetadata:
+    """Metadata of a mod, modpack or game; fields not set in the file are None"""
+    type: str
+    name: str = ""
+    title: str = ""
+    description: str = ""
+    author: str | None = None
+    depends: list | None = None
+    optional_depends: list | None = None
+    min_version: str | None = None
+    max_version: str | None = None
+
+    def to_dict(self):
+        """The metadata as a dict, without the fields that are not set"""
+        return {field.name: getattr(self, field.name) for field in fields(self)
+                if getattr(self, field.name) is not None}
+
+
+def _text(value):
+    return value
+
+
+def _list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# conf key -> (ConfMetadata field, converter)
+_COMMON_KEYS = {
+    "name": ("name", _text),
+    "title": ("title", _text),
+    "description": ("description", _text),
+    "author": ("author", _text),
+}
+_MOD_KEYS = {
+    **_COMMON_KEYS,
+    "depends": ("depends", _list),
+    "optional_depends": ("optional_depends", _list),
+    "min_minetest_version": ("min_version", _text),
+    "min_luanti_version": ("min_version", _text),
+    "max_minetest_version": ("max_version", _text),
+    "max_luanti_version": ("max_version", _text),
+}
+KEYS = {"mod": _MOD_KEYS, "modpack": _COMMON_KEYS, "game": _COMMON_KEYS}
+
+
+def unquote(value):
+    """Strip matching quotes; decode backslash escapes inside double quotes"""
+    if len(value) < 2 or value[0] != value[-1] or value[0] not in "\"'":
+        return value
+    if value[0] == '"' and "\\" in value:
+        return _ESCAPE.sub(lambda match: _ESCAPES.get(match.group(1), match.group(1)), value[1:-1])
+    return value[1:-1]
+
+
+def iter_settings(content):
+    """Yield the (key, value) pairs of the top level of a settings file, in file order"""
+    if content.startswith("\ufeff"):
+        content = content[1:]
+    # Only \n ends a line (as in Luanti); a trailing \r is stripped
+    lines = iter(content.split("\n"))
+    depth = 0
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] == "#":
+            continue
+        if line == "}":
+            depth = max(0, depth - 1)
+            continue
+        key, separator, value = line.partition("=")
+        if not separator:
+            continue
+        key = key.strip()
+        value = value.strip()
+        if value == '"""':
+            parts = []
+            for raw in lines:
+                if raw.strip() == '"""':
+                    break
+                parts.append(raw.rstrip("\r"))
+            value = "\n".join(parts)
+        elif value == "{":
+            depth += 1
+            continue
+        else:
+            value = unquote(value)
+        if depth == 0 and key:
+            yield key, value
+
+
+def parse_conf(content, kind):
+    """Parse a mod.conf ("mod"), modpack.conf ("modpack") or game.conf ("game")"""
+    keys = KEYS[kind]
+    values = {}
+    for key, value in iter_settings(content):
+        entry = keys.get(key)
+        if entry is not None:
+            values[entry[0]] = entry[1](value)
+    metadata = ConfMetadata(kind, **values)
+    # Each of name and title stands in for the other when missing
+    metadata.title = metadata.title or metadata.name
+    metadata.name = metadata.name or metadata.title
+    return metadata
@@ -0,0 +1,209 @@
+"""
+Crawler metrics: counters, gauges and latency histograms with labels.
+
+HTTP requests are counted per host (requests, bytes, status codes, latency)
+through the shared HTTP layer; the work queue stages record processed items
+and their durations. Metrics can be exported as a Prometheus text file (for
+the node_exporter textfile collector) and as JSON snapshots.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import http_client
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_started_at = time.time()
+_export_paths = {"prometheus": None, "json": None}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Increase a counter"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to the current value"""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    """Record a value (usually a duration in seconds) in a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.setdefault(key, {"buckets": [0] * len(LATENCY_BUCKETS),
+                                                 "sum": 0.0, "count": 0})
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+@contextmanager
+def stage_item(stage):
+    """
+    Time the processing of one item in a pipeline stage. The block can set
+    `status` in the yielded dict; exceptions count as "error".
+    """
+    outcome = {"status": "success"}
+    start = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome["status"] = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        inc("stage_items_total", stage=stage, status=outcome["status"])
+        observe("stage_duration_seconds", elapsed, stage=stage)
+
+
+def cache_lookup(cache, hit):
+    """Count a cache hit or miss"""
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def reset():
+    """Drop all recorded metrics"""
+    global _started_at
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        _started_at = time.time()
+
+
+def http_middleware(send, request, **kwargs):
+    """
+    Shared HTTP layer middleware counting requests, bytes, status codes and
+    latency per host. Bytes are taken from Content-Length so streamed bodies
+    are not read here.
+    """
+    host = http_client.host_of(request.url)
+    start = time.perf_counter()
+    try:
+        response = send(request, **kwargs)
+    except Exception as e:
+        inc("http_errors_total", host=host, error=type(e).__name__)
+        raise
+    finally:
+        observe("http_request_duration_seconds", time.perf_counter() - start, host=host)
+    inc("http_requests_total", host=host, method=request.method, status=str(response.status_code))
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        inc("http_response_bytes_total", int(length), host=host)
+    return response
+
+
+def install():
+    """Start collecting HTTP metrics"""
+    http_client.add_middleware(http_middleware)
+
+
+def snapshot():
+    """Return all metrics as a JSON-serialisable dict, including items/s per stage"""
+    def labelled(key, value):
+        return {"name": key[0], "labels": dict(key[1]), "value": value}
+
+    with _lock:
+        counters = [labelled(key, value) for key, value in sorted(_counters.items())]
+        gauges = [labelled(key, value) for key, value in sorted(_gauges.items())]
+        histograms = [labelled(key, {"buckets": dict(zip(LATENCY_BUCKETS, h["buckets"])),
+                                     "sum": h["sum"], "count": h["count"]})
+                      for key, h in sorted(_histograms.items())]
+        stages = {}
+        for (name, labels), h in _histograms.items():
+            if name == "stage_duration_seconds":
+                stage = dict(labels)["stage"]
+                stages[stage] = {
+                    "items": h["count"],
+                    "busy_seconds": h["sum"],
+                    "items_per_second": h["count"] / h["sum"] if h["sum"] else 0.0,
+                }
+        elapsed = time.time() - _started_at
+    return {
+        "timestamp": time.time(),
+        "elapsed_seconds": elapsed,
+        "counters": counters,
+        "gauges": gauges,
+        "histograms": histograms,
+        "stages": stages,
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def to_prometheus():
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for kind, values in (("counter", _counters), ("gauge", _gauges)):
+            for name in sorted({key[0] for key in values}):
+                lines.append(f"# TYPE luanti_{name} {kind}")
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"luanti_{name}{_format_labels(labels)} {value}")
+        for name in sorted({key[0] for key in _histograms}):
+            lines.append(f"# TYPE luanti_{name} histogram")
+            for (metric, labels), h in sorted(_histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, h["buckets"]):
+                    lines.append(f"luanti_{name}_bucket{_format_labels(labels, {'le': bound})} {count}")
+                lines.append(f"luanti_{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {h['count']}")
+                lines.append(f"luanti_{name}_sum{_format_labels(labels)} {h['sum']}")
+                lines.append(f"luanti_{name}_count{_format_labels(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def configure_export(prometheus_path=None, json_path=None):
+    """Set the files written by export(); installs the HTTP middleware if any is set"""
+    _export_paths["prometheus"] = prometheus_path
+    _export_paths["json"] = json_path
+    if prometheus_path or json_path:
+        install()
+
+
+def export_enabled():
+    """Whether configure_export() set any output file"""
+    return bool(_export_paths["prometheus"] or _export_paths["json"])
+
+
+def export():
+    """Write the configured Prometheus text file and JSON snapshot (if any)"""
+    if _export_paths["prometheus"]:
+        _write_atomic(_export_paths["prometheus"], to_prometheus())
+    if _export_paths["json"]:
+        _write_atomic(_export_paths["json"], json.dumps(snapshot(), indent=2))
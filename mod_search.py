@@ -10,11 +10,14 @@ This script orchestrates the search for Luanti mods from multiple sources:
 
 import argparse
 import sys
+import profiling
+import replay
 from contentdb.api import sync_contentdb_to_database
 from forum.search import fetch_forum_thread_list, process_forum_work_queue
 from git.search import search_all_git_servers, process_git_work_queue
 from db_utils import (
-    init_all_databases, get_mod_count, get_forum_queue_status, get_git_queue_status
+    init_all_databases, get_mod_count, get_forum_queue_status, get_git_queue_status,
+    load_non_mod_repo_cache
 )
 
 
@@ -33,12 +36,25 @@ def main():
                        help='Run all search operations')
     parser.add_argument('--batch-size', type=int, default=10,
                        help='Batch size for processing work queues')
+    parser.add_argument('--resume', action='store_true',
+                       help='Continue an interrupted ContentDB sync, forum list fetch or git search '
+                            'where it stopped')
+    replay.add_replay_arguments(parser, 'Store all fetched responses in this archive (see reprocess)')
+    profiling.add_profile_arguments(parser)
     
     args = parser.parse_args()
+    replay.configure(args.archive, args.replay, args.replay_latency)
     
+    with profiling.profile(args.profile, args.profile_output):
+        run_search(args)
+
+
+def run_search(args):
+    """Run the search operations selected on the command line"""
     # Initialize all databases
     print("Initializing databases...")
     init_all_databases()
+    load_non_mod_repo_cache()
     
     print("=== Luanti Mod Search System ===")
     
@@ -55,7 +71,7 @@ def main():
     # Run selected operations
     if args.contentdb or args.all:
         print("\n1. Syncing ContentDB...")
-        added, updated = sync_contentdb_to_database()
+        added, updated = sync_contentdb_to_database(resume=args.resume)
         print(f"   ContentDB sync complete: {added} added, {updated} updated")
     
     if args.forum or args.all:
@@ -66,12 +82,12 @@ def main():
         
         # Mod releases forum
         mod_forum_url = "https://forum.luanti.org/viewforum.php?f=11"
-        added_mod_threads = fetch_forum_thread_list(mod_forum_url)
+        added_mod_threads = fetch_forum_thread_list(mod_forum_url, resume=args.resume)
         print(f"   Added {len(added_mod_threads)} mod/modpack threads to queue")
         
         # Games forum  
         games_forum_url = "https://forum.luanti.org/viewforum.php?f=15"
-        added_game_threads = fetch_forum_thread_list(games_forum_url, thread_types=["[game]"])
+        added_game_threads = fetch_forum_thread_list(games_forum_url, thread_types=["[game]"], resume=args.resume)
         print(f"   Added {len(added_game_threads)} game threads to queue")
         
         # Process forum work queue
@@ -87,11 +103,10 @@ def main():
             
             total_processed += len(results)
             successful_results = [r for r in results if r.get("status") == "success"]
-            total_mods_found = sum(r.get("luanti_mods_found", 0) for r in successful_results)
             total_git_repos = sum(r.get("git_repos_found", 0) for r in successful_results)
             
             print(f"   Batch {batch_count + 1}: Processed {len(results)} threads")
-            print(f"     Found {total_git_repos} git repos, {total_mods_found} Luanti mods")
+            print(f"     Found {total_git_repos} git repos (queued for validation)")
             
             batch_count += 1
         
@@ -100,7 +115,7 @@ def main():
     if args.git_search or args.all:
         print("\n3. Git repository search...")
         keywords = ['luanti', 'minetest']
-        repositories = search_all_git_servers(keywords, max_results_per_host=50)
+        repositories = search_all_git_servers(keywords, max_results_per_host=50, resume=args.resume)
         print(f"   Found {len(repositories)} repositories across all git servers")
     
     if args.git_process or args.all:
@@ -1,8 +1,21 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from git.git_web import GitWeb
+from luanti_conf import parse_conf
+from retry_policy import classify_error, TRANSIENT
+import tracing
 
 MOD_CONF = 'mod.conf'
 MODPACK_CONF = 'modpack.conf'
 GAME_CONF = 'game.conf'
+# Legacy modpack marker, still recognized by Luanti
+MODPACK_TXT = 'modpack.txt'
+INIT_LUA = 'init.lua'
+# Directory holding the mods of a game
+GAME_MODS_DIR = 'mods'
+# Concurrent conf file fetches when enumerating modpack and game contents
+DEFAULT_CONTENT_WORKERS = 8
 
 class RepoType:
     MOD = 'mod'
@@ -11,9 +24,19 @@ class RepoType:
     UNKNOWN = 'unknown'
 
 
-def detect_repo_type(repo_url, branch=None):
+def _reraise_transient(error, raise_errors):
+    if raise_errors and classify_error(error) == TRANSIENT:
+        raise error
+
+
+@tracing.traced("detect")
+def detect_repo_type(repo_url, branch=None, raise_errors=False, contents=False):
     """
     Detect if a repository is a Luanti mod, modpack, or game using the GitWeb abstraction.
+    With raise_errors=True, transient errors (network, rate limit, server errors)
+    are raised instead of being reported as UNKNOWN so the caller can retry later.
+    With contents=True the mods and modpacks inside a modpack or game are
+    listed in metadata["contents"] (see enumerate_contents).
     Returns: (repo_type, metadata)
     """
     try:
@@ -22,22 +45,27 @@ def detect_repo_type(repo_url, branch=None):
         git = GitWeb.from_url(repo_url, branch)
     except Exception as e:
         print(f"[DEBUG] GitWeb.from_url failed: {e}")
+        _reraise_transient(e, raise_errors)
         return RepoType.UNKNOWN, {}
     # Check for game.conf first (games may also have mod.conf)
     try:
         game_conf = git.get_file(GAME_CONF, branch=branch)
         print(f"[DEBUG] game.conf: {bool(game_conf)}")
         if game_conf:
-            return RepoType.GAME, parse_game_conf(game_conf)
+            return RepoType.GAME, _with_contents(git, RepoType.GAME, parse_game_conf(game_conf),
+                                                 branch, raise_errors, contents)
     except Exception as e:
         print(f"[DEBUG] game.conf fetch failed: {e}")
+        _reraise_transient(e, raise_errors)
     try:
         modpack_conf = git.get_file(MODPACK_CONF, branch=branch)
         print(f"[DEBUG] modpack.conf: {bool(modpack_conf)}")
         if modpack_conf:
-            return RepoType.MODPACK, parse_modpack_conf(modpack_conf)
+            return RepoType.MODPACK, _with_contents(git, RepoType.MODPACK, parse_modpack_conf(modpack_conf),
+                                                    branch, raise_errors, contents)
     except Exception as e:
         print(f"[DEBUG] modpack.conf fetch failed: {e}")
+        _reraise_transient(e, raise_errors)
     try:
         mod_conf = git.get_file(MOD_CONF, branch=branch)
         print(f"[DEBUG] mod.conf: {bool(mod_conf)}")
@@ -45,84 +73,80 @@ def detect_repo_type(repo_url, branch=None):
             return RepoType.MOD, parse_mod_conf(mod_conf)
     except Exception as e:
         print(f"[DEBUG] mod.conf fetch failed: {e}")
+        _reraise_transient(e, raise_errors)
     return RepoType.UNKNOWN, {}
 
 
-def parse_mod_conf(content):
-    metadata = {}
-    for line in content.split('\n'):
-        line = line.strip()
-        if '=' in line and not line.startswith('#'):
-            key, value = line.split('=', 1)
-            key = key.strip()
-            value = value.strip().strip('"').strip("'")
-            if key == 'name':
-                metadata['name'] = value
-            elif key == 'title':
-                metadata['title'] = value
-            elif key == 'description':
-                metadata['description'] = value
-            elif key == 'depends':
-                metadata['depends'] = [dep.strip() for dep in value.split(',') if dep.strip()]
-            elif key == 'optional_depends':
-                metadata['optional_depends'] = [dep.strip() for dep in value.split(',') if dep.strip()]
-            elif key == 'author':
-                metadata['author'] = value
-            elif key == 'min_minetest_version' or key == 'min_luanti_version':
-                metadata['min_version'] = value
-            elif key == 'max_minetest_version' or key == 'max_luanti_version':
-                metadata['max_version'] = value
-    # API logic: fallback for missing values
-    metadata['type'] = RepoType.MOD
-    metadata['title'] = metadata.get('title', metadata.get('name', ''))
-    metadata['name'] = metadata.get('name', metadata.get('title', ''))
-    metadata['description'] = metadata.get('description', '')
+def _with_contents(git, repo_type, metadata, branch, raise_errors, contents):
+    if contents:
+        try:
+            metadata['contents'] = enumerate_contents(git, repo_type, branch)
+        except Exception as e:
+            print(f"[DEBUG] content enumeration failed: {e}")
+            _reraise_transient(e, raise_errors)
     return metadata
 
 
+def find_sub_content(paths, repo_type):
+    """
+    Directories of the mods and modpacks inside a modpack or game, given the
+    paths of all files in the repository: [(directory, type)], sorted.
+    As in Luanti, a directory with modpack.conf (or modpack.txt) is a modpack
+    whose subdirectories are searched further, one with mod.conf or init.lua
+    is a mod; a game's mods are below its mods/ directory.
+    """
+    files = set(paths)
+    subdirectories = {}
+    for path in files:
+        parts = path.split('/')
+        for depth in range(1, len(parts)):
+            subdirectories.setdefault('/'.join(parts[:depth - 1]), set()).add('/'.join(parts[:depth]))
+    found = []
+    pending = [GAME_MODS_DIR if repo_type == RepoType.GAME else '']
+    while pending:
+        for directory in subdirectories.get(pending.pop(), ()):
+            if f"{directory}/{MODPACK_CONF}" in files or f"{directory}/{MODPACK_TXT}" in files:
+                found.append((directory, RepoType.MODPACK))
+                pending.append(directory)
+            elif f"{directory}/{MOD_CONF}" in files or f"{directory}/{INIT_LUA}" in files:
+                found.append((directory, RepoType.MOD))
+    return sorted(found)
+
+
+def enumerate_contents(git, repo_type, branch=None, workers=DEFAULT_CONTENT_WORKERS):
+    """
+    Mods and modpacks inside a modpack or game: one recursive tree listing,
+    then the conf files of all children fetched concurrently. Returns the
+    parsed conf metadata of each child plus its "path"; children without a
+    conf file are named after their directory.
+    """
+    paths = git.get_tree(branch) or []
+    files = set(paths)
+    children = find_sub_content(paths, repo_type)
+
+    def read(child):
+        directory, child_type = child
+        conf = f"{directory}/{MOD_CONF if child_type == RepoType.MOD else MODPACK_CONF}"
+        content = (git.get_file(conf, branch=branch) or '') if conf in files else ''
+        metadata = parse_conf(content, child_type).to_dict()
+        metadata['name'] = metadata['name'] or os.path.basename(directory)
+        metadata['title'] = metadata['title'] or metadata['name']
+        metadata['path'] = directory
+        return metadata
+
+    if not children:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(children)))) as pool:
+        return list(pool.map(read, children))
+
+
+def parse_mod_conf(content):
+    return parse_conf(content, RepoType.MOD).to_dict()
+
+
 def parse_modpack_conf(content):
-    metadata = {}
-    for line in content.split('\n'):
-        line = line.strip()
-        if '=' in line and not line.startswith('#'):
-            key, value = line.split('=', 1)
-            key = key.strip()
-            value = value.strip().strip('"').strip("'")
-            if key == 'name':
-                metadata['name'] = value
-            elif key == 'title':
-                metadata['title'] = value
-            elif key == 'description':
-                metadata['description'] = value
-            elif key == 'author':
-                metadata['author'] = value
-    # API logic: fallback for missing values
-    metadata['type'] = RepoType.MODPACK
-    metadata['title'] = metadata.get('title', metadata.get('name', ''))
-    metadata['name'] = metadata.get('name', metadata.get('title', ''))
-    metadata['description'] = metadata.get('description', '')
-    return metadata
+    return parse_conf(content, RepoType.MODPACK).to_dict()
 
 
 def parse_game_conf(content):
-    metadata = {}
-    for line in content.split('\n'):
-        line = line.strip()
-        if '=' in line and not line.startswith('#'):
-            key, value = line.split('=', 1)
-            key = key.strip()
-            value = value.strip().strip('"').strip("'")
-            if key == 'title':
-                metadata['title'] = value
-            elif key == 'name':
-                metadata['name'] = value
-            elif key == 'description':
-                metadata['description'] = value
-            elif key == 'author':
-                metadata['author'] = value
-    # API logic: fallback for missing values
-    metadata['type'] = RepoType.GAME
-    metadata['title'] = metadata.get('title', metadata.get('name', ''))
-    metadata['name'] = metadata.get('name', metadata.get('title', ''))
-    metadata['description'] = metadata.get('description', '')
-    return metadata
+    return parse_conf(content, RepoType.GAME).to_dict()
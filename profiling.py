@@ -0,0 +1,156 @@
+"""
+Shared --profile option for the command line entry points.
+
+Modes:
+    cpu   cProfile; report sorted by cumulative time, raw dump in pstats format
+    wall  sampling wall-clock profiler (includes time spent waiting on the
+          network); report of the hottest functions, raw dump as folded stacks
+          for flamegraph.pl / speedscope
+    mem   tracemalloc; report of the top allocation sites, raw snapshot dump
+"""
+import cProfile
+import collections
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_MODES = ("cpu", "wall", "mem")
+DEFAULT_OUTPUT_PREFIX = "profile"
+# Seconds between stack samples of the wall-clock profiler
+SAMPLE_INTERVAL = 0.005
+REPORT_LINES = 40
+
+
+def add_profile_arguments(parser):
+    """Add --profile [cpu|wall|mem] and --profile-output to an argparse parser"""
+    parser.add_argument("--profile", nargs="?", const="cpu", choices=PROFILE_MODES,
+                        help="Profile the run (default mode: cpu)")
+    parser.add_argument("--profile-output", default=DEFAULT_OUTPUT_PREFIX, metavar="PREFIX",
+                        help=f"File name prefix for profile report and dump (default: {DEFAULT_OUTPUT_PREFIX})")
+
+
+@contextmanager
+def profile(mode, output_prefix=DEFAULT_OUTPUT_PREFIX):
+    """
+    Profile the enclosed block and write `<prefix>.<mode>.txt` (sorted report)
+    and a raw dump next to it. Does nothing if `mode` is None.
+    """
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    profiler = {"cpu": _CpuProfiler, "wall": _WallProfiler, "mem": _MemoryProfiler}[mode]()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        report_path = f"{output_prefix}.{mode}.txt"
+        dump_path = profiler.dump(output_prefix)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(profiler.report())
+        print(f"Profile written to {report_path} (raw: {dump_path})", file=sys.stderr)
+
+
+class _CpuProfiler:
+    def start(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def dump(self, prefix):
+        path = f"{prefix}.cpu.prof"
+        self.profiler.dump_stats(path)
+        return path
+
+    def report(self):
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+        stats.sort_stats("tottime").print_stats(REPORT_LINES)
+        return out.getvalue()
+
+
+class _WallProfiler:
+    """Samples the stack of the profiled thread every SAMPLE_INTERVAL seconds"""
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started_at = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="wall-profiler", daemon=True)
+        self._sampler.start()
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def dump(self, prefix):
+        path = f"{prefix}.wall.folded"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(";".join(stack) + f" {count}\n")
+        return path
+
+    def report(self):
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        samples = self.samples or 1
+        lines = [f"Wall-clock profile: {self.samples} samples over {self.elapsed:.2f}s", ""]
+        for title, counter in (("Own time (innermost frame)", own), ("Total time (on stack)", total)):
+            lines.append(f"{title}:")
+            for function, count in counter.most_common(REPORT_LINES):
+                lines.append(f"  {100.0 * count / samples:6.2f}%  {count:7d}  {function}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+class _MemoryProfiler:
+    def start(self):
+        tracemalloc.start(25)
+
+    def stop(self):
+        self.snapshot = tracemalloc.take_snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def dump(self, prefix):
+        path = f"{prefix}.mem.snapshot"
+        self.snapshot.dump(path)
+        return path
+
+    def report(self):
+        lines = [f"Peak traced memory: {self.peak / 1024:.1f} KiB", "", "Top allocation sites:"]
+        for stat in self.snapshot.statistics("lineno")[:REPORT_LINES]:
+            lines.append(f"  {stat}")
+        lines += ["", "Top allocation tracebacks:"]
+        for stat in self.snapshot.statistics("traceback")[:5]:
+            lines.append(f"  {stat.count} blocks, {stat.size / 1024:.1f} KiB")
+            lines += [f"    {line}" for line in stat.traceback.format()]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,326 @@
+"""
+Read-only HTTP query API over mod_list.db.
+
+An asyncio server (standard library only) answering JSON GET requests:
+
+    /mods?name=&type=&author=&source=&license=&depends_on=&contains=&after=&limit=
+    /mods/<id>
+    /mods/<id>/contents
+    /search?q=&type=&source=&license=&offset=&limit=
+    /health
+
+The database is opened read-only (mode=ro, query_only) through a small pool
+of connections used by worker threads, so the event loop never waits on
+SQLite and the crawler keeps being the only writer. The database must be in
+WAL mode (set by db_utils.init_db) so that readers and the writer do not
+block each other. /mods pages by id
+(`after` = the `next` value of the previous page), /search by offset.
+
+Responses are cached (LRU) together with the database's change counter
+(PRAGMA data_version of a monitor connection, which changes whenever another
+connection commits); the cache is dropped as soon as the counter moves, so
+answers are never older than the last commit.
+
+    python query_api.py --port 8080
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import db_utils
+from db_utils import CONTENT_COLUMNS, result_filters, search_statement
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Seconds a connection waits for the crawler's write lock
+BUSY_TIMEOUT = 5
+MAX_REQUEST_LINE = 8192
+
+MOD_COLUMNS = ["id", "name", "title", "type", "author", "source", "license", "short_description",
+               "contentdb_url", "forum_url", "repo_url", "depends", "optional_depends",
+               "min_version", "max_version"]
+_JSON_COLUMNS = ("depends", "optional_depends")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def connect_read_only(path):
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, timeout=BUSY_TIMEOUT,
+                          check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class ConnectionPool:
+    """A fixed number of read-only connections shared by worker threads"""
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(connect_read_only(path))
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+def _mod(row):
+    mod = dict(row)
+    for column in _JSON_COLUMNS:
+        mod[column] = json.loads(mod[column]) if mod.get(column) else []
+    return mod
+
+
+def _int_param(params, name, default, minimum=0, maximum=None):
+    value = params.get(name, [None])[0]
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise HTTPError(400, f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def _param(params, name):
+    return params.get(name, [None])[0] or None
+
+
+def list_mods(conn, params):
+    """
+    One page of results, by id, filtered by name, type, author, source,
+    license, dependency or contained mod
+    """
+    limit = _int_param(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT)
+    conditions, args = result_filters(_param(params, "type"), _param(params, "source"),
+                                       _param(params, "license"))
+    conditions.insert(0, "id > ?")
+    args.insert(0, _int_param(params, "after", 0))
+    if _param(params, "name"):
+        conditions.append("name = ?")
+        args.append(_param(params, "name"))
+    if _param(params, "author"):
+        conditions.append("author = ? COLLATE NOCASE")
+        args.append(_param(params, "author"))
+    if _param(params, "depends_on"):
+        conditions.append("id IN (SELECT result_id FROM dependencies WHERE depends_on = ?)")
+        args.append(_param(params, "depends_on"))
+    if _param(params, "contains"):
+        conditions.append("id IN (SELECT result_id FROM contents WHERE name = ?)")
+        args.append(_param(params, "contains"))
+    rows = conn.execute(f"""
+        SELECT {", ".join(MOD_COLUMNS)} FROM results WHERE {" AND ".join(conditions)}
+        ORDER BY id LIMIT ?
+    """, args + [limit + 1]).fetchall()
+    items = [_mod(row) for row in rows[:limit]]
+    return {"items": items, "next": items[-1]["id"] if len(rows) > limit else None}
+
+
+def get_mod(conn, mod_id):
+    row = conn.execute(f"SELECT {', '.join(MOD_COLUMNS)} FROM results WHERE id = ?", (mod_id,)).fetchone()
+    if row is None:
+        raise HTTPError(404, f"No result with id {mod_id}")
+    return _mod(row)
+
+
+def get_contents(conn, mod_id):
+    """The mods and modpacks inside a modpack or game"""
+    get_mod(conn, mod_id)
+    rows = conn.execute(f"SELECT {', '.join(CONTENT_COLUMNS)} FROM contents WHERE result_id = ? ORDER BY path",
+                        (mod_id,)).fetchall()
+    return {"items": [_mod(row) for row in rows]}
+
+
+def search(conn, params):
+    """Full-text search (as db_utils.search_results), paged by offset"""
+    limit = _int_param(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT)
+    offset = _int_param(params, "offset", 0)
+    filters = result_filters(_param(params, "type"), _param(params, "source"), _param(params, "license"), "r.")
+    statement = search_statement(conn, _param(params, "q") or "", MOD_COLUMNS, filters)
+    if statement is None:
+        raise HTTPError(400, "q is required")
+    sql, args = statement
+    rows = conn.execute(sql + " LIMIT ? OFFSET ?", args + [limit + 1, offset]).fetchall()
+    items = [_mod(row) for row in rows[:limit]]
+    return {"items": items, "next": offset + limit if len(rows) > limit else None}
+
+
+class QueryService:
+    """Routes requests to queries and caches the encoded responses per database version"""
+
+    def __init__(self, db_path=None, pool_size=DEFAULT_POOL_SIZE, cache_size=DEFAULT_CACHE_SIZE):
+        db_path = db_path or db_utils.DB_PATH
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.cache_size = cache_size
+        self._monitor = connect_read_only(db_path)
+        self._monitor_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def data_version(self):
+        with self._monitor_lock:
+            return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def health(self, conn, _):
+        return {"status": "ok", "data_version": self.data_version(), "cached": len(self._cache),
+                "hits": self.hits, "misses": self.misses}
+
+    def route(self, target):
+        """(query function, argument) for a request target; raises HTTPError"""
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        if parts == ["mods"]:
+            return list_mods, params
+        if len(parts) == 2 and parts[0] == "mods":
+            if not parts[1].isdigit():
+                raise HTTPError(404, "Not found")
+            return get_mod, int(parts[1])
+        if len(parts) == 3 and parts[0] == "mods" and parts[2] == "contents" and parts[1].isdigit():
+            return get_contents, int(parts[1])
+        if parts == ["search"]:
+            return search, params
+        if parts == ["health"]:
+            return self.health, None
+        raise HTTPError(404, "Not found")
+
+    def respond(self, target):
+        """(status, JSON body) for a request target; called in a worker thread"""
+        try:
+            function, argument = self.route(target)
+            if function == self.health:
+                return 200, json.dumps(self.health(None, None)).encode("utf-8")
+            version = self.data_version()
+            with self._cache_lock:
+                if version != self._cache_version:
+                    self._cache.clear()
+                    self._cache_version = version
+                elif target in self._cache:
+                    self._cache.move_to_end(target)
+                    self.hits += 1
+                    return 200, self._cache[target]
+                self.misses += 1
+            with self.pool.connection() as conn:
+                body = json.dumps(function(conn, argument), ensure_ascii=False).encode("utf-8")
+        except HTTPError as e:
+            return e.status, json.dumps({"error": str(e)}).encode("utf-8")
+        except sqlite3.Error as e:
+            return 503, json.dumps({"error": f"Database error: {e}"}).encode("utf-8")
+        with self._cache_lock:
+            # After a commit during the query the entry goes with the next cache clear
+            if version == self._cache_version:
+                self._cache[target] = body
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return 200, body
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection (HTTP/1.1 keep-alive, GET and HEAD)"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode("latin-1").split()
+                if len(request_line) > MAX_REQUEST_LINE or len(parts) != 3:
+                    status, body, keep_alive = 400, b'{"error": "Bad request"}', False
+                else:
+                    method, target, version = parts
+                    keep_alive = (headers.get("connection", "").lower() != "close"
+                                  if version == "HTTP/1.1" else
+                                  headers.get("connection", "").lower() == "keep-alive")
+                    if method not in ("GET", "HEAD"):
+                        status, body = 405, b'{"error": "Only GET and HEAD are supported"}'
+                    else:
+                        status, body = await loop.run_in_executor(self.executor, self.respond, target)
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1"))
+                if parts[:1] != ["HEAD"]:
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_LINE)
+        print(f"Serving {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+        self._monitor.close()
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            503: "Service Unavailable"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only HTTP query API over the mod database")
+    parser.add_argument("--db", default=db_utils.DB_PATH, help=f"Database file (default: {db_utils.DB_PATH})")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port (default: 8080)")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help=f"Read-only database connections (default: {DEFAULT_POOL_SIZE})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f"Cached responses (default: {DEFAULT_CACHE_SIZE})")
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist")
+    service = QueryService(args.db, args.pool_size, args.cache_size)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Freshness-based recrawl scheduler.
+
+Processed forum threads and git repositories are revisited when their
+next_check_at is due. A revisit fetches the item once and compares its
+fingerprint with the stored one: items that changed are put back into their
+work queue and are rechecked sooner, unchanged items are rechecked less often
+(see db_utils.next_check_interval).
+"""
+import json
+
+import metrics
+from db_utils import (get_forum_threads_due_for_recheck, record_forum_thread_check,
+                      postpone_forum_thread_check, get_git_queue_items_due_for_recheck,
+                      record_git_queue_check, postpone_git_queue_check)
+from forum.search import fetch_forum_thread_fingerprint
+from git.search import fetch_repo_fingerprint
+
+# Maximum number of revisits per run; each revisit is one forum page fetch
+# or one repository detection
+DEFAULT_BUDGET = 100
+
+_KINDS = {
+    "forum": (fetch_forum_thread_fingerprint, record_forum_thread_check, postpone_forum_thread_check),
+    "git": (fetch_repo_fingerprint, record_git_queue_check, postpone_git_queue_check),
+}
+
+
+def get_due_rechecks(budget=DEFAULT_BUDGET):
+    """
+    Return up to `budget` (kind, item_id, url, args) tuples, most overdue
+    first; args are the fingerprint function's arguments after the URL
+    (the branch of a git queue item)
+    """
+    due = [("forum", item_id, url, (), next_check_at)
+           for item_id, url, next_check_at in get_forum_threads_due_for_recheck(budget)]
+    due += [("git", item_id, url, (json.loads(metadata).get("branch") if metadata else None,), next_check_at)
+            for item_id, url, next_check_at, metadata in get_git_queue_items_due_for_recheck(budget)]
+    due.sort(key=lambda item: item[4])
+    return [item[:4] for item in due[:budget]]
+
+
+def run_recrawl(budget=DEFAULT_BUDGET):
+    """
+    Revisit due items within the budget.
+    Returns a dictionary with the number of checked, changed and failed items.
+    """
+    stats = {"checked": 0, "changed": 0, "errors": 0}
+    for kind, item_id, url, args in get_due_rechecks(budget):
+        fetch_fingerprint, record_check, postpone_check = _KINDS[kind]
+        with metrics.stage_item(f"recrawl_{kind}") as outcome:
+            try:
+                fingerprint = fetch_fingerprint(url, *args)
+            except Exception as e:
+                print(f"Error rechecking {url}: {e}")
+                postpone_check(item_id)
+                stats["errors"] += 1
+                outcome["status"] = "error"
+                continue
+            stats["checked"] += 1
+            if record_check(item_id, fingerprint):
+                stats["changed"] += 1
+                outcome["status"] = "changed"
+            else:
+                outcome["status"] = "unchanged"
+    return stats
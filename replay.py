@@ -0,0 +1,45 @@
+"""
+Record/replay of HTTP traffic for deterministic crawls.
+
+--archive DIR (or its alias --record DIR) stores every response of a run in an
+archive (see archive.py). --replay DIR answers all requests of a later run
+from that archive, at the shared HTTP layer, so contentdb.api, forum.search
+and the git backends (PyGithub and python-gitlab included) see exactly the
+recorded responses: the n-th request for a URL gets the n-th recorded
+response, further requests get the last one. Nothing goes to the network;
+requests that were not recorded fail with a ConnectionError.
+
+Replay runs at full speed by default; with --replay-latency every response is
+delayed by the time it took when it was recorded.
+"""
+import archive
+
+
+def add_replay_arguments(parser, archive_help="Store all fetched responses in this archive"):
+    """
+    Add --archive DIR (alias --record DIR), --replay DIR and --replay-latency to
+    an argparse parser; archiving and replaying exclude each other
+    """
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--archive", "--record", dest="archive", metavar="DIR", help=archive_help)
+    group.add_argument("--replay", metavar="DIR", help="Answer all HTTP requests from a recording")
+    parser.add_argument("--replay-latency", action="store_true",
+                        help="Delay replayed responses by their recorded latency")
+
+
+def configure(archive_dir=None, replay_dir=None, replay_latency=False):
+    """Start archiving or replaying as selected on the command line"""
+    if archive_dir:
+        archive.enable(archive_dir)
+    elif replay_dir:
+        start_replay(replay_dir, replay_latency)
+
+
+def start_replay(directory, latency=False):
+    """Answer requests from the recording in `directory` in recording order from now on"""
+    archive.enable_replay(directory, ordered=True, latency=latency)
+
+
+def stop():
+    """Stop recording and replaying"""
+    archive.disable()
@@ -0,0 +1,117 @@
+"""
+Re-run extraction on archived responses.
+
+Forum link extraction and repository type detection are run again on the
+responses stored by archive.py (recorded with --archive DIR), so improvements
+to the extractor or the conf parsers can be applied to old data with zero
+network access. The work is spread over a process pool; each worker answers
+all HTTP requests from the archive, the parent process writes the results.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+import archive
+from db_utils import get_processed_forum_threads, get_processed_git_queue_items, save_result
+from forum.search import parse_first_post, first_post_links, forum_result
+from git.git_web import GitWeb
+from git.search import git_result
+from git.utils import check_luanti_mod_repository
+from git.canonical import canonicalize_repo_url
+
+DEFAULT_WORKERS = os.cpu_count() or 4
+# Items handed to a worker at a time
+CHUNK_SIZE = 8
+
+
+def _detect(url, branch=None):
+    try:
+        is_mod, metadata = check_luanti_mod_repository(url, branch, raise_errors=True)
+        return {"url": url, "is_mod": is_mod, "metadata": metadata}
+    except Exception as e:
+        return {"url": url, "error": str(e)}
+
+
+def reprocess_forum_thread(forum_url):
+    """Extract the repository links of an archived thread and detect their types"""
+    try:
+        resp = requests.get(forum_url)
+        resp.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        return {"forum_url": forum_url, "error": str(e)}
+    first_post = parse_first_post(resp.text)
+    if not first_post:
+        return {"forum_url": forum_url, "error": "Could not find first post content"}
+    repos = []
+    for href in first_post_links(first_post, forum_url):
+        try:
+            is_git = GitWeb.is_git_server(href)
+        except Exception:
+            is_git = False
+        if is_git:
+            repos.append(_detect(href))
+    return {"forum_url": forum_url, "repos": repos}
+
+
+def reprocess_git_item(url, branch=None):
+    """Detect the type of an archived repository"""
+    return _detect(url, branch)
+
+
+def _run(function, items, workers, directory):
+    if not items:
+        return []
+    if workers <= 1:
+        return [function(*item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers, initializer=archive.enable_replay,
+                             initargs=(directory,)) as pool:
+        return list(pool.map(function, *zip(*items), chunksize=CHUNK_SIZE))
+
+
+def run_reprocess(directory, workers=DEFAULT_WORKERS):
+    """
+    Reprocess all processed forum threads and git work queue items whose
+    responses are in the archive and merge the detected mods into the results.
+
+    Returns counts: forum_threads, repos, mods and missing (not fully archived).
+    """
+    archive.enable_replay(directory)
+    stats = {"forum_threads": 0, "repos": 0, "mods": 0, "missing": 0}
+    try:
+        threads = {forum_url: (title, thread_type) for _id, forum_url, title, thread_type
+                   in get_processed_forum_threads() if archive.lookup(directory, forum_url)}
+        covered = set()
+        for result in _run(reprocess_forum_thread, [(url,) for url in threads], workers, directory):
+            if "error" in result:
+                stats["missing"] += 1
+                continue
+            stats["forum_threads"] += 1
+            title, thread_type = threads[result["forum_url"]]
+            for repo in result["repos"]:
+                stats["repos"] += 1
+                covered.add(canonicalize_repo_url(repo["url"]))
+                if "error" in repo:
+                    stats["missing"] += 1
+                elif repo["is_mod"]:
+                    stats["mods"] += 1
+                    save_result(forum_result(result["forum_url"], repo["url"], title, thread_type,
+                                             repo["metadata"]), "forum", replace=True)
+
+        items = {}
+        for _id, url, metadata in get_processed_git_queue_items():
+            if canonicalize_repo_url(url) not in covered:
+                items[url] = json.loads(metadata) if metadata else {}
+        for result in _run(reprocess_git_item, [(url, meta.get("branch")) for url, meta in items.items()],
+                           workers, directory):
+            stats["repos"] += 1
+            if "error" in result:
+                stats["missing"] += 1
+            elif result["is_mod"]:
+                stats["mods"] += 1
+                save_result(git_result(result["url"], canonicalize_repo_url(result["url"]),
+                                       items[result["url"]], result["metadata"]), "git", replace=True)
+    finally:
+        archive.disable()
+    return stats
@@ -0,0 +1,73 @@
+"""
+Retry policy for work queue items.
+
+Classifies processing errors as transient (worth retrying later) or permanent
+(retrying will not help) and computes the exponential backoff used to schedule
+the next attempt.
+"""
+import requests
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# Items are dead-lettered after this many failed attempts
+MAX_ATTEMPTS = 5
+# Backoff in seconds: BASE_DELAY, 2*BASE_DELAY, 4*BASE_DELAY, ... capped at MAX_DELAY
+BASE_DELAY = 300
+MAX_DELAY = 24 * 3600
+
+# HTTP status codes that are worth retrying
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# HTTP status codes of resources that do not exist (any more)
+NOT_FOUND_STATUS_CODES = {404, 410}
+
+
+def _status_code(error):
+    """Extract an HTTP status code from requests, PyGithub or python-gitlab errors"""
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) is not None:
+        return response.status_code
+    # PyGithub: GithubException.status, python-gitlab: GitlabError.response_code
+    for attr in ('status', 'response_code'):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def classify_error(error):
+    """
+    Classify an exception (or error message) as TRANSIENT or PERMANENT.
+
+    Network failures, timeouts, rate limits and server errors are transient.
+    Client errors (404, 410, ...) and parsing problems are permanent.
+    """
+    if isinstance(error, str):
+        return TRANSIENT
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return TRANSIENT
+    status = _status_code(error)
+    if status is not None:
+        if status in TRANSIENT_STATUS_CODES or status >= 500:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, (ValueError, KeyError, UnicodeDecodeError)):
+        return PERMANENT
+    return TRANSIENT
+
+
+def is_not_found(error):
+    """Whether an error means the requested resource does not exist (404, 410)"""
+    return _status_code(error) in NOT_FOUND_STATUS_CODES
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt after `attempts` failed attempts"""
+    if attempts < 1:
+        return 0
+    return min(BASE_DELAY * (2 ** (attempts - 1)), MAX_DELAY)
+
+
+def should_dead_letter(attempts, kind):
+    """Whether an item that failed `attempts` times with `kind` should be dead-lettered"""
+    return kind == PERMANENT or attempts >= MAX_ATTEMPTS
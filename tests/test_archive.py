@@ -0,0 +1,98 @@
+"""
+Unit tests for the raw response archive and offline reprocessing
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import requests
+
+import archive
+import db_utils
+from benchmarks.standins import Dataset, StandIns, FORUM_URL
+from forum.search import fetch_forum_thread_list, process_forum_work_queue
+from git.search import process_git_work_queue
+from reprocess import run_reprocess
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.temp_dir, "archive")
+        self.original_paths = {name: getattr(db_utils, name) for name in
+                               ("DB_PATH", "FORUM_QUEUE_DB", "GIT_QUEUE_DB", "GIT_HOSTS_DB", "NON_MOD_REPOS_DB")}
+        for name, path in self.original_paths.items():
+            setattr(db_utils, name, os.path.join(self.temp_dir, path))
+        db_utils.init_all_databases()
+        db_utils.clear_non_mod_repo_cache()
+
+    def tearDown(self):
+        archive.disable()
+        for name, path in self.original_paths.items():
+            setattr(db_utils, name, path)
+        db_utils.clear_non_mod_repo_cache()
+        shutil.rmtree(self.temp_dir)
+
+    def test_content_addressed_store(self):
+        os.makedirs(self.archive_dir)
+        url = "https://example.com/mod.conf"
+        first = archive.store(self.archive_dir, "GET", url, 200, "OK", {}, b"name = a\n",
+                              fetched_at="2024-01-01 00:00:00")
+        archive.store(self.archive_dir, "GET", "https://example.com/copy", 200, "OK", {}, b"name = a\n")
+        archive.store(self.archive_dir, "GET", url, 200, "OK", {}, b"name = b\n",
+                      fetched_at="2024-02-01 00:00:00")
+
+        objects = [name for _, _, names in os.walk(os.path.join(self.archive_dir, "objects")) for name in names]
+        self.assertEqual(len(objects), 2)
+        latest = archive.lookup(self.archive_dir, url)
+        self.assertEqual(archive.read_body(self.archive_dir, latest["content_hash"]), b"name = b\n")
+        older = archive.lookup(self.archive_dir, url, as_of="2024-01-15 00:00:00")
+        self.assertEqual(older["content_hash"], first)
+        self.assertIsNone(archive.lookup(self.archive_dir, "https://example.com/missing"))
+
+    def test_replay_without_network(self):
+        os.makedirs(self.archive_dir)
+        archive.store(self.archive_dir, "GET", "https://example.com/page", 200, "OK",
+                      {"Content-Type": "text/html; charset=utf-8", "Content-Encoding": "gzip"}, b"<p>hi</p>")
+        archive.enable_replay(self.archive_dir)
+
+        resp = requests.get("https://example.com/page")
+        self.assertEqual(resp.text, "<p>hi</p>")
+        self.assertNotIn("Content-Encoding", resp.headers)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            requests.get("https://example.com/not-archived")
+
+    def test_reprocess_from_archive(self):
+        # Enabled first so the archive sees the original URLs, not the routed ones
+        archive.enable(self.archive_dir)
+        with StandIns(Dataset(threads=3, packages=0)):
+            fetch_forum_thread_list(FORUM_URL)
+            while process_forum_work_queue(10):
+                pass
+            while process_git_work_queue(10):
+                pass
+            archive.disable()
+
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        crawled = conn.execute("SELECT repo_url, name, type FROM results ORDER BY repo_url").fetchall()
+        conn.execute("UPDATE results SET name='outdated'")
+        conn.commit()
+        conn.close()
+
+        # The stand-ins are gone: everything has to come from the archive
+        stats = run_reprocess(self.archive_dir, workers=2)
+
+        self.assertEqual(stats["forum_threads"], 3)
+        self.assertEqual(stats["mods"], 3)
+        self.assertEqual(stats["missing"], 0)
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        reprocessed = conn.execute("SELECT repo_url, name, type FROM results ORDER BY repo_url").fetchall()
+        conn.close()
+        self.assertEqual(reprocessed, crawled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Unit tests for canonical repository URLs and URL deduplication
+"""
+import unittest
+import tempfile
+import shutil
+import sqlite3
+import os
+from unittest.mock import MagicMock, patch
+
+import db_utils
+from db_utils import init_all_databases, add_to_git_queue, is_git_repo_in_queue, save_result, add_mods_to_db
+from git import canonical
+from git.canonical import canonicalize_repo_url
+from git.search import process_git_work_queue
+
+
+class TestCanonicalizeRepoUrl(unittest.TestCase):
+
+    def test_github_variants(self):
+        variants = [
+            "https://github.com/minetest-mods/mesecons",
+            "https://github.com/minetest-mods/mesecons/",
+            "https://github.com/minetest-mods/mesecons.git",
+            "http://github.com/minetest-mods/mesecons",
+            "https://www.github.com/minetest-mods/mesecons",
+            "https://github.com/minetest-mods/mesecons/tree/master",
+            "https://github.com/Minetest-Mods/Mesecons",
+            "git@github.com:minetest-mods/mesecons.git",
+            "github.com/minetest-mods/mesecons#readme",
+        ]
+        for url in variants:
+            self.assertEqual(canonicalize_repo_url(url), "https://github.com/minetest-mods/mesecons", url)
+
+    def test_gitlab_nested_namespace(self):
+        self.assertEqual(
+            canonicalize_repo_url("https://gitlab.com/Group/SubGroup/repo/-/tree/main/mods"),
+            "https://gitlab.com/group/subgroup/repo")
+
+    def test_gitea_branch_path(self):
+        self.assertEqual(
+            canonicalize_repo_url("https://codeberg.org/Wuzzy/xdecor-libre/src/branch/master"),
+            "https://codeberg.org/wuzzy/xdecor-libre")
+
+    def test_unknown_host_keeps_path_case(self):
+        self.assertEqual(canonicalize_repo_url("https://git.example.org/Owner/Repo.git/"),
+                         "https://git.example.org/Owner/Repo")
+
+    def test_empty(self):
+        self.assertIsNone(canonicalize_repo_url(""))
+        self.assertIsNone(canonicalize_repo_url(None))
+
+
+class TestCanonicalDedup(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test databases in a temporary directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_paths = (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+                               db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB)
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "test_mod_list.db")
+        db_utils.FORUM_QUEUE_DB = os.path.join(self.temp_dir, "test_forum_queue.db")
+        db_utils.GIT_QUEUE_DB = os.path.join(self.temp_dir, "test_git_queue.db")
+        db_utils.GIT_HOSTS_DB = os.path.join(self.temp_dir, "test_git_hosts.db")
+        db_utils.NON_MOD_REPOS_DB = os.path.join(self.temp_dir, "test_non_mod_repos.db")
+        init_all_databases()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+         db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB) = self.original_paths
+
+    def test_git_queue_dedup(self):
+        self.assertTrue(add_to_git_queue("https://github.com/a/b", "search"))
+        self.assertFalse(add_to_git_queue("http://github.com/A/b.git", "search"))
+        self.assertFalse(add_to_git_queue("https://github.com/a/b/tree/master", "search"))
+        self.assertTrue(is_git_repo_in_queue("https://github.com/A/B/"))
+
+    def test_results_merge_by_canonical_url(self):
+        save_result({"repo_url": "https://github.com/a/b", "name": "b", "type": "mod"}, "git")
+        save_result({"repo_url": "https://github.com/A/b.git", "name": "b",
+                     "forum_url": "https://forum.luanti.org/viewtopic.php?t=1"}, "forum")
+
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        rows = conn.execute("SELECT repo_url, forum_url, source, type FROM results").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("https://github.com/a/b", "https://forum.luanti.org/viewtopic.php?t=1",
+                                 "git", "mod")])
+
+    def test_contentdb_sync_updates_its_rows(self):
+        mod = {"name": "b", "mod_type": "mod", "author": "a", "description": "old", "source": "contentdb",
+               "url": "https://content.minetest.net/packages/a/b",
+               "metadata": {"contentdb_url": "https://content.minetest.net/packages/a/b"}}
+        add_mods_to_db([mod])
+        add_mods_to_db([dict(mod, description="new")])
+
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        rows = conn.execute("SELECT contentdb_url, description, canonical_url FROM results").fetchall()
+        conn.close()
+        self.assertEqual(rows, [(mod["url"], "new", mod["url"])])
+
+    @patch('git.search.check_luanti_mod_repository', return_value=(False, {}))
+    @patch('git.canonical.requests.head')
+    def test_redirects_resolved_for_new_repos_only(self, mock_head, _mock_check):
+        mock_head.return_value = MagicMock(status_code=200, url="https://github.com/new/b")
+        canonical._redirect_cache.clear()
+        save_result({"repo_url": "https://github.com/a/known", "name": "known"}, "git")
+        add_to_git_queue("https://github.com/a/known", "search")
+        process_git_work_queue(10)
+        mock_head.assert_not_called()
+
+        add_to_git_queue("https://github.com/new/b", "search")
+        add_to_git_queue("https://github.com/old/b", "search")
+        self.assertEqual([result["status"] for result in process_git_work_queue(10)], ["success", "duplicate"])
+        self.assertEqual(mock_head.call_count, 2)
+        canonical._redirect_cache.clear()
+
+    def test_migration_removes_duplicate_queue_rows(self):
+        conn = sqlite3.connect(db_utils.GIT_QUEUE_DB)
+        conn.execute("DROP INDEX idx_git_work_queue_canonical_url")
+        conn.execute("UPDATE git_work_queue SET canonical_url=NULL")
+        conn.execute("INSERT INTO git_work_queue (url, source) VALUES ('https://github.com/a/b', 'x')")
+        conn.execute("INSERT INTO git_work_queue (url, source) VALUES ('https://github.com/a/b/', 'x')")
+        conn.commit()
+        conn.close()
+
+        db_utils.init_git_work_queue()
+
+        conn = sqlite3.connect(db_utils.GIT_QUEUE_DB)
+        rows = conn.execute("SELECT url, canonical_url FROM git_work_queue").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("https://github.com/a/b", "https://github.com/a/b")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Unit tests for checkpoint and resume of the ContentDB sync, forum refresh and git search
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+import db_utils
+from benchmarks.standins import FORUM_URL, Dataset, StandIns
+from contentdb import api
+from db_utils import (CHECKPOINT_CONTENTDB, CHECKPOINT_FORUM, CHECKPOINT_GIT_SEARCH, add_mods_to_db,
+                      get_checkpoint, get_mod_count)
+from forum.search import fetch_forum_thread_list
+from git.search import search_all_git_servers
+
+DB_PATH_NAMES = ("DB_PATH", "FORUM_QUEUE_DB", "GIT_QUEUE_DB", "GIT_HOSTS_DB", "NON_MOD_REPOS_DB")
+
+
+def failing_get(module, fails):
+    """requests.get of `module` that raises for URLs or params matching `fails`"""
+    real_get = requests.get
+
+    def get(url, params=None, **kwargs):
+        if fails(url, params or {}):
+            raise requests.exceptions.ConnectionError("connection reset")
+        return real_get(url, params=params, **kwargs)
+    return patch(f"{module}.requests.get", side_effect=get)
+
+
+class TestCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.saved = {name: getattr(db_utils, name) for name in DB_PATH_NAMES}
+        for name in DB_PATH_NAMES:
+            setattr(db_utils, name, os.path.join(self.temp_dir, self.saved[name]))
+        db_utils.init_all_databases()
+        self.standins = StandIns(Dataset(threads=70, packages=120))
+        self.standins.__enter__()
+
+    def tearDown(self):
+        self.standins.__exit__(None, None, None)
+        for name, path in self.saved.items():
+            setattr(db_utils, name, path)
+        shutil.rmtree(self.temp_dir)
+
+    def test_contentdb_sync(self):
+        with failing_get("contentdb.api", lambda url, params: params.get("page") == 3):
+            api.sync_contentdb_to_database()
+        self.assertEqual((get_checkpoint(CHECKPOINT_CONTENTDB), get_mod_count()), ({"page": 2}, 100))
+
+        # A page is stored with its checkpoint or not at all
+        with self.assertRaises(TypeError):
+            add_mods_to_db([{"name": "a", "mod_type": "mod", "author": "b", "description": "", "source": "contentdb",
+                             "url": "u"}, {"name": "broken"}], checkpoint=(CHECKPOINT_CONTENTDB, {"page": 3}))
+        self.assertEqual((get_checkpoint(CHECKPOINT_CONTENTDB), get_mod_count()), ({"page": 2}, 100))
+
+        self.assertEqual(api.sync_contentdb_to_database(resume=True), (20, 0))
+        self.assertEqual((get_checkpoint(CHECKPOINT_CONTENTDB), get_mod_count()), (None, 120))
+
+    def test_forum_refresh(self):
+        job = f"{CHECKPOINT_FORUM}:{FORUM_URL}"
+        with failing_get("forum.search", lambda url, params: url.endswith("start=60")):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                fetch_forum_thread_list(FORUM_URL)
+        self.assertEqual(get_checkpoint(job), {"next": f"{FORUM_URL}&start=60"})
+        self.assertEqual(db_utils.get_forum_queue_status()["pending"], 60)
+
+        added = fetch_forum_thread_list(FORUM_URL, resume=True)
+        self.assertEqual(len(added), 10)
+        self.assertIsNone(get_checkpoint(job))
+        # Without resume all pages are read again
+        self.assertEqual(fetch_forum_thread_list(FORUM_URL), [])
+
+    def test_git_search(self):
+        searched = []
+
+        def search(host_url, host_type, keyword, max_results):
+            searched.append((host_type, keyword))
+            if (host_type, keyword) in fails:
+                raise requests.exceptions.ConnectionError("connection reset")
+            return [f"https://{host_type}.example/{keyword}/repo"]
+
+        fails = {("gitlab", "minetest")}
+        with patch("git.search._search_host", side_effect=search):
+            found = search_all_git_servers(["luanti", "minetest"])
+            self.assertEqual(len(found), 5)
+            # The failed search keeps the checkpoint at the one before it
+            self.assertEqual(get_checkpoint(CHECKPOINT_GIT_SEARCH), {"host": "https://gitlab.com", "keyword": "luanti"})
+
+            fails = set()
+            del searched[:]
+            self.assertEqual(len(search_all_git_servers(["luanti", "minetest"], resume=True)), 3)
+            self.assertEqual(searched, [("gitlab", "minetest"), ("gitea", "luanti"), ("gitea", "minetest")])
+            self.assertIsNone(get_checkpoint(CHECKPOINT_GIT_SEARCH))
+        self.assertEqual(db_utils.get_git_queue_status()["pending"], 6)
+
+    def test_git_search_order_is_stable(self):
+        for host_url in ("https://z.example", "https://a.example", "https://m.example"):
+            db_utils.add_git_host(host_url, "gitea")
+        searched = []
+        with patch("git.search._search_host", side_effect=lambda host_url, *args: searched.append(host_url) or []):
+            search_all_git_servers(["luanti"])
+        self.assertEqual(searched[3:], ["https://a.example", "https://m.example", "https://z.example"])
+        with self.assertRaises(ValueError):
+            get_checkpoint("unknown_job")
+
+
+if __name__ == '__main__':
+    unittest.main()
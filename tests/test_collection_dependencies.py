@@ -0,0 +1,106 @@
+"""
+Unit tests for the dependency closure of collection packs
+"""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import db_utils
+from contentdb import dependencies
+from contentdb.collection_pack import resolve_dependencies
+from contentdb.dependencies import DependencyResolver
+
+# author/name -> hard dependencies as {mod: [providing packages]}
+PACKAGES = {
+    "a/pack_mod": {"mesecons": ["Jeija/mesecons"], "default": ["Minetest/minetest_game"]},
+    "Jeija/mesecons": {"basic_materials": ["VanessaE/basic_materials", "other/basic_materials_fork"]},
+    "VanessaE/basic_materials": {"default": ["Minetest/minetest_game"]},
+    "b/gadget": {"mobs": ["x/mobs_alt", "TenPlus1/mobs"], "nonexistent": []},
+    "TenPlus1/mobs": {},
+    "x/mobs_alt": {},
+}
+GAMES = [{"author": "Minetest", "name": "minetest_game"}]
+
+
+def fake_dependencies(package_id):
+    return {package_id: [{"name": mod, "is_optional": False, "packages": providers}
+                         for mod, providers in PACKAGES[package_id].items()] +
+            [{"name": "optional_thing", "is_optional": True, "packages": ["z/optional_thing"]}]}
+
+
+class TestDependencyResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+        def counted(package_id):
+            with self.lock:
+                self.calls.append(package_id)
+            return fake_dependencies(package_id)
+
+        self.patches = [
+            patch.object(dependencies, "get_package_dependencies", side_effect=counted),
+            patch.object(dependencies, "search_packages", return_value=GAMES),
+            patch.object(dependencies, "get_package_details",
+                         side_effect=lambda package_id: {"type": "mod", "repo": f"https://git.example.org/{package_id}"}),
+            patch.object(dependencies, "get_contentdb_packages_for_mod",
+                         side_effect=lambda mod: ["TenPlus1/mobs"] if mod == "mobs" else []),
+            patch.object(dependencies, "detect_repo_type",
+                         side_effect=lambda url: ("mod", {"depends": ["mobs", "unknown_mod", "extra_b"]})),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_closure_and_provider_choice(self):
+        resolver = DependencyResolver(workers=4)
+        added, game_provided, unresolved = resolver.resolve(["a/pack_mod", "b/gadget"])
+        # The package named like the mod wins, games are never added
+        self.assertEqual(added, ["Jeija/mesecons", "TenPlus1/mobs", "VanessaE/basic_materials"])
+        self.assertEqual(game_provided, ["default"])
+        self.assertEqual(unresolved, ["nonexistent"])
+        # Every package is looked up once, optional dependencies are not followed
+        self.assertEqual(sorted(self.calls), sorted(["a/pack_mod", "b/gadget", "Jeija/mesecons",
+                                                     "TenPlus1/mobs", "VanessaE/basic_materials"]))
+        resolver.resolve(["a/pack_mod"])
+        self.assertEqual(len(self.calls), 5)
+
+    def test_selected_provider_satisfies_dependency(self):
+        added, _, _ = DependencyResolver().resolve(["b/gadget", "x/mobs_alt"])
+        self.assertEqual(added, [])
+
+    def test_conf_depends_of_extra_git_mods(self):
+        entries = resolve_dependencies([], ["https://git.example.org/u/extra_a", "https://git.example.org/u/extra_b"])
+        self.assertEqual(entries, [{"type": "mod", "author": "TenPlus1", "name": "mobs",
+                                    "repo_url": "https://git.example.org/TenPlus1/mobs"}])
+
+
+class TestContentDBPackagesForMod(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_db_path = db_utils.DB_PATH
+        db_utils.DB_PATH = os.path.join(self.temp_dir.name, "mod_list.db")
+        db_utils.init_db()
+
+    def tearDown(self):
+        db_utils.DB_PATH = self.original_db_path
+        self.temp_dir.cleanup()
+
+    def test_lookup(self):
+        db_utils.save_result({"name": "mobs", "type": "mod",
+                              "contentdb_url": "https://content.luanti.org/packages/TenPlus1/mobs/",
+                              "repo_url": "https://codeberg.org/tenplus1/mobs_redo"}, "contentdb")
+        db_utils.save_result({"name": "mobs", "type": "mod", "repo_url": "https://github.com/someone/mobs"}, "git")
+        self.assertEqual(db_utils.get_contentdb_packages_for_mod("mobs"), ["TenPlus1/mobs"])
+        self.assertEqual(db_utils.get_contentdb_packages_for_mod("other"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Unit tests for generating packs from ContentDB collections, cloning from local bare repositories
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from contentdb.collection_pack import clone_all, generate_from_collection
+from git.mirror import MirrorCache, parse_size
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME="test", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="test", GIT_COMMITTER_EMAIL="test@example.com")
+
+
+def make_bare_repo(root, name, files, commits=2):
+    """Create <root>/<name>.git with `commits` commits and return its file:// URL"""
+    work = os.path.join(root, f"{name}_work")
+    os.makedirs(work)
+    subprocess.run(["git", "init", "--quiet", work], check=True, env=GIT_ENV)
+    for n in range(commits):
+        for path, content in files.items():
+            with open(os.path.join(work, path), "w") as f:
+                f.write(f"{content}\n-- {n}\n" if n < commits - 1 else content)
+        subprocess.run(["git", "-C", work, "add", "."], check=True, env=GIT_ENV)
+        subprocess.run(["git", "-C", work, "commit", "--quiet", "-m", f"commit {n}"], check=True, env=GIT_ENV)
+    bare = os.path.join(root, f"{name}.git")
+    subprocess.run(["git", "clone", "--quiet", "--bare", work, bare], check=True, env=GIT_ENV)
+    shutil.rmtree(work)
+    return f"file://{bare}"
+
+
+def push_commit(url, path, content):
+    """Commit `content` to `path` in the bare repository at `url`"""
+    work = tempfile.mkdtemp()
+    try:
+        subprocess.run(["git", "clone", "--quiet", url, work], check=True, env=GIT_ENV)
+        with open(os.path.join(work, path), "w") as f:
+            f.write(content)
+        subprocess.run(["git", "-C", work, "commit", "--quiet", "-am", "update"], check=True, env=GIT_ENV)
+        subprocess.run(["git", "-C", work, "push", "--quiet"], check=True, env=GIT_ENV)
+    finally:
+        shutil.rmtree(work)
+
+
+class TestCollectionPack(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.repos = os.path.join(self.temp_dir, "repos")
+        self.output = os.path.join(self.temp_dir, "pack")
+        os.makedirs(self.repos)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _commit_count(self, path):
+        result = subprocess.run(["git", "-C", path, "rev-list", "--count", "HEAD"],
+                                capture_output=True, text=True, check=True)
+        return int(result.stdout)
+
+    def test_generate_with_failures(self):
+        mesecons = make_bare_repo(self.repos, "mesecons", {"mod.conf": "name = mesecons\n"})
+        make_bare_repo(self.repos, "extra_mod", {"mod.conf": "name = extra_mod\n"})
+        # Links in the description are https URLs: let git map them to the local repositories
+        extra = "https://git.example.org/extra_mod"
+        insteadof = {"GIT_CONFIG_COUNT": "1", "GIT_CONFIG_KEY_0": f"url.file://{self.repos}/.insteadOf",
+                     "GIT_CONFIG_VALUE_0": "https://git.example.org/"}
+        missing = f"file://{self.repos}/missing.git"
+        data = {
+            "description": f"A collection\n# Additional Mods from git\n{extra}\n",
+            "items": [
+                {"type": "mod", "name": "mesecons", "repo_url": mesecons},
+                {"type": "mod", "name": "broken", "repo_url": missing},
+                {"type": "mod", "name": "no_repo"},
+            ],
+        }
+        with patch("contentdb.collection_pack.fetch_collection_data", return_value=data), \
+                patch.dict(os.environ, insteadof):
+            failures = generate_from_collection("https://content.luanti.org/collections/7/", self.output,
+                                                workers=4)
+
+        self.assertEqual([(url, os.path.basename(target)) for url, target, _ in failures], [(missing, "broken")])
+        self.assertFalse(os.path.exists(os.path.join(self.output, "broken")))
+        with open(os.path.join(self.output, "mesecons", "mod.conf")) as f:
+            self.assertEqual(f.read(), "name = mesecons\n")
+        self.assertEqual(self._commit_count(os.path.join(self.output, "mesecons")), 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.output, "extra_mod", "mod.conf")))
+        self.assertTrue(os.path.isdir(os.path.join(self.output, "no_repo")))
+        self.assertTrue(os.path.isfile(os.path.join(self.output, "modpack.conf")))
+
+    def test_full_history_and_existing_directories(self):
+        url = make_bare_repo(self.repos, "technic", {"mod.conf": "name = technic\n"}, commits=3)
+        target = os.path.join(self.output, "technic")
+        self.assertEqual(clone_all([(url, target)], shallow=False), [])
+        self.assertEqual(self._commit_count(target), 3)
+        # A second run leaves the existing clone alone
+        self.assertEqual(clone_all([(url, target), (f"file://{self.repos}/none.git", target)]), [])
+
+
+
+class TestMirrorCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.repos = os.path.join(self.temp_dir, "repos")
+        os.makedirs(self.repos)
+        self.cache = MirrorCache(os.path.join(self.temp_dir, "cache"), refresh_after=3600)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _read(self, *path):
+        with open(os.path.join(self.temp_dir, *path)) as f:
+            return f.read()
+
+    def test_checkout_from_mirror(self):
+        url = make_bare_repo(self.repos, "mobs", {"mod.conf": "name = mobs\n"})
+        self.assertIsNone(self.cache.checkout(url, os.path.join(self.temp_dir, "pack1", "mobs")))
+        push_commit(url, "mod.conf", "name = mobs\ndepends = default\n")
+
+        # Fetched recently: served from the mirror as it is
+        self.assertIsNone(self.cache.checkout(url, os.path.join(self.temp_dir, "pack2", "mobs")))
+        self.assertEqual(self._read("pack2", "mobs", "mod.conf"), "name = mobs\n")
+        # Due for a refresh: an incremental fetch picks up the new commit
+        self.cache.refresh_after = 0
+        self.assertIsNone(self.cache.checkout(url, os.path.join(self.temp_dir, "pack3", "mobs"), shallow=False))
+        self.assertEqual(self._read("pack3", "mobs", "mod.conf"), "name = mobs\ndepends = default\n")
+
+        origin = subprocess.run(["git", "-C", os.path.join(self.temp_dir, "pack3", "mobs"), "remote", "get-url",
+                                 "origin"], capture_output=True, text=True, check=True).stdout.strip()
+        self.assertEqual(origin, url)
+        self.assertEqual(len(self.cache.mirrors()), 1)
+
+    def test_concurrent_checkouts(self):
+        url = make_bare_repo(self.repos, "mesecons", {"mod.conf": "name = mesecons\n"})
+        items = [(url, os.path.join(self.temp_dir, f"pack{n}", "mesecons")) for n in range(6)]
+        self.assertEqual(clone_all(items, workers=6, mirror=self.cache), [])
+        for _, target in items:
+            self.assertTrue(os.path.isfile(os.path.join(target, "mod.conf")))
+        self.assertEqual(len(self.cache.mirrors()), 1)
+
+    def test_eviction(self):
+        urls = [make_bare_repo(self.repos, name, {"mod.conf": f"name = {name}\n" * 200})
+                for name in ("a", "b", "c")]
+        for n, url in enumerate(urls):
+            self.assertIsNone(self.cache.checkout(url, os.path.join(self.temp_dir, "pack", str(n))))
+            os.utime(f"{self.cache.mirror_path(url)}.lock", (1000 + n, 1000 + n))
+        sizes = {path: size for path, size, _ in self.cache.mirrors()}
+
+        # The least recently used mirror (a) is in use, so b goes instead
+        with self.cache._lock(self.cache.mirror_path(urls[0]), shared=True):
+            removed = self.cache.evict(sum(sizes.values()) - 1)
+        self.assertEqual(removed, [self.cache.mirror_path(urls[1])])
+        self.assertEqual(self.cache.evict(0), [self.cache.mirror_path(urls[0]), self.cache.mirror_path(urls[2])])
+        # Checkouts do not depend on their mirror
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, "pack", "1", "mod.conf")))
+
+    def test_mirror_evicted_before_checkout(self):
+        url = make_bare_repo(self.repos, "mobs", {"mod.conf": "name = mobs\n"})
+        real_update = self.cache.update
+        evictions = []
+
+        def update(repo_url):
+            mirror = real_update(repo_url)
+            # Another process evicts the mirror once its exclusive lock is released
+            if not evictions:
+                evictions.append(self.cache.evict(0))
+            return mirror
+
+        with patch.object(self.cache, "update", side_effect=update):
+            self.assertIsNone(self.cache.checkout(url, os.path.join(self.temp_dir, "pack", "mobs")))
+        self.assertEqual(evictions, [[self.cache.mirror_path(url)]])
+        self.assertEqual(self._read("pack", "mobs", "mod.conf"), "name = mobs\n")
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("20G"), 20 * 1024 ** 3)
+        self.assertEqual(parse_size("1.5m"), 1536 * 1024)
+        self.assertEqual(parse_size("4096"), 4096)
+        with self.assertRaises(ValueError):
+            parse_size("big")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Unit tests for the streaming ContentDB pagination and sync
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+import db_utils
+from benchmarks.standins import Dataset, StandIns
+from contentdb import api
+
+DB_PATH_NAMES = ("DB_PATH", "FORUM_QUEUE_DB", "GIT_QUEUE_DB", "GIT_HOSTS_DB", "NON_MOD_REPOS_DB")
+
+
+class TestContentDBSync(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.saved = {name: getattr(db_utils, name) for name in DB_PATH_NAMES}
+        for name in DB_PATH_NAMES:
+            setattr(db_utils, name, os.path.join(self.temp_dir, self.saved[name]))
+        db_utils.init_all_databases()
+        self.standins = StandIns(Dataset(threads=0, packages=120))
+        self.standins.__enter__()
+
+    def tearDown(self):
+        self.standins.__exit__(None, None, None)
+        for name, path in self.saved.items():
+            setattr(db_utils, name, path)
+        shutil.rmtree(self.temp_dir)
+
+    def test_pages(self):
+        pages = [(page, len(packages)) for page, packages in api.iter_package_pages()]
+        self.assertEqual(pages, [(1, 50), (2, 50), (3, 20)])
+        self.assertEqual([package["name"] for package in api.iter_packages(start_page=3, per_page=40)],
+                         [f"cdb_{i}" for i in range(80, 120)])
+        self.assertEqual(len(api.fetch_all_packages()), 120)
+
+    def test_sync_streams_and_resumes(self):
+        real_get = requests.get
+        stored = {}
+
+        def failing_get(url, params=None, **kwargs):
+            if (params or {}).get("page") == 3:
+                raise requests.exceptions.ConnectionError("connection reset")
+            return real_get(url, params=params, **kwargs)
+
+        def on_page(page):
+            # Each page is in the database before the next one is fetched
+            stored[page] = db_utils.get_mod_count()
+
+        with patch("contentdb.api.requests.get", side_effect=failing_get):
+            api.sync_contentdb_to_database(on_page=on_page)
+        self.assertEqual(stored, {1: 50, 2: 100})
+        self.assertEqual(db_utils.get_git_queue_status()["pending"], 100)
+
+        self.assertEqual(api.sync_contentdb_to_database(start_page=3, on_page=on_page), (20, 0))
+        self.assertEqual(stored[3], 120)
+
+        # Synced again: the packages are updated, not added twice
+        self.assertEqual(api.sync_contentdb_to_database(), (0, 120))
+        self.assertEqual(db_utils.get_mod_count(), 120)
+
+    def test_storage_error_stops_at_checkpoint(self):
+        real_add = db_utils.add_mods_to_db
+
+        def add_mods_to_db(mods, checkpoint=None):
+            if checkpoint[1]["page"] == 2:
+                raise sqlite3.OperationalError("database is locked")
+            return real_add(mods, checkpoint)
+
+        with patch("contentdb.api.add_mods_to_db", side_effect=add_mods_to_db):
+            self.assertEqual(api.sync_contentdb_to_database(), (50, 0))
+        self.assertEqual(db_utils.get_checkpoint(db_utils.CHECKPOINT_CONTENTDB), {"page": 1})
+        self.assertEqual(api.sync_contentdb_to_database(resume=True), (70, 0))
+
+    def test_skipped_packages_are_retried(self):
+        real_get = requests.get
+        unavailable = {"cdb_7", "cdb_60"}
+
+        def flaky_get(url, params=None, **kwargs):
+            if url.rstrip("/").rsplit("/", 1)[-1] in unavailable:
+                response = requests.Response()
+                response.status_code = 503
+                return response
+            return real_get(url, params=params, **kwargs)
+
+        with patch("contentdb.api.requests.get", side_effect=flaky_get):
+            self.assertEqual(api.sync_contentdb_to_database(), (118, 0))
+        # All pages are stored, but the checkpoint keeps the skipped packages
+        self.assertEqual(db_utils.get_checkpoint(db_utils.CHECKPOINT_CONTENTDB),
+                         {"page": 3, "skipped": ["bench/cdb_7", "bench/cdb_60"]})
+
+        unavailable.discard("cdb_7")
+        with patch("contentdb.api.requests.get", side_effect=flaky_get):
+            self.assertEqual(api.sync_contentdb_to_database(resume=True), (1, 0))
+        self.assertEqual(db_utils.get_checkpoint(db_utils.CHECKPOINT_CONTENTDB),
+                         {"page": 3, "skipped": ["bench/cdb_60"]})
+
+        self.assertEqual(api.sync_contentdb_to_database(resume=True), (1, 0))
+        self.assertIsNone(db_utils.get_checkpoint(db_utils.CHECKPOINT_CONTENTDB))
+        self.assertEqual(db_utils.get_mod_count(), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
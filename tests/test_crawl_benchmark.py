@@ -0,0 +1,57 @@
+"""
+End-to-end crawl against the local stand-in servers (no network access)
+"""
+import unittest
+
+import requests
+
+from benchmarks.standins import Dataset, StandIns
+from benchmarks.crawl_benchmark import run_benchmark, compare_to_baseline
+
+
+class TestStandIns(unittest.TestCase):
+
+    def test_routes_real_hosts_and_blocks_others(self):
+        with StandIns(Dataset(threads=3, packages=0)) as standins:
+            manifest = requests.get("https://gitlab.com/-/manifest.json").json()
+            page = requests.get("https://forum.luanti.org/viewtopic.php?t=1")
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                requests.get("https://unknown.invalid/")
+
+        self.assertEqual(manifest["name"], "GitLab")
+        self.assertEqual(page.url, "https://forum.luanti.org/viewtopic.php?t=1")
+        self.assertIn("https://github.com/bench/mod_0", page.text)
+        self.assertEqual(standins.request_counts()["forum"], 1)
+
+    def test_rate_limit(self):
+        with StandIns(Dataset(threads=1, packages=0), rate_limit={"gitea": 1}):
+            statuses = [requests.get("https://codeberg.org/").status_code for _ in range(3)]
+
+        self.assertEqual(statuses[0], 200)
+        self.assertIn(429, statuses[1:])
+
+
+class TestCrawlBenchmark(unittest.TestCase):
+
+    def test_full_crawl(self):
+        report = run_benchmark(threads=3, packages=2, latency=0)
+
+        phases = report["phases"]
+        self.assertEqual(phases["contentdb_sync"]["items"], 2)
+        self.assertEqual(phases["forum_refresh"]["items"], 3)
+        self.assertEqual(phases["forum_threads"]["items"], 3)
+        self.assertEqual(phases["forum_refresh"]["requests_by_host"], {"forum.luanti.org": 1})
+        # 2 ContentDB packages, 3 forum mods (one per forge) and one repository
+        # only listed on ContentDB
+        self.assertEqual(report["totals"]["results"], 6)
+        self.assertEqual(report["stages"]["forum_thread"]["items"], 3)
+        self.assertEqual(compare_to_baseline(report, report), [])
+
+        more_requests = {"config": report["config"],
+                         "phases": {name: dict(phase, requests=phase["requests"] - 1)
+                                    for name, phase in phases.items()}}
+        self.assertTrue(compare_to_baseline(report, more_requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Unit tests for the synthetic database load generator
+"""
+import unittest
+import tempfile
+import shutil
+
+import db_utils
+from benchmarks import db_load
+
+
+class TestDbLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_paths = {name: getattr(db_utils, name) for name in db_load._DB_PATH_NAMES}
+        db_load.use_directory(self.temp_dir)
+
+    def tearDown(self):
+        for name, path in self.original_paths.items():
+            setattr(db_utils, name, path)
+        db_utils.clear_non_mod_repo_cache()
+        shutil.rmtree(self.temp_dir)
+
+    def test_generate_and_benchmark(self):
+        rows = db_load.generate(200)
+
+        self.assertEqual(rows, {"forum_threads": 200, "git_work_queue": 200,
+                                "results": 100, "non_mod_repos": 50})
+        self.assertTrue(db_utils.is_git_repo_in_queue(db_load.repo_url(7)))
+        status = db_utils.get_git_queue_status()
+        self.assertEqual(sum(status.values()), 200)
+        self.assertGreater(status["pending"], 0)
+
+        report = db_load.run_operations(200, operations=20)
+
+        self.assertEqual(report["enqueue_git_repo"]["items"], 20)
+        self.assertEqual(report["claim_forum_threads"]["items"], 2)
+        self.assertEqual(report["mark_forum_thread_processed"]["items"], 20)
+        self.assertIn("p99_ms", report["status_git_queue"])
+        self.assertEqual(db_utils.get_git_queue_status()["processed"], status["processed"] + 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
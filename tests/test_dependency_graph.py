@@ -0,0 +1,112 @@
+"""
+Unit tests for the dependency edge table and the in-memory dependency graph
+"""
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import db_utils
+from db_utils import add_mod_to_db, get_dependency_edges, save_result
+from dependency_graph import DependencyGraph
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = DependencyGraph([
+            ("technic", "default", False),
+            ("technic", "pipeworks", False),
+            ("technic", "mesecons", True),
+            ("pipeworks", "default", False),
+            ("mesecons", "mesecons_wires", False),
+            ("mesecons_wires", "mesecons", False),
+        ])
+
+    def test_closure_and_reverse(self):
+        self.assertEqual(self.graph.dependencies("technic"), ["default", "pipeworks"])
+        self.assertEqual(self.graph.closure("technic"), ["default", "pipeworks"])
+        self.assertEqual(self.graph.closure("technic", optional=True),
+                         ["default", "pipeworks", "mesecons", "mesecons_wires"])
+        self.assertEqual(sorted(self.graph.reverse_dependencies("default")), ["pipeworks", "technic"])
+        self.assertEqual(self.graph.reverse_dependencies("mesecons_wires", transitive=True, optional=True),
+                         ["mesecons", "technic"])
+        self.assertEqual(self.graph.closure("unknown"), [])
+
+    def test_cycles(self):
+        self.assertEqual(self.graph.find_cycle("mesecons"), ["mesecons", "mesecons_wires", "mesecons"])
+        self.assertIsNone(self.graph.find_cycle("technic"))
+        self.assertEqual(self.graph.cycles(), [["mesecons", "mesecons_wires"]])
+        self.graph.update("default", ["default"])
+        self.assertEqual(self.graph.find_cycle("default"), ["default", "default"])
+        self.assertIn(["default"], self.graph.cycles())
+
+    def test_update(self):
+        self.graph.update("pipeworks", ["basic_materials"])
+        self.graph.update("basic_materials", ["default"])
+        self.assertEqual(self.graph.closure("technic"), ["default", "pipeworks", "basic_materials"])
+        self.assertEqual(sorted(self.graph.reverse_dependencies("default")), ["basic_materials", "technic"])
+        self.assertEqual(self.graph.reverse_dependencies("basic_materials"), ["pipeworks"])
+
+    def test_incremental_updates_match_rebuild(self):
+        rng = random.Random(1)
+        mods = [f"mod{n}" for n in range(200)]
+        graph = DependencyGraph()
+        expected = {}
+        for _ in range(1000):
+            mod = rng.choice(mods)
+            expected[mod] = rng.sample(mods, rng.randint(0, 3))
+            graph.update(mod, expected[mod])
+        rebuilt = DependencyGraph([(mod, dep, False) for mod, deps in expected.items() for dep in deps])
+        for mod in mods:
+            self.assertEqual(sorted(graph.closure(mod)), sorted(rebuilt.closure(mod)), mod)
+            self.assertEqual(sorted(graph.reverse_dependencies(mod)), sorted(rebuilt.reverse_dependencies(mod)))
+
+
+class TestDependencyTable(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_db_path = db_utils.DB_PATH
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "mod_list.db")
+        db_utils.init_db()
+
+    def tearDown(self):
+        db_utils.DB_PATH = self.original_db_path
+        shutil.rmtree(self.temp_dir)
+
+    def test_edges_follow_results(self):
+        save_result({"repo_url": "https://github.com/a/technic", "name": "technic",
+                     "depends": ["default", "pipeworks"], "optional_depends": ["mesecons"]}, "git")
+        self.assertTrue(add_mod_to_db("pipeworks", "mod", "a", "Tubes", "contentdb",
+                                      "https://content.luanti.org/packages/a/pipeworks",
+                                      {"depends": ["default"], "min_minetest_version": "5.0"}))
+        graph = DependencyGraph.from_database()
+        self.assertEqual(graph.closure("technic"), ["default", "pipeworks"])
+
+        save_result({"repo_url": "https://github.com/a/technic", "depends": ["default", "basic_materials"]},
+                    "git", replace=True)
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        conn.execute("DELETE FROM results WHERE name='pipeworks'")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(graph.refresh(), {"technic", "pipeworks"})
+        self.assertEqual(graph.closure("technic", optional=True), ["basic_materials", "default", "mesecons"])
+        self.assertEqual(graph.reverse_dependencies("default"), ["technic"])
+        self.assertEqual(graph.refresh(), set())
+
+    def test_existing_rows_backfilled(self):
+        save_result({"repo_url": "https://github.com/a/technic", "name": "technic", "depends": ["default"]}, "git")
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        conn.execute("DROP TABLE dependencies")
+        conn.commit()
+        conn.close()
+        db_utils.init_db()
+        self.assertEqual(get_dependency_edges(), [("technic", "default", 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Unit tests for the streaming results export
+"""
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import db_utils
+import export
+from db_utils import iter_results, save_result
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_db_path = db_utils.DB_PATH
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "mod_list.db")
+        db_utils.init_db()
+        save_result({"repo_url": "https://github.com/a/mesecons", "name": "mesecons", "type": "modpack",
+                     "license": "LGPL-3.0", "depends": ["default"]}, "forum")
+        save_result({"repo_url": "https://github.com/a/technic", "name": "technic", "type": "modpack",
+                     "license": "LGPL-2.1"}, "git")
+        save_result({"repo_url": "https://github.com/a/pipeworks", "name": "pipeworks", "type": "mod",
+                     "license": "LGPL-3.0"}, "contentdb")
+
+    def tearDown(self):
+        db_utils.DB_PATH = self.original_db_path
+        shutil.rmtree(self.temp_dir)
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_jsonl_projection_and_filters(self):
+        count, revision = export.export_results(self._path("out.jsonl"), "jsonl", ["name", "depends"],
+                                                license="lgpl-3.0")
+        self.assertEqual((count, revision), (2, 3))
+        with open(self._path("out.jsonl")) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows, [{"name": "mesecons", "depends": '["default"]'},
+                                {"name": "pipeworks", "depends": ""}])
+        self.assertFalse(os.path.exists(self._path("out.jsonl.tmp")))
+
+    def test_csv(self):
+        export.export_results(self._path("out.csv"), "csv", ["id", "name", "source"], source="git")
+        with open(self._path("out.csv"), newline="") as f:
+            self.assertEqual(list(csv.reader(f)), [["id", "name", "source"], ["2", "technic", "git"]])
+
+    def test_incremental_since_watermark(self):
+        watermark = self._path("watermark")
+        self.assertEqual(export.read_watermark(watermark), 0)
+        _, revision = export.export_results(self._path("full.jsonl"), columns=["name"])
+        export.write_watermark(watermark, revision)
+
+        # A no-op merge keeps the revision, a change and an insert get new ones
+        save_result({"repo_url": "https://github.com/a/technic", "name": "technic"}, "git")
+        save_result({"repo_url": "https://github.com/a/technic", "name": "technic", "description": "Machines"}, "git")
+        save_result({"repo_url": "https://github.com/a/mobs", "name": "mobs"}, "git")
+        count, revision = export.export_results(self._path("delta.jsonl"), columns=["name", "description"],
+                                                since_revision=export.read_watermark(watermark))
+        self.assertEqual((count, revision), (2, 5))
+        with open(self._path("delta.jsonl")) as f:
+            self.assertEqual([json.loads(line)["name"] for line in f], ["technic", "mobs"])
+
+        count, revision = export.export_results(self._path("empty.jsonl"), since_revision=revision)
+        self.assertEqual((count, revision), (0, 5))
+
+    def test_batches_and_unknown_columns(self):
+        self.assertEqual([row for row in iter_results(["name"], batch_size=1)],
+                         [("mesecons",), ("technic",), ("pipeworks",)])
+        with self.assertRaises(ValueError):
+            export.parse_columns("name,nonexistent")
+        with self.assertRaises(ValueError):
+            list(iter_results(["name; DROP TABLE results"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
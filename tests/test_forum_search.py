@@ -5,13 +5,15 @@ import unittest
 from unittest.mock import patch, MagicMock
 import tempfile
 import os
+import json
 import sqlite3
 
 # Import our modules
 from forum.search import (fetch_forum_thread_list, process_forum_thread, 
                          process_forum_work_queue)
-from db_utils import (init_db, add_forum_thread_to_queue, get_unprocessed_forum_threads,
-                      mark_forum_thread_processed, FORUM_QUEUE_DB)
+import db_utils
+from db_utils import (init_all_databases, add_forum_thread_to_queue, get_unprocessed_forum_threads,
+                      mark_forum_thread_processed)
 
 class TestForumSearch(unittest.TestCase):
     
@@ -19,10 +21,10 @@ class TestForumSearch(unittest.TestCase):
         """Set up test databases in temporary files"""
         # Create temporary database files
         self.temp_dir = tempfile.mkdtemp()
-        self.original_forum_db = FORUM_QUEUE_DB
+        self.original_paths = {name: getattr(db_utils, name) for name in
+                               ("DB_PATH", "FORUM_QUEUE_DB", "GIT_QUEUE_DB", "GIT_HOSTS_DB", "NON_MOD_REPOS_DB")}
         
         # Override database paths for testing
-        import db_utils
         db_utils.DB_PATH = os.path.join(self.temp_dir, "test_mod_list.db")
         db_utils.FORUM_QUEUE_DB = os.path.join(self.temp_dir, "test_forum_queue.db")
         db_utils.GIT_QUEUE_DB = os.path.join(self.temp_dir, "test_git_queue.db")
@@ -30,7 +32,8 @@ class TestForumSearch(unittest.TestCase):
         db_utils.NON_MOD_REPOS_DB = os.path.join(self.temp_dir, "test_non_mod_repos.db")
         
         # Initialize test databases
-        init_db()
+        init_all_databases()
+        db_utils.clear_non_mod_repo_cache()
     
     def tearDown(self):
         """Clean up test databases"""
@@ -38,10 +41,11 @@ class TestForumSearch(unittest.TestCase):
         shutil.rmtree(self.temp_dir)
         
         # Restore original database paths
-        import db_utils
-        db_utils.FORUM_QUEUE_DB = self.original_forum_db
+        for name, path in self.original_paths.items():
+            setattr(db_utils, name, path)
+        db_utils.clear_non_mod_repo_cache()
     
-    @patch('forum_search.requests.get')
+    @patch('forum.search.requests.get')
     def test_fetch_forum_thread_list(self, mock_get):
         """Test fetching and parsing forum thread list"""
         # Mock HTML response with forum threads
@@ -86,10 +90,29 @@ class TestForumSearch(unittest.TestCase):
         self.assertIn("game", thread_types)
         self.assertIn("modpack", thread_types)
     
-    @patch('forum_search.check_luanti_mod_repository')
-    @patch('forum_search.is_git_repository_url')
-    @patch('forum_search.requests.get')
-    def test_process_forum_thread(self, mock_get, mock_is_git, mock_check_mod):
+    @patch('forum.search.requests.get')
+    def test_refresh_queues_all_mod_release_tags(self, mock_get):
+        """The forum refresh queues every spelling of the mod release tags"""
+        from work_queue_manager import refresh_forum_threads
+        mock_response = MagicMock()
+        mock_response.text = '''
+            <a class="topictitle" href="./viewtopic.php?t=1">[Mod] [WIP] Test Mod</a>
+            <a class="topictitle" href="./viewtopic.php?t=2">[Mod Pack] Test Modpack</a>
+            <a class="topictitle" href="./viewtopic.php?t=3">[Modpack] Other Modpack</a>
+            <a class="topictitle" href="./viewtopic.php?t=4">Regular Thread</a>
+        '''
+        mock_get.return_value = mock_response
+
+        refresh_forum_threads()
+
+        threads = get_unprocessed_forum_threads(10)
+        self.assertEqual(sorted((title, thread_type) for _, _, title, thread_type in threads),
+                         [("[Mod Pack] Test Modpack", "modpack"), ("[Mod] [WIP] Test Mod", "mod"),
+                          ("[Modpack] Other Modpack", "modpack")])
+
+    @patch('forum.search.GitWeb.is_git_server')
+    @patch('forum.search.requests.get')
+    def test_process_forum_thread(self, mock_get, mock_is_git):
         """Test processing a single forum thread"""
         # Add a thread to the queue
         thread_url = "https://forum.luanti.org/viewtopic.php?t=123"
@@ -116,23 +139,9 @@ class TestForumSearch(unittest.TestCase):
         
         # Mock git repository detection
         def mock_git_check(url):
-            if 'github.com' in url or 'gitlab.com' in url:
-                return True, 'github' if 'github.com' in url else 'gitlab'
-            return False, None
+            return 'github.com' in url or 'gitlab.com' in url
         mock_is_git.side_effect = mock_git_check
         
-        # Mock mod check - return True for GitHub repo
-        def mock_mod_check(url):
-            if 'github.com' in url:
-                return True, {
-                    'name': 'testmod',
-                    'description': 'A test mod',
-                    'author': 'testuser',
-                    'type': 'mod'
-                }
-            return False, None
-        mock_check_mod.side_effect = mock_mod_check
-        
         # Get thread from queue
         threads = get_unprocessed_forum_threads(1)
         self.assertEqual(len(threads), 1)
@@ -144,12 +153,57 @@ class TestForumSearch(unittest.TestCase):
         # Verify results
         self.assertEqual(result["status"], "success")
         self.assertEqual(result["git_repos_found"], 2)  # GitHub and GitLab
-        self.assertEqual(result["luanti_mods_found"], 1)  # Only GitHub is a mod
+        
+        # Repos are validated by the git work queue, which gets the thread's details
+        queued = db_utils.get_due_git_queue_items(10)
+        self.assertEqual(sorted(url for _, url, _, _ in queued),
+                         ["https://github.com/user/testmod", "https://gitlab.com/user/testmod"])
+        self.assertEqual(json.loads(queued[0][3]),
+                         {"forum_url": thread_url, "title": "Test Mod Thread", "thread_type": "mod"})
+        self.assertEqual(db_utils.get_mod_count(), 0)
         
         # Verify thread was marked as processed
         remaining_threads = get_unprocessed_forum_threads(10)
         self.assertEqual(len(remaining_threads), 0)
-    
+
+    def test_unreachable_forge_is_not_cached(self):
+        """A link whose host answers with a server error is retried, not cached as not_git"""
+        import requests
+        thread_url = "https://forum.luanti.org/viewtopic.php?t=124"
+        link = "https://git.example.org/user/testmod"
+        add_forum_thread_to_queue(thread_url, "Test Mod Thread", "mod")
+        manifest_status = {"code": 503}
+
+        def response(status, text=""):
+            resp = requests.Response()
+            resp.status_code = status
+            resp._content = text.encode()
+            return resp
+
+        def fake_get(url, **kwargs):
+            if url == thread_url:
+                return response(200, f'<div class="post"><div class="content"><a href="{link}">x</a></div></div>')
+            if url.endswith("/-/manifest.json"):
+                return response(manifest_status["code"])
+            return response(200, "<html>A plain website</html>")
+
+        with patch("requests.get", side_effect=fake_get):
+            thread_id = get_unprocessed_forum_threads(1)[0][0]
+            result = process_forum_thread(thread_id, thread_url, "Test Mod Thread", "mod")
+            self.assertEqual(result["status"], "error")
+            self.assertFalse(db_utils.is_known_non_mod_repo(link))
+            conn = sqlite3.connect(db_utils.FORUM_QUEUE_DB)
+            state, attempts = conn.execute("SELECT processed, attempts FROM forum_threads WHERE id=?",
+                                           (thread_id,)).fetchone()
+            conn.close()
+            self.assertEqual((state, attempts), (db_utils.QUEUE_PENDING, 1))
+
+            # A missing manifest and a website without forge markers is a definite answer
+            manifest_status["code"] = 404
+            result = process_forum_thread(thread_id, thread_url, "Test Mod Thread", "mod")
+            self.assertEqual(result["status"], "success")
+            self.assertTrue(db_utils.is_known_non_mod_repo(link))
+
     def test_work_queue_management(self):
         """Test work queue operations"""
         # Test adding threads to queue
@@ -182,7 +236,7 @@ class TestForumSearch(unittest.TestCase):
         final_threads = get_unprocessed_forum_threads(10)
         self.assertEqual(len(final_threads), 0)
     
-    @patch('forum_search.process_forum_thread')
+    @patch('forum.search.process_forum_thread')
     def test_process_forum_work_queue(self, mock_process):
         """Test batch processing of forum work queue"""
         # Add multiple threads to queue
@@ -202,8 +256,7 @@ class TestForumSearch(unittest.TestCase):
             mark_forum_thread_processed(thread_id)
             return {
                 "status": "success",
-                "git_repos_found": 1,
-                "luanti_mods_found": 1
+                "git_repos_found": 1
             }
         
         mock_process.side_effect = mock_process_thread
@@ -0,0 +1,97 @@
+"""
+Unit tests for priority-aware git work queue dequeue
+"""
+import unittest
+import tempfile
+import shutil
+import sqlite3
+import os
+import json
+
+import db_utils
+from db_utils import (init_all_databases, add_to_git_queue, get_due_git_queue_items,
+                      mark_git_queue_item_processed, age_git_queue_priorities, bump_git_queue_priorities,
+                      PRIORITY_SEARCH, PRIORITY_FORUM, PRIORITY_CONTENTDB)
+
+
+class TestGitQueuePriority(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test databases in a temporary directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_paths = (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+                               db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB)
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "test_mod_list.db")
+        db_utils.FORUM_QUEUE_DB = os.path.join(self.temp_dir, "test_forum_queue.db")
+        db_utils.GIT_QUEUE_DB = os.path.join(self.temp_dir, "test_git_queue.db")
+        db_utils.GIT_HOSTS_DB = os.path.join(self.temp_dir, "test_git_hosts.db")
+        db_utils.NON_MOD_REPOS_DB = os.path.join(self.temp_dir, "test_non_mod_repos.db")
+        init_all_databases()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+         db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB) = self.original_paths
+
+    def _priorities(self):
+        conn = sqlite3.connect(db_utils.GIT_QUEUE_DB)
+        rows = dict(conn.execute("SELECT url, priority FROM git_work_queue").fetchall())
+        conn.close()
+        return rows
+
+    def test_dequeue_by_source_priority(self):
+        add_to_git_queue("https://github.com/a/search-hit", "search")
+        add_to_git_queue("https://github.com/a/forum-link", "forum:https://forum.luanti.org/viewtopic.php?t=1")
+        add_to_git_queue("https://github.com/a/contentdb-link", "contentdb")
+
+        urls = [item[1] for item in get_due_git_queue_items(10)]
+
+        self.assertEqual(urls, ["https://github.com/a/contentdb-link",
+                                "https://github.com/a/forum-link",
+                                "https://github.com/a/search-hit"])
+
+    def test_requeue_from_better_source_raises_priority(self):
+        add_to_git_queue("https://github.com/a/b", "search")
+        self.assertFalse(add_to_git_queue("https://github.com/a/b", "contentdb"))
+        self.assertEqual(self._priorities()["https://github.com/a/b"], PRIORITY_CONTENTDB)
+
+    def test_requeue_adds_metadata(self):
+        add_to_git_queue("https://github.com/a/b", "contentdb", metadata={"contentdb_url": "cdb"})
+        mark_git_queue_item_processed(get_due_git_queue_items(10)[0][0])
+        # A forum link to a validated repo queues it again with both links
+        add_to_git_queue("https://github.com/A/b.git", "forum:t1", metadata={"forum_url": "t1"})
+        add_to_git_queue("https://github.com/a/b", "forum:t2", metadata={"forum_url": "t2"})
+        items = get_due_git_queue_items(10)
+        self.assertEqual(len(items), 1)
+        self.assertEqual(json.loads(items[0][3]), {"contentdb_url": "cdb", "forum_url": "t1"})
+
+    def test_aging(self):
+        add_to_git_queue("https://github.com/a/old", "search")
+        add_to_git_queue("https://github.com/a/new", "search")
+        conn = sqlite3.connect(db_utils.GIT_QUEUE_DB)
+        conn.execute("UPDATE git_work_queue SET added_date='2000-01-01 00:00:00' WHERE url LIKE '%old'")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(age_git_queue_priorities(), 1)
+        # Aged items wait another interval before the next bump
+        self.assertEqual(age_git_queue_priorities(), 0)
+        priorities = self._priorities()
+        self.assertEqual(priorities["https://github.com/a/old"], PRIORITY_SEARCH + 1)
+        self.assertEqual(priorities["https://github.com/a/new"], PRIORITY_SEARCH)
+
+    def test_bulk_bump_by_source(self):
+        add_to_git_queue("https://github.com/a/one", "forum:https://forum.luanti.org/viewtopic.php?t=1")
+        add_to_git_queue("https://github.com/a/two", "search")
+
+        self.assertEqual(bump_git_queue_priorities(5, source_prefix="forum"), 1)
+        priorities = self._priorities()
+        self.assertEqual(priorities["https://github.com/a/one"], PRIORITY_FORUM + 5)
+        self.assertEqual(priorities["https://github.com/a/two"], PRIORITY_SEARCH)
+
+        self.assertEqual(bump_git_queue_priorities(-1, urls=["https://github.com/a/two"]), 1)
+        self.assertEqual(self._priorities()["https://github.com/a/two"], PRIORITY_SEARCH - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Unit tests for record linkage of results from ContentDB, the forum and the git search
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import db_utils
+from db_utils import add_mod_to_db, get_entity, get_entity_count, save_result
+from linkage import blocking_keys, link, normalize_name, score
+
+CDB = "https://content.minetest.net/packages"
+FORUM = "https://forum.luanti.org/viewtopic.php?t="
+
+
+class TestLinkage(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_db_path = db_utils.DB_PATH
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "mod_list.db")
+        db_utils.init_db()
+
+    def tearDown(self):
+        db_utils.DB_PATH = self.original_db_path
+        shutil.rmtree(self.temp_dir)
+
+    def _id(self, **conditions):
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        column, value = next(iter(conditions.items()))
+        row = conn.execute(f"SELECT id FROM results WHERE {column} = ?", (value,)).fetchone()
+        conn.close()
+        return row[0]
+
+    def test_names_and_keys(self):
+        self.assertEqual(normalize_name("[Mod] Minetest-Mesecons [mesecons]"), "mesecons")
+        self.assertEqual(normalize_name("technic_mod"), "technic")
+        self.assertEqual(normalize_name("mod"), "mod")
+        row = {"name": "mesecons", "title": "Mesecons", "author": "Jeija", "source": "contentdb",
+               "repo_url": f"{CDB}/Jeija/mesecons/", "forum_url": f"{FORUM}628&start=10"}
+        self.assertEqual(blocking_keys(row), {"contentdb_url:jeija/mesecons", "forum_url:t628",
+                                              "name:mesecons", "author:jeija:mese"})
+        same_name = score({"name": "mobs", "author": "TenPlus1"}, {"name": "Mobs", "author": ""})
+        self.assertLess(same_name[0], 0.85)
+        self.assertLess(score({"name": "mobs", "author": "a"}, {"name": "mobs", "author": "b"})[0], 0.85)
+        self.assertLess(score({"name": "mobs", "author": "a"}, {"name": "mobs_redo", "author": "a"})[0], 0.85)
+
+    def test_link_across_sources(self):
+        add_mod_to_db("mesecons", "mod", "Jeija", "Circuits", "contentdb", f"{CDB}/Jeija/mesecons")
+        save_result({"repo_url": "https://github.com/minetest-mods/mesecons", "name": "mesecons", "type": "mod",
+                     "contentdb_url": f"{CDB}/Jeija/mesecons", "author": ""}, "git")
+        save_result({"forum_url": f"{FORUM}628", "repo_url": "https://github.com/Minetest-Mods/mesecons.git",
+                     "name": "mesecons", "title": "[Mod] Mesecons [mesecons]"}, "forum")
+        save_result({"forum_url": f"{FORUM}9196", "name": "mobs", "author": "TenPlus1"}, "forum")
+        add_mod_to_db("mobs", "mod", "PilzAdam", "Mobs", "contentdb", f"{CDB}/PilzAdam/mobs")
+
+        stats = link()
+        self.assertEqual((stats["results"], stats["new_entities"]), (4, 3))
+        self.assertEqual(get_entity_count(), 3)
+        entity = get_entity(self._id(name="mesecons"))
+        self.assertEqual((entity["name"], entity["author"], entity["contentdb_url"], entity["size"]),
+                         ("mesecons", "Jeija", f"{CDB}/Jeija/mesecons", 2))
+        self.assertEqual(entity["canonical_url"], "https://github.com/minetest-mods/mesecons")
+        self.assertEqual(sorted(entity["sources"].split(",")), ["contentdb", "git"])
+        self.assertEqual({member["rule"] for member in entity["members"]}, {"contentdb_url"})
+        self.assertNotEqual(get_entity(self._id(author="TenPlus1"))["id"], get_entity(self._id(author="PilzAdam"))["id"])
+
+        # Nothing new: nothing to do
+        self.assertEqual(link()["results"], 0)
+
+    def test_incremental_merge_and_delete(self):
+        add_mod_to_db("pipeworks", "mod", "VanessaE", "Tubes", "contentdb", f"{CDB}/VanessaE/pipeworks")
+        save_result({"forum_url": f"{FORUM}2155", "name": "Pipe works"}, "forum")
+        self.assertEqual(link()["new_entities"], 2)
+
+        # A repository linked from both bridges the two entities
+        save_result({"repo_url": "https://gitlab.com/VanessaE/pipeworks", "name": "pipeworks",
+                     "contentdb_url": f"{CDB}/VanessaE/pipeworks", "forum_url": f"{FORUM}2155"}, "git")
+        stats = link()
+        self.assertEqual((stats["results"], stats["new_entities"], stats["merged"]), (1, 0, 1))
+        entity = get_entity(self._id(source="git"))
+        self.assertEqual(entity["size"], 3)
+        git_member = [member for member in entity["members"] if member["source"] == "git"][0]
+        self.assertEqual((git_member["score"], git_member["rule"]), (1.0, "contentdb_url"))
+
+        # Relinking everything gives the same entities
+        self.assertEqual(link(full=True)["new_entities"], 1)
+
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        conn.execute("DELETE FROM results")
+        conn.commit()
+        conn.close()
+        save_result({"repo_url": "https://codeberg.org/a/other", "name": "other"}, "git")
+        link()
+        self.assertEqual(get_entity_count(), 1)
+
+    def test_conflicting_packages_and_authors_are_not_merged(self):
+        add_mod_to_db("mobs", "mod", "TenPlus1", "Mobs Redo", "contentdb", f"{CDB}/TenPlus1/mobs")
+        add_mod_to_db("mobs", "mod", "PilzAdam", "Mobs", "contentdb", f"{CDB}/PilzAdam/mobs")
+        save_result({"forum_url": f"{FORUM}9196", "name": "mobs", "type": "mod"}, "forum")
+        # Links to both packages would bridge them
+        save_result({"repo_url": "https://codeberg.org/tenplus1/mobs", "name": "mobs",
+                     "contentdb_url": f"{CDB}/TenPlus1/mobs", "forum_url": f"{FORUM}9196"}, "git")
+        save_result({"repo_url": "https://github.com/pilzadam/mobs", "name": "mobs", "author": "PilzAdam",
+                     "forum_url": f"{FORUM}9196"}, "git")
+
+        stats = link()
+        self.assertGreater(stats["conflicts"], 0)
+        tenplus1, pilzadam = get_entity(self._id(author="TenPlus1")), get_entity(self._id(author="PilzAdam"))
+        self.assertNotEqual(tenplus1["id"], pilzadam["id"])
+        self.assertEqual(get_entity(self._id(repo_url=f"{CDB}/TenPlus1/mobs"))["id"], tenplus1["id"])
+        self.assertEqual(link(full=True)["new_entities"], get_entity_count())
+        self.assertNotEqual(get_entity(self._id(author="TenPlus1"))["id"], get_entity(self._id(author="PilzAdam"))["id"])
+
+    def test_oversized_blocks_are_skipped(self):
+        for author in ("a", "b", "c"):
+            save_result({"repo_url": f"https://github.com/{author}/api", "name": "api"}, "git")
+        stats = link(max_block_size=2)
+        self.assertEqual((stats["pairs"], stats["skipped_blocks"], stats["new_entities"]), (0, 1, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
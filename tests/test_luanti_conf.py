@@ -0,0 +1,125 @@
+"""
+Unit, property and fuzz tests for the Luanti conf parser
+"""
+import random
+import unittest
+
+from benchmarks import conf_parse
+from luanti_conf import ConfMetadata, iter_settings, parse_conf
+from mod_type_detector import parse_game_conf, parse_mod_conf, parse_modpack_conf
+
+MOD_CONF = '''# Mesecons
+name = mesecons
+title = Mesecons
+description = """
+Digital circuitry.
+
+# Not a comment: part of the description
+= not a setting either
+"""
+depends = default, , basic_materials
+optional_depends = doors,screwdriver
+author = "Jeija \\"the\\" author"
+min_minetest_version = 5.0
+settings = {
+    name = ignored
+    nested = {
+        depends = ignored
+    }
+}
+max_luanti_version = '5.9'
+'''
+
+CHARACTERS = "abcxyz  \t#=\"'\\,{}äß-"
+
+
+def random_text(rng, length):
+    return "".join(rng.choice(CHARACTERS) for _ in range(length))
+
+
+def format_value(value):
+    """Write a value so that the parser reads it back unchanged"""
+    if "\n" in value:
+        return f'"""\n{value}\n"""'
+    if (value != value.strip() or value in ("{", '"""') or "\\" in value
+            or value[:1] in "\"'" or value[-1:] in "\"'"):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\t", "\\t")
+        return f'"{escaped}"'
+    return value
+
+
+class TestLuantiConf(unittest.TestCase):
+
+    def test_full_syntax(self):
+        metadata = parse_conf(MOD_CONF, "mod")
+        self.assertIsInstance(metadata, ConfMetadata)
+        self.assertEqual(metadata.name, "mesecons")
+        self.assertEqual(metadata.description,
+                         "Digital circuitry.\n\n# Not a comment: part of the description\n= not a setting either")
+        self.assertEqual(metadata.depends, ["default", "basic_materials"])
+        self.assertEqual(metadata.optional_depends, ["doors", "screwdriver"])
+        self.assertEqual(metadata.author, 'Jeija "the" author')
+        self.assertEqual((metadata.min_version, metadata.max_version), ("5.0", "5.9"))
+        with self.assertRaises(AttributeError):
+            metadata.unknown = 1
+
+    def test_file_kinds(self):
+        content = "\ufefftitle = Tech\r\ndepends = default\r\ndescription = Machines\\n\r\n"
+        self.assertEqual(parse_mod_conf(content), {"type": "mod", "name": "Tech", "title": "Tech",
+                                                   "description": "Machines\\n", "depends": ["default"]})
+        self.assertEqual(parse_modpack_conf(content), {"type": "modpack", "name": "Tech", "title": "Tech",
+                                                       "description": "Machines\\n"})
+        self.assertEqual(parse_game_conf("name = mtg\ndescription = \"Minetest\\tGame\"")["description"],
+                         "Minetest\tGame")
+        self.assertEqual(parse_game_conf(""), {"type": "game", "name": "", "title": "", "description": ""})
+
+    def test_unterminated_multiline_value(self):
+        self.assertEqual(list(iter_settings('a = 1\ndescription = """\nline\nname = x')),
+                         [("a", "1"), ("description", "line\nname = x")])
+
+    def test_round_trip_property(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            settings = {}
+            lines = []
+            for _ in range(rng.randint(0, 8)):
+                key = "".join(rng.choice("abcdefgh_") for _ in range(rng.randint(1, 8)))
+                if rng.random() < 0.2:
+                    value = "\n".join(random_text(rng, rng.randint(0, 10)) for _ in range(rng.randint(2, 4)))
+                    if any(line.strip() == '"""' for line in value.split("\n")):
+                        continue
+                else:
+                    value = random_text(rng, rng.randint(0, 12)).replace("\n", "")
+                settings.pop(key, None)
+                settings[key] = value
+                lines.append(f"{key} = {format_value(value)}")
+                if rng.random() < 0.2:
+                    lines.append(f"# {random_text(rng, 10)}")
+                if rng.random() < 0.1:
+                    lines += [f"{key}_group = {{", f"{key} = hidden", "}"]
+            text = ("\r\n" if rng.random() < 0.3 else "\n").join(lines)
+            parsed = dict(iter_settings(text))
+            self.assertEqual(parsed, settings, text)
+
+    def test_fuzz(self):
+        rng = random.Random(2)
+        pieces = ["name", "title", "depends", "description", " = ", '"""', "{", "}", "#", "\n", "\r\n",
+                  "\\", '"', "'", ",", "x", " "]
+        for _ in range(2000):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+            for kind in ("mod", "modpack", "game"):
+                metadata = parse_conf(text, kind)
+                self.assertIsInstance(metadata.name, str)
+                self.assertIsInstance(metadata.title, str)
+                self.assertTrue(all(isinstance(dep, str) and dep for dep in metadata.depends or []))
+
+    def test_benchmark(self):
+        corpus = conf_parse.synthetic_corpus(200)
+        for kind, content in corpus:
+            self.assertTrue(parse_conf(content, kind).name)
+        report = conf_parse.run(corpus, repeat=2)
+        self.assertEqual(report["items"], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
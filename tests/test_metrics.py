@@ -0,0 +1,84 @@
+"""
+Unit tests for crawler metrics and the shared HTTP layer
+"""
+import unittest
+import threading
+import json
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+import metrics
+import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"not found" if self.path == "/missing" else b"hello"
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        http_client.remove_middleware(metrics.http_middleware)
+        metrics.reset()
+
+    def _values(self, name):
+        return {tuple(sorted(c["labels"].items())): c["value"]
+                for c in metrics.snapshot()["counters"] if c["name"] == name}
+
+    def test_stage_items_and_throughput(self):
+        for status in ("success", "success", "error"):
+            with metrics.stage_item("git_repo") as outcome:
+                outcome["status"] = status
+
+        counts = self._values("stage_items_total")
+        self.assertEqual(counts[(("stage", "git_repo"), ("status", "success"))], 2)
+        self.assertEqual(counts[(("stage", "git_repo"), ("status", "error"))], 1)
+        self.assertEqual(metrics.snapshot()["stages"]["git_repo"]["items"], 3)
+
+    def test_prometheus_format(self):
+        metrics.inc("cache_requests_total", cache="non_mod_repos", result="hit")
+        metrics.set_gauge("queue_depth", 7, queue="git", state="pending")
+        metrics.observe("stage_duration_seconds", 0.2, stage="forum_thread")
+
+        text = metrics.to_prometheus()
+
+        self.assertIn('luanti_cache_requests_total{cache="non_mod_repos",result="hit"} 1', text)
+        self.assertIn('luanti_queue_depth{queue="git",state="pending"} 7', text)
+        self.assertIn('luanti_stage_duration_seconds_bucket{stage="forum_thread",le="0.1"} 0', text)
+        self.assertIn('luanti_stage_duration_seconds_bucket{stage="forum_thread",le="0.25"} 1', text)
+        self.assertIn('luanti_stage_duration_seconds_count{stage="forum_thread"} 1', text)
+        json.dumps(metrics.snapshot())
+
+    def test_http_requests_per_host(self):
+        server = HTTPServer(("127.0.0.1", 0), _Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            metrics.install()
+            base_url = f"http://127.0.0.1:{server.server_port}"
+            requests.get(f"{base_url}/ok")
+            requests.get(f"{base_url}/missing")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        requests_total = self._values("http_requests_total")
+        self.assertEqual(requests_total[(("host", "127.0.0.1"), ("method", "GET"), ("status", "200"))], 1)
+        self.assertEqual(requests_total[(("host", "127.0.0.1"), ("method", "GET"), ("status", "404"))], 1)
+        self.assertEqual(self._values("http_response_bytes_total")[(("host", "127.0.0.1"),)], 14)
+
+
+if __name__ == '__main__':
+    unittest.main()
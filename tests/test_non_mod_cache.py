@@ -0,0 +1,122 @@
+"""
+Unit tests for the non-mod repository negative cache
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+import tempfile
+import shutil
+import sqlite3
+import os
+
+import requests
+
+import db_utils
+from db_utils import (init_all_databases, add_non_mod_repo, is_known_non_mod_repo,
+                      load_non_mod_repo_cache, clear_non_mod_repo_cache, purge_expired_non_mod_repos,
+                      add_to_git_queue, get_due_git_queue_items, NON_MOD_NO_CONF, NON_MOD_NOT_GIT,
+                      NON_MOD_NOT_FOUND)
+from git.search import process_git_work_queue
+
+REPO_URL = "https://github.com/user/not-a-mod"
+
+
+class TestNonModCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test databases in a temporary directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_paths = (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+                               db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB)
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "test_mod_list.db")
+        db_utils.FORUM_QUEUE_DB = os.path.join(self.temp_dir, "test_forum_queue.db")
+        db_utils.GIT_QUEUE_DB = os.path.join(self.temp_dir, "test_git_queue.db")
+        db_utils.GIT_HOSTS_DB = os.path.join(self.temp_dir, "test_git_hosts.db")
+        db_utils.NON_MOD_REPOS_DB = os.path.join(self.temp_dir, "test_non_mod_repos.db")
+        init_all_databases()
+
+    def tearDown(self):
+        clear_non_mod_repo_cache()
+        shutil.rmtree(self.temp_dir)
+        (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+         db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB) = self.original_paths
+
+    def _expire_all(self):
+        conn = sqlite3.connect(db_utils.NON_MOD_REPOS_DB)
+        conn.execute("UPDATE non_mod_repos SET expires_at='2000-01-01 00:00:00'")
+        conn.commit()
+        conn.close()
+
+    def test_reason_dependent_ttl(self):
+        add_non_mod_repo(REPO_URL, NON_MOD_NO_CONF)
+        add_non_mod_repo("https://example.com/page", NON_MOD_NOT_GIT)
+        conn = sqlite3.connect(db_utils.NON_MOD_REPOS_DB)
+        expiry = dict(conn.execute("SELECT reason, expires_at FROM non_mod_repos").fetchall())
+        conn.close()
+        self.assertLess(expiry[NON_MOD_NO_CONF], expiry[NON_MOD_NOT_GIT])
+
+    def test_entries_expire_and_refresh(self):
+        self.assertTrue(add_non_mod_repo(REPO_URL, NON_MOD_NO_CONF))
+        self.assertFalse(add_non_mod_repo(REPO_URL, NON_MOD_NO_CONF))
+        self.assertTrue(is_known_non_mod_repo(REPO_URL))
+
+        self._expire_all()
+        self.assertFalse(is_known_non_mod_repo(REPO_URL))
+        # An expired entry is refreshed when the repo is found to be a non-mod again
+        self.assertTrue(add_non_mod_repo(REPO_URL, NON_MOD_NO_CONF))
+        self.assertTrue(is_known_non_mod_repo(REPO_URL))
+
+    def test_not_git_links_keep_their_exact_url(self):
+        add_non_mod_repo("https://github.com/a/b/tree/master", NON_MOD_NOT_GIT)
+        add_non_mod_repo("https://forum.luanti.org/viewtopic.php?t=1", NON_MOD_NOT_GIT)
+        for cached in (False, True):
+            if cached:
+                load_non_mod_repo_cache()
+            self.assertFalse(is_known_non_mod_repo("https://github.com/a/b"))
+            self.assertTrue(is_known_non_mod_repo("https://github.com/a/b/tree/master"))
+            self.assertTrue(is_known_non_mod_repo("https://forum.luanti.org/viewtopic.php?t=1"))
+            self.assertFalse(is_known_non_mod_repo("https://forum.luanti.org/viewtopic.php?t=2"))
+
+    def test_in_memory_cache(self):
+        add_non_mod_repo(REPO_URL, NON_MOD_NO_CONF)
+        self.assertEqual(load_non_mod_repo_cache(), 1)
+        os.remove(db_utils.NON_MOD_REPOS_DB)
+
+        # Lookups are answered from memory
+        self.assertTrue(is_known_non_mod_repo(REPO_URL))
+        self.assertFalse(is_known_non_mod_repo("https://github.com/user/other"))
+
+    def test_purge_expired(self):
+        add_non_mod_repo(REPO_URL, NON_MOD_NO_CONF)
+        self._expire_all()
+        self.assertEqual(purge_expired_non_mod_repos(), 1)
+
+    @patch('git.search.check_luanti_mod_repository')
+    def test_git_queue_skips_known_non_mod_repo(self, mock_check):
+        add_non_mod_repo(REPO_URL, NON_MOD_NO_CONF)
+        load_non_mod_repo_cache()
+        add_to_git_queue(REPO_URL, "search")
+
+        results = process_git_work_queue(10)
+
+        mock_check.assert_not_called()
+        self.assertEqual(results[0]["status"], "skipped")
+        self.assertEqual(get_due_git_queue_items(10), [])
+
+    @patch('git.canonical.requests.head', side_effect=requests.exceptions.ConnectionError)
+    @patch('git.search.check_luanti_mod_repository')
+    def test_missing_repo_is_cached_as_not_found(self, mock_check, _mock_head):
+        error = requests.exceptions.HTTPError("404 Not Found")
+        error.response = MagicMock(status_code=404)
+        mock_check.side_effect = error
+        add_to_git_queue(REPO_URL, "search")
+
+        self.assertTrue(process_git_work_queue(10)[0]["dead_lettered"])
+        conn = sqlite3.connect(db_utils.NON_MOD_REPOS_DB)
+        reasons = [row[0] for row in conn.execute("SELECT reason FROM non_mod_repos")]
+        conn.close()
+        self.assertEqual(reasons, [NON_MOD_NOT_FOUND])
+        self.assertTrue(is_known_non_mod_repo(REPO_URL))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Unit tests for the shared --profile option
+"""
+import unittest
+import argparse
+import tempfile
+import shutil
+import time
+import os
+
+import profiling
+
+
+def busy_work():
+    total = 0
+    for i in range(20000):
+        total += i * i
+    time.sleep(0.05)
+    return [str(i) for i in range(1000)]
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.temp_dir, "run")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_cpu(self):
+        with profiling.profile("cpu", self.prefix):
+            busy_work()
+        self.assertIn("busy_work", self._read(f"{self.prefix}.cpu.txt"))
+        self.assertTrue(os.path.exists(f"{self.prefix}.cpu.prof"))
+
+    def test_wall(self):
+        with profiling.profile("wall", self.prefix):
+            busy_work()
+        self.assertIn("busy_work", self._read(f"{self.prefix}.wall.txt"))
+        self.assertIn("busy_work", self._read(f"{self.prefix}.wall.folded"))
+
+    def test_mem(self):
+        with profiling.profile("mem", self.prefix):
+            data = busy_work()
+        self.assertEqual(len(data), 1000)
+        self.assertIn("Peak traced memory", self._read(f"{self.prefix}.mem.txt"))
+        self.assertTrue(os.path.exists(f"{self.prefix}.mem.snapshot"))
+
+    def test_disabled(self):
+        with profiling.profile(None, self.prefix):
+            busy_work()
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_argument_defaults_to_cpu(self):
+        parser = argparse.ArgumentParser()
+        profiling.add_profile_arguments(parser)
+        self.assertEqual(parser.parse_args(["--profile"]).profile, "cpu")
+        self.assertEqual(parser.parse_args(["--profile", "wall"]).profile, "wall")
+        self.assertIsNone(parser.parse_args([]).profile)
+
+
+if __name__ == '__main__':
+    unittest.main()
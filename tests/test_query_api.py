@@ -0,0 +1,109 @@
+"""
+Unit tests for the read-only HTTP query API
+"""
+import asyncio
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import db_utils
+from db_utils import save_result
+from query_api import QueryService
+
+
+class TestQueryAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_db_path = db_utils.DB_PATH
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "mod_list.db")
+        db_utils.init_db()
+        save_result({"repo_url": "https://github.com/a/mesecons", "name": "mesecons", "type": "modpack",
+                     "author": "Jeija", "license": "LGPL-3.0", "description": "Digital circuitry",
+                     "depends": ["default"]}, "forum")
+        save_result({"repo_url": "https://github.com/a/technic", "name": "technic", "type": "modpack",
+                     "author": "RealBadAngel", "description": "Machines powered by mesecons",
+                     "depends": ["default", "mesecons"]}, "git")
+        save_result({"repo_url": "https://github.com/a/pipeworks", "name": "pipeworks", "type": "mod",
+                     "author": "jeija", "long_description": "Tubes for technic machines"}, "contentdb")
+
+        self.service = QueryService(db_utils.DB_PATH, pool_size=2, cache_size=2)
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.service.handle, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.close()
+        asyncio.run_coroutine_threadsafe(self.server.wait_closed(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.service.close()
+        db_utils.DB_PATH = self.original_db_path
+        shutil.rmtree(self.temp_dir)
+
+    def get(self, target):
+        # One keep-alive connection for all requests of a test
+        self.conn.request("GET", target)
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def _names(self, target):
+        status, body = self.get(target)
+        self.assertEqual(status, 200)
+        return [item["name"] for item in body["items"]], body["next"]
+
+    def test_filters_and_pagination(self):
+        self.assertEqual(self._names("/mods?author=JEIJA"), (["mesecons", "pipeworks"], None))
+        self.assertEqual(self._names("/mods?depends_on=mesecons"), (["technic"], None))
+        self.assertEqual(self._names("/mods?type=modpack&source=git"), (["technic"], None))
+        self.assertEqual(self._names("/mods?limit=2"), (["mesecons", "technic"], 2))
+        self.assertEqual(self._names("/mods?limit=2&after=2"), (["pipeworks"], None))
+        status, mod = self.get("/mods/2")
+        self.assertEqual((status, mod["name"], mod["depends"]), (200, "technic", ["default", "mesecons"]))
+
+    def test_contents(self):
+        db_utils.save_contents("https://github.com/a/mesecons", [
+            {"path": "mesecons_wires", "name": "mesecons_wires", "type": "mod", "depends": ["mesecons"]}])
+        self.assertEqual(self._names("/mods?contains=mesecons_wires"), (["mesecons"], None))
+        status, body = self.get("/mods/1/contents")
+        self.assertEqual((status, body["items"][0]["depends"]), (200, ["mesecons"]))
+        self.assertEqual(self.get("/mods/99/contents")[0], 404)
+
+    def test_search(self):
+        self.assertEqual(self._names("/search?q=mesecons"), (["mesecons", "technic"], None))
+        self.assertEqual(self._names("/search?q=mesecons&limit=1"), (["mesecons"], 1))
+        self.assertEqual(self._names("/search?q=mesecons&limit=1&offset=1"), (["technic"], None))
+
+    def test_errors(self):
+        self.assertEqual(self.get("/mods/99")[0], 404)
+        self.assertEqual(self.get("/nothing")[0], 404)
+        self.assertEqual(self.get("/mods?limit=1000")[0], 400)
+        self.assertEqual(self.get("/search")[0], 400)
+
+    def test_cache_invalidated_by_commits(self):
+        self.assertEqual(self._names("/mods?type=mod"), (["pipeworks"], None))
+        self.assertEqual(self._names("/mods?type=mod"), (["pipeworks"], None))
+        self.assertEqual(self.service.hits, 1)
+
+        save_result({"repo_url": "https://github.com/a/mobs", "name": "mobs", "type": "mod"}, "git")
+        self.assertEqual(self._names("/mods?type=mod"), (["pipeworks", "mobs"], None))
+        self.assertEqual(self.service.hits, 1)
+
+    def test_read_only(self):
+        with self.service.pool.connection() as conn:
+            with self.assertRaises(Exception):
+                conn.execute("DELETE FROM results")
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+
+if __name__ == '__main__':
+    unittest.main()
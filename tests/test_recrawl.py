@@ -0,0 +1,117 @@
+"""
+Unit tests for the freshness-based recrawl scheduler
+"""
+import unittest
+from unittest.mock import patch
+import tempfile
+import shutil
+import sqlite3
+import os
+
+import db_utils
+import recrawl
+from db_utils import (init_all_databases, add_forum_thread_to_queue, get_unprocessed_forum_threads,
+                      add_to_git_queue, get_due_git_queue_items, mark_git_queue_item_processed,
+                      mark_forum_thread_processed, record_forum_thread_check, postpone_forum_thread_check,
+                      DEFAULT_CHECK_INTERVAL)
+
+
+class TestRecrawl(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test databases in a temporary directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_paths = (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+                               db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB)
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "test_mod_list.db")
+        db_utils.FORUM_QUEUE_DB = os.path.join(self.temp_dir, "test_forum_queue.db")
+        db_utils.GIT_QUEUE_DB = os.path.join(self.temp_dir, "test_git_queue.db")
+        db_utils.GIT_HOSTS_DB = os.path.join(self.temp_dir, "test_git_hosts.db")
+        db_utils.NON_MOD_REPOS_DB = os.path.join(self.temp_dir, "test_non_mod_repos.db")
+        init_all_databases()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+         db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB) = self.original_paths
+
+    def _add_processed_threads(self, count, fingerprint="abc"):
+        for i in range(count):
+            add_forum_thread_to_queue(f"https://forum.luanti.org/viewtopic.php?t={i}", f"[Mod] {i}", "mod")
+        for thread_id, *_ in get_unprocessed_forum_threads(count):
+            mark_forum_thread_processed(thread_id, fingerprint)
+        # Make every thread due for a recheck
+        self._execute("UPDATE forum_threads SET next_check_at='2000-01-01 00:00:00'")
+
+    def _execute(self, query):
+        conn = sqlite3.connect(db_utils.FORUM_QUEUE_DB)
+        rows = conn.execute(query).fetchall()
+        conn.commit()
+        conn.close()
+        return rows
+
+    def _run(self, fetch_fingerprint, budget=10):
+        kinds = {"forum": (fetch_fingerprint, record_forum_thread_check, postpone_forum_thread_check)}
+        with patch.dict(recrawl._KINDS, kinds):
+            return recrawl.run_recrawl(budget)
+
+    def test_processed_thread_is_not_due_immediately(self):
+        add_forum_thread_to_queue("https://forum.luanti.org/viewtopic.php?t=1", "[Mod] A", "mod")
+        mark_forum_thread_processed(get_unprocessed_forum_threads(1)[0][0], "abc")
+        self.assertEqual(recrawl.get_due_rechecks(), [])
+
+    def test_unchanged_thread_backs_off(self):
+        self._add_processed_threads(1)
+
+        stats = self._run(lambda url: "abc")
+
+        self.assertEqual(stats, {"checked": 1, "changed": 0, "errors": 0})
+        interval, processed = self._execute("SELECT check_interval, processed FROM forum_threads")[0]
+        self.assertEqual(interval, DEFAULT_CHECK_INTERVAL * 2)
+        self.assertEqual(processed, db_utils.QUEUE_DONE)
+
+    def test_changed_thread_is_requeued(self):
+        self._add_processed_threads(1)
+
+        stats = self._run(lambda url: "def")
+
+        self.assertEqual(stats["changed"], 1)
+        interval, change_count = self._execute("SELECT check_interval, change_count FROM forum_threads")[0]
+        self.assertEqual(interval, DEFAULT_CHECK_INTERVAL // 2)
+        self.assertEqual(change_count, 1)
+        self.assertEqual(len(get_unprocessed_forum_threads(10)), 1)
+
+    def test_budget_limits_revisits(self):
+        self._add_processed_threads(3)
+
+        stats = self._run(lambda url: "abc", budget=2)
+
+        self.assertEqual(stats["checked"], 2)
+        self.assertEqual(len(recrawl.get_due_rechecks()), 1)
+
+    def test_failed_recheck_is_postponed(self):
+        self._add_processed_threads(1)
+
+        def fail(url):
+            raise ConnectionError("offline")
+
+        stats = self._run(fail)
+
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(recrawl.get_due_rechecks(), [])
+
+    @patch('git.search.check_luanti_mod_repository', return_value=(True, {"name": "b"}))
+    def test_git_recheck_uses_queued_branch(self, mock_check):
+        add_to_git_queue("https://github.com/a/b", "forum:t1", metadata={"branch": "stable"})
+        mark_git_queue_item_processed(get_due_git_queue_items(1)[0][0], "abc")
+        conn = sqlite3.connect(db_utils.GIT_QUEUE_DB)
+        conn.execute("UPDATE git_work_queue SET next_check_at='2000-01-01 00:00:00'")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(recrawl.run_recrawl(10)["changed"], 1)
+        mock_check.assert_called_once_with("https://github.com/a/b", "stable", raise_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+Unit tests for the release-archive download backend of collection packs
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from benchmarks.standins import Dataset, StandIns
+from contentdb import release_download
+from contentdb.release_download import VerificationError, download_all, download_archive, forge_archive_url
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def make_tarball(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestReleaseDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+        self.server.files = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_tarball_streamed_and_top_level_stripped(self):
+        body = make_tarball({"technic-1.0/mod.conf": b"name = technic\n", "technic-1.0/init.lua": b"-- x\n",
+                             "../outside.txt": b"no"})
+        self.server.files["/technic/archive/v1.0.tar.gz"] = body
+        target = os.path.join(self.temp_dir, "technic")
+        entry = download_archive(f"{self.base}/technic/archive/v1.0.tar.gz", target)
+
+        self.assertEqual(sorted(os.listdir(target)), ["init.lua", "mod.conf"])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "outside.txt")))
+        self.assertEqual(entry["size"], len(body))
+        self.assertEqual(entry["sha256"], hashlib.sha256(body).hexdigest())
+
+    def test_verification_failure_leaves_nothing(self):
+        self.server.files["/a.zip"] = make_zip({"mod.conf": "name = a\n"})
+        target = os.path.join(self.temp_dir, "a")
+        with self.assertRaises(VerificationError):
+            download_archive(f"{self.base}/a.zip", target, expected_sha256="0" * 64)
+        with self.assertRaises(VerificationError):
+            download_archive(f"{self.base}/a.zip", target, expected_size=1)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_contentdb_releases_with_manifest(self):
+        zips = {name: make_zip({f"{name}/mod.conf": f"name = {name}\n"}) for name in ("mesecons", "mobs")}
+        for name, body in zips.items():
+            self.server.files[f"/api/packages/a/{name}/releases/"] = json.dumps(
+                [{"id": 2, "url": f"/uploads/{name}.zip", "size": len(body)}]).encode()
+            self.server.files[f"/uploads/{name}.zip"] = body
+        manifest = os.path.join(self.temp_dir, "pack", release_download.MANIFEST_NAME)
+        os.makedirs(os.path.dirname(manifest))
+        items = [(("contentdb", "a", name), os.path.join(self.temp_dir, "pack", name))
+                 for name in ("mesecons", "mobs", "missing")]
+
+        with patch.object(release_download, "CONTENTDB_API_BASE", f"{self.base}/api"):
+            failures = download_all(items, workers=3, manifest_path=manifest)
+            self.assertEqual([target for _, target, _ in failures], [items[2][1]])
+            with open(os.path.join(self.temp_dir, "pack", "mobs", "mod.conf")) as f:
+                self.assertEqual(f.read(), "name = mobs\n")
+            with open(manifest) as f:
+                recorded = json.load(f)
+            self.assertEqual(recorded["mesecons"]["sha256"], hashlib.sha256(zips["mesecons"]).hexdigest())
+
+            # Rebuilding verifies the archives against the manifest
+            shutil.rmtree(os.path.join(self.temp_dir, "pack", "mobs"))
+            recorded["mobs"]["sha256"] = "0" * 64
+            with open(manifest, "w") as f:
+                json.dump(recorded, f)
+            failures = download_all(items[:2], manifest_path=manifest)
+        self.assertEqual(len(failures), 1)
+        self.assertIn("SHA-256", failures[0][2])
+
+    def test_branch_tarballs_are_not_verified(self):
+        body = make_tarball({"b-main/mod.conf": b"name = b\n"})
+        self.server.files["/a/b/archive/main.tar.gz"] = body
+        url = f"{self.base}/a/b/archive/main.tar.gz"
+        manifest = os.path.join(self.temp_dir, release_download.MANIFEST_NAME)
+        with open(manifest, "w") as f:
+            json.dump({"b": {"url": url, "size": 1, "sha256": "0" * 64}}, f)
+        items = [(("git", "https://github.com/a/b"), os.path.join(self.temp_dir, "b"))]
+
+        # The branch moved since the manifest was written
+        with patch.object(release_download, "forge_archive", return_value=(url, False)):
+            self.assertEqual(download_all(items, manifest_path=manifest), [])
+        with open(manifest) as f:
+            self.assertEqual(json.load(f)["b"]["sha256"], hashlib.sha256(body).hexdigest())
+
+        # A release tag does not move: a different archive is an error
+        shutil.rmtree(items[0][1])
+        with open(manifest, "w") as f:
+            json.dump({"b": {"url": url, "size": 1, "sha256": "0" * 64}}, f)
+        with patch.object(release_download, "forge_archive", return_value=(url, True)):
+            self.assertIn("SHA-256", download_all(items, manifest_path=manifest)[0][2])
+
+    def test_forge_archive_urls(self):
+        dataset = Dataset(threads=3, packages=0)
+        with StandIns(dataset):
+            github, gitlab, gitea = (dataset.repos_on(host)[0] for host in ("github.com", "gitlab.com", "codeberg.org"))
+            # The stand-ins have no releases: the default branch is used
+            self.assertEqual(forge_archive_url(f"https://github.com/{github}"),
+                             f"https://github.com/{github}/archive/main.tar.gz")
+            name = gitlab.split("/")[1]
+            self.assertEqual(forge_archive_url(f"https://gitlab.com/{gitlab}", "v1.0"),
+                             f"https://gitlab.com/{gitlab}/-/archive/v1.0/{name}-v1.0.tar.gz")
+            self.assertEqual(forge_archive_url(f"https://codeberg.org/{gitea}", "v2"),
+                             f"https://codeberg.org/{gitea}/archive/v2.tar.gz")
+
+
+if __name__ == '__main__':
+    unittest.main()
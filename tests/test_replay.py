@@ -0,0 +1,99 @@
+"""
+Unit tests for recording and replaying HTTP traffic
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import requests
+
+import archive
+import db_utils
+import replay
+from benchmarks.standins import Dataset, StandIns, FORUM_URL
+from forum.search import fetch_forum_thread_list, process_forum_work_queue
+from git.search import process_git_work_queue, search_all_git_servers
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.recording = os.path.join(self.temp_dir, "recording")
+        self.original_paths = {name: getattr(db_utils, name) for name in
+                               ("DB_PATH", "FORUM_QUEUE_DB", "GIT_QUEUE_DB", "GIT_HOSTS_DB", "NON_MOD_REPOS_DB")}
+        self._use_databases("run1")
+
+    def tearDown(self):
+        replay.stop()
+        for name, path in self.original_paths.items():
+            setattr(db_utils, name, path)
+        db_utils.clear_non_mod_repo_cache()
+        shutil.rmtree(self.temp_dir)
+
+    def _use_databases(self, subdir):
+        os.makedirs(os.path.join(self.temp_dir, subdir))
+        for name, path in self.original_paths.items():
+            setattr(db_utils, name, os.path.join(self.temp_dir, subdir, path))
+        db_utils.init_all_databases()
+        db_utils.clear_non_mod_repo_cache()
+
+    def _crawl(self):
+        fetch_forum_thread_list(FORUM_URL)
+        while process_forum_work_queue(10):
+            pass
+        search_all_git_servers(["bench"])
+        while process_git_work_queue(10):
+            pass
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        results = conn.execute("SELECT repo_url, name, type, source FROM results ORDER BY repo_url").fetchall()
+        conn.close()
+        return results
+
+    def test_sequential_replay(self):
+        url = "https://example.com/status"
+        os.makedirs(self.recording)
+        archive.store(self.recording, "GET", url, 503, "Service Unavailable", {}, b"busy", elapsed=0.2)
+        archive.store(self.recording, "GET", url, 200, "OK", {}, b"ok", elapsed=0.0)
+
+        replay.start_replay(self.recording)
+        self.assertEqual([requests.get(url).status_code for _ in range(3)], [503, 200, 200])
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            requests.get("https://example.com/not-recorded")
+
+        replay.start_replay(self.recording, latency=True)
+        start = time.monotonic()
+        self.assertEqual(requests.get(url).status_code, 503)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_archive_and_replay_exclude_each_other(self):
+        parser = argparse.ArgumentParser()
+        replay.add_replay_arguments(parser)
+        self.assertEqual(parser.parse_args(["--record", "dir"]).archive, "dir")
+        for args in (["--archive", "a", "--replay", "b"], ["--record", "a", "--replay", "b"]):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                parser.parse_args(args)
+
+    def test_replay_crawl_without_network(self):
+        # Recording starts first so it sees the original URLs, not the routed ones
+        replay.configure(archive_dir=self.recording)
+        with StandIns(Dataset(threads=3, packages=0)) as standins:
+            recorded = self._crawl()
+            replay.stop()
+            self.assertGreater(standins.request_counts()["github"], 0)
+            self.assertGreater(standins.request_counts()["gitlab"], 0)
+
+        self._use_databases("run2")
+        replay.configure(replay_dir=self.recording)
+        self.assertEqual(self._crawl(), recorded)
+        self.assertTrue(recorded)
+
+
+if __name__ == '__main__':
+    unittest.main()
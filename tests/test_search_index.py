@@ -0,0 +1,83 @@
+"""
+Unit tests for the full-text search index over results
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import db_utils
+from db_utils import fts_query, save_result, search_results
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_db_path = db_utils.DB_PATH
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "mod_list.db")
+        db_utils.init_db()
+        save_result({"repo_url": "https://github.com/a/mesecons", "name": "mesecons", "type": "modpack",
+                     "title": "Mesecons", "license": "LGPL-3.0", "description": "Digital circuitry"}, "forum")
+        save_result({"repo_url": "https://github.com/a/technic", "name": "technic", "type": "modpack",
+                     "license": "LGPL-2.1", "description": "Machines powered by mesecons and circuits"}, "git")
+        save_result({"repo_url": "https://github.com/a/pipeworks", "name": "pipeworks", "type": "mod",
+                     "license": "LGPL-3.0", "long_description": "Tubes for technic machines"}, "contentdb")
+
+    def tearDown(self):
+        db_utils.DB_PATH = self.original_db_path
+        shutil.rmtree(self.temp_dir)
+
+    def _names(self, *args, **kwargs):
+        return [result["name"] for result in search_results(*args, **kwargs)]
+
+    def test_ranking_and_prefix(self):
+        # A name match outranks a description match
+        self.assertEqual(self._names("mesecons"), ["mesecons", "technic"])
+        self.assertEqual(self._names("circ"), ["mesecons", "technic"])
+        self.assertEqual(self._names("circ", prefix=False), [])
+        self.assertEqual(self._names("technic machines"), ["technic", "pipeworks"])
+
+    def test_filters(self):
+        self.assertEqual(self._names("machines", mod_type="mod"), ["pipeworks"])
+        self.assertEqual(self._names("mesecons", source="git"), ["technic"])
+        self.assertEqual(self._names("technic", license="lgpl-3.0"), ["pipeworks"])
+
+    def test_triggers_keep_index_in_sync(self):
+        save_result({"repo_url": "https://github.com/a/pipeworks", "description": "Item transport"},
+                    "contentdb", replace=True)
+        self.assertEqual(self._names("transport"), ["pipeworks"])
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        conn.execute("DELETE FROM results WHERE name='technic'")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self._names("machines"), ["pipeworks"])
+
+    def test_existing_rows_indexed(self):
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        conn.execute("DROP TABLE results_fts")
+        conn.commit()
+        conn.close()
+        db_utils.init_db()
+        self.assertEqual(self._names("pipeworks"), ["pipeworks"])
+
+    def test_without_fts5(self):
+        # As created by init_db when SQLite has no FTS5
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        for trigger in ("results_fts_insert", "results_fts_delete", "results_fts_update"):
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE results_fts")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self._names("mesecons"), ["mesecons", "technic"])
+        self.assertEqual(self._names("technic machines", mod_type="mod"), ["pipeworks"])
+        self.assertEqual(search_results("***"), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(fts_query('mese* OR "x" NEAR(a'), '"mese"* "OR"* "x"* "NEAR"* "a"*')
+        self.assertEqual(search_results("***"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Unit tests for enumerating the mods inside modpacks and games
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import db_utils
+from benchmarks.standins import Dataset, StandIns
+from git.canonical import canonicalize_repo_url
+from git.github_web import GitHubWeb
+from git.utils import check_luanti_mod_repository
+from mod_type_detector import RepoType, find_sub_content
+
+
+class TestFindSubContent(unittest.TestCase):
+
+    def test_game_tree(self):
+        paths = ["game.conf", "README.md", "mods/default/mod.conf", "mods/default/init.lua",
+                 "mods/default/textures/stone.png", "mods/default/sub/init.lua",
+                 "mods/legacy/init.lua", "mods/mesecons/modpack.conf", "mods/mesecons/wires/mod.conf",
+                 "mods/mesecons/wires/init.lua", "mods/old_pack/modpack.txt", "mods/old_pack/a/init.lua",
+                 "mods/empty/README.md", "tools/init.lua"]
+        self.assertEqual(find_sub_content(paths, RepoType.GAME), [
+            ("mods/default", "mod"), ("mods/legacy", "mod"), ("mods/mesecons", "modpack"),
+            ("mods/mesecons/wires", "mod"), ("mods/old_pack", "modpack"), ("mods/old_pack/a", "mod")])
+
+    def test_modpack_tree(self):
+        paths = ["modpack.conf", "a/mod.conf", "b/init.lua", "b/c/init.lua", "docs/index.md"]
+        self.assertEqual(find_sub_content(paths, RepoType.MODPACK), [("a", "mod"), ("b", "mod")])
+        self.assertEqual(find_sub_content([], RepoType.MODPACK), [])
+
+
+class TestGitHubTree(unittest.TestCase):
+
+    def test_truncated_tree_is_walked(self):
+        def entry(path, kind, sha=None):
+            return SimpleNamespace(path=path, type=kind, sha=sha)
+
+        trees = {"main": [entry("modpack.conf", "blob"), entry("a", "tree", "sha_a")],
+                 "sha_a": [entry("mod.conf", "blob"), entry("textures", "tree", "sha_t")],
+                 "sha_t": [entry("a.png", "blob")]}
+
+        def get_git_tree(sha, recursive=False):
+            if recursive:
+                return SimpleNamespace(truncated=True, tree=[entry("modpack.conf", "blob")])
+            return SimpleNamespace(truncated=False, tree=trees[sha])
+
+        git = GitHubWeb.__new__(GitHubWeb)
+        git.branch = "main"
+        git.repo_obj = MagicMock(get_git_tree=get_git_tree)
+        self.assertEqual(git.get_tree(), ["modpack.conf", "a/mod.conf", "a/textures/a.png"])
+
+
+class TestEnumerateContents(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_db_path = db_utils.DB_PATH
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "mod_list.db")
+        db_utils.init_db()
+
+    def tearDown(self):
+        db_utils.DB_PATH = self.original_db_path
+        shutil.rmtree(self.temp_dir)
+
+    def test_forges_and_relation_table(self):
+        dataset = Dataset(threads=3, packages=0, non_mods_every=0)
+        # Index 3 puts a modpack on GitHub (the dataset has it on GitLab)
+        github_url = dataset._add_repo(3, "modpack_3", "modpack")
+        urls = [github_url, "https://gitlab.com/bench/modpack_1", "https://codeberg.org/bench/game_2"]
+        with StandIns(dataset):
+            detected = [check_luanti_mod_repository(url, contents=True)[1] for url in urls]
+            mod_only = check_luanti_mod_repository("https://github.com/bench/mod_0", contents=True)[1]
+
+        self.assertNotIn("contents", mod_only)
+        self.assertEqual([child["path"] for child in detected[0]["contents"]], ["modpack_3_core", "modpack_3_extra"])
+        core, extra = detected[2]["contents"]
+        self.assertEqual((core["name"], core["path"], core["depends"]), ("game_2_core", "mods/game_2_core", ["default"]))
+        # No mod.conf: named after the directory, without another request
+        self.assertEqual((extra["name"], extra["type"]), ("game_2_extra", "mod"))
+
+        for url, metadata in zip(urls, detected):
+            db_utils.save_result({"repo_url": url, "name": metadata["name"], "type": metadata["type"]}, "git")
+            self.assertEqual(db_utils.save_contents(canonicalize_repo_url(url), metadata["contents"]), 2)
+        self.assertIsNone(db_utils.save_contents("https://github.com/unknown/repo", []))
+        containers = db_utils.find_containers("game_2_core")
+        self.assertEqual([(c["name"], c["type"], c["path"]) for c in containers],
+                         [("game_2", "game", "mods/game_2_core")])
+        contents = db_utils.get_contents(containers[0]["id"])
+        self.assertEqual(contents[0]["depends"], '["default"]')
+
+        # Saving again replaces the contents, deleting the result removes them
+        canonical_url = canonicalize_repo_url(urls[2])
+        db_utils.save_contents(canonical_url, detected[2]["contents"][:1])
+        self.assertEqual(len(db_utils.get_contents(containers[0]["id"])), 1)
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        conn.execute("DELETE FROM results WHERE canonical_url = ?", (canonical_url,))
+        conn.commit()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM contents").fetchone()[0], 4)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit tests for Chrome trace-event tracing
+"""
+import ast
+import inspect
+import unittest
+import tempfile
+import shutil
+import json
+import os
+
+import tracing
+import db_utils
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        tracing.disable()
+        shutil.rmtree(self.temp_dir)
+
+    def test_disabled_records_nothing(self):
+        with tracing.span("work"):
+            pass
+        self.assertEqual(tracing.events(), [])
+
+    def test_nested_spans_and_traced_functions(self):
+        @tracing.traced("test")
+        def inner():
+            return 42
+
+        tracing.enable()
+        with tracing.span("git_repo", "stage", url="https://github.com/a/b"):
+            self.assertEqual(inner(), 42)
+
+        inner_event, outer_event = tracing.events()
+        self.assertEqual(outer_event["name"], "git_repo")
+        self.assertEqual(outer_event["args"], {"url": "https://github.com/a/b"})
+        self.assertTrue(inner_event["name"].endswith("inner"))
+        self.assertEqual(inner_event["ph"], "X")
+        # The inner span lies within the outer one
+        self.assertGreaterEqual(inner_event["ts"], outer_event["ts"])
+        self.assertLessEqual(inner_event["ts"] + inner_event["dur"], outer_event["ts"] + outer_event["dur"])
+
+    def test_db_utils_calls_are_traced(self):
+        original_path = db_utils.GIT_QUEUE_DB
+        db_utils.GIT_QUEUE_DB = os.path.join(self.temp_dir, "test_git_queue.db")
+        try:
+            tracing.enable()
+            db_utils.init_git_work_queue()
+            db_utils.get_due_git_queue_items(1)
+        finally:
+            db_utils.GIT_QUEUE_DB = original_path
+
+        names = [event["name"] for event in tracing.events() if event["cat"] == "db"]
+        self.assertEqual(names, ["init_git_work_queue", "get_due_git_queue_items"])
+
+    def test_every_db_utils_connection_is_traced(self):
+        tree = ast.parse(inspect.getsource(db_utils))
+        functions = {node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)}
+
+        def calls(node):
+            return {ast.unparse(call.func) for call in ast.walk(node) if isinstance(call, ast.Call)}
+
+        # Functions opening a connection themselves or through a private helper
+        opening = {name for name, node in functions.items() if "sqlite3.connect" in calls(node)}
+        helpers = {name for name in opening if name.startswith("_")}
+        opening |= {name for name, node in functions.items() if calls(node) & helpers}
+        untraced = [name for name in sorted(opening) if not name.startswith("_")
+                    and not hasattr(getattr(db_utils, name), "__wrapped__")]
+        self.assertEqual(untraced, [])
+
+    def test_traced_generator_spans_iteration(self):
+        @tracing.traced("test")
+        def rows():
+            yield 1
+            yield 2
+
+        tracing.enable()
+        iterator = rows()
+        self.assertEqual(tracing.events(), [])
+        self.assertEqual(list(iterator), [1, 2])
+        self.assertEqual(len(tracing.events()), 1)
+
+    def test_write_chrome_trace(self):
+        tracing.enable()
+        with tracing.span("work"):
+            pass
+        path = os.path.join(self.temp_dir, "trace.json")
+        tracing.write(path)
+        with open(path, encoding="utf-8") as f:
+            trace = json.load(f)
+        self.assertEqual(trace["traceEvents"][0]["name"], "work")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Unit tests for work queue retry scheduling and dead-lettering
+"""
+import unittest
+import tempfile
+import shutil
+import os
+
+import requests
+
+import db_utils
+from db_utils import (init_all_databases, add_forum_thread_to_queue, get_unprocessed_forum_threads,
+                      record_forum_thread_failure, requeue_dead_forum_threads, get_forum_queue_status,
+                      add_to_git_queue, get_due_git_queue_items, record_git_queue_failure,
+                      mark_git_queue_item_processed, get_git_queue_status,
+                      QUEUE_PENDING, QUEUE_DEAD)
+from retry_policy import classify_error, retry_delay, TRANSIENT, PERMANENT, MAX_ATTEMPTS
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(response=response)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error(requests.exceptions.ConnectionError()), TRANSIENT)
+        self.assertEqual(classify_error(requests.exceptions.Timeout()), TRANSIENT)
+        self.assertEqual(classify_error(http_error(503)), TRANSIENT)
+        self.assertEqual(classify_error(http_error(429)), TRANSIENT)
+        self.assertEqual(classify_error(http_error(404)), PERMANENT)
+        self.assertEqual(classify_error(ValueError("bad conf")), PERMANENT)
+
+    def test_retry_delay_is_exponential_and_capped(self):
+        self.assertEqual(retry_delay(2), 2 * retry_delay(1))
+        self.assertEqual(retry_delay(3), 4 * retry_delay(1))
+        self.assertEqual(retry_delay(100), retry_delay(200))
+
+
+class TestWorkQueueRetry(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test databases in a temporary directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_paths = (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+                               db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB)
+        db_utils.DB_PATH = os.path.join(self.temp_dir, "test_mod_list.db")
+        db_utils.FORUM_QUEUE_DB = os.path.join(self.temp_dir, "test_forum_queue.db")
+        db_utils.GIT_QUEUE_DB = os.path.join(self.temp_dir, "test_git_queue.db")
+        db_utils.GIT_HOSTS_DB = os.path.join(self.temp_dir, "test_git_hosts.db")
+        db_utils.NON_MOD_REPOS_DB = os.path.join(self.temp_dir, "test_non_mod_repos.db")
+        init_all_databases()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        (db_utils.DB_PATH, db_utils.FORUM_QUEUE_DB, db_utils.GIT_QUEUE_DB,
+         db_utils.GIT_HOSTS_DB, db_utils.NON_MOD_REPOS_DB) = self.original_paths
+
+    def test_transient_failure_is_not_due(self):
+        """A transiently failed thread is skipped until its next attempt is due"""
+        add_forum_thread_to_queue("https://forum.luanti.org/viewtopic.php?t=1", "[Mod] A", "mod")
+        thread_id = get_unprocessed_forum_threads(10)[0][0]
+
+        state = record_forum_thread_failure(thread_id, requests.exceptions.Timeout("slow"))
+
+        self.assertEqual(state, QUEUE_PENDING)
+        self.assertEqual(get_unprocessed_forum_threads(10), [])
+        status = get_forum_queue_status()
+        self.assertEqual(status["waiting"], 1)
+        self.assertEqual(status["dead"], 0)
+
+    def test_permanent_failure_is_dead_lettered(self):
+        add_forum_thread_to_queue("https://forum.luanti.org/viewtopic.php?t=2", "[Mod] B", "mod")
+        thread_id = get_unprocessed_forum_threads(10)[0][0]
+
+        state = record_forum_thread_failure(thread_id, http_error(404))
+
+        self.assertEqual(state, QUEUE_DEAD)
+        self.assertEqual(get_forum_queue_status()["dead"], 1)
+
+        # Requeueing makes the thread due again
+        self.assertEqual(requeue_dead_forum_threads(), 1)
+        self.assertEqual(len(get_unprocessed_forum_threads(10)), 1)
+
+    def test_git_queue_dead_letters_after_max_attempts(self):
+        add_to_git_queue("https://github.com/user/repo", "search")
+        item_id = get_due_git_queue_items(10)[0][0]
+
+        states = [record_git_queue_failure(item_id, requests.exceptions.ConnectionError())
+                  for _ in range(MAX_ATTEMPTS)]
+
+        self.assertEqual(states[-1], QUEUE_DEAD)
+        self.assertTrue(all(state == QUEUE_PENDING for state in states[:-1]))
+        self.assertEqual(get_git_queue_status()["dead"], 1)
+
+    def test_git_queue_processed_item(self):
+        add_to_git_queue("https://github.com/user/repo", "search")
+        item_id = get_due_git_queue_items(10)[0][0]
+        mark_git_queue_item_processed(item_id)
+
+        self.assertEqual(get_due_git_queue_items(10), [])
+        self.assertEqual(get_git_queue_status()["processed"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
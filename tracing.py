@@ -0,0 +1,116 @@
+"""
+Lightweight tracing in Chrome trace-event format.
+
+Spans are recorded only after enable() is called; otherwise span() and
+traced() cost a flag check. write() produces a JSON file that can be loaded
+into chrome://tracing or https://ui.perfetto.dev to see where the time of each
+queue item went (host probing, API calls, conf fetches, SQLite).
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import http_client
+
+_enabled = False
+_events = []
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+def enable():
+    """Start recording spans (and HTTP requests) from now on"""
+    global _enabled
+    _enabled = True
+    http_client.add_middleware(http_middleware)
+
+
+def disable():
+    """Stop recording and drop recorded spans"""
+    global _enabled
+    _enabled = False
+    http_client.remove_middleware(http_middleware)
+    with _lock:
+        _events.clear()
+
+
+def is_enabled():
+    return _enabled
+
+
+def _now_us():
+    return (time.perf_counter() - _origin) * 1e6
+
+
+@contextmanager
+def span(name, category="app", **args):
+    """Record the duration of the enclosed block as a complete ("X") event"""
+    if not _enabled:
+        yield
+        return
+    start = _now_us()
+    try:
+        yield
+    finally:
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start,
+            "dur": _now_us() - start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with _lock:
+            _events.append(event)
+
+
+def traced(category="app", name=None):
+    """
+    Decorator recording a span for every call of the function; the span of a
+    generator function covers its iteration
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return (yield from func(*args, **kwargs))
+                with span(span_name, category):
+                    return (yield from func(*args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def http_middleware(send, request, **kwargs):
+    """Shared HTTP layer middleware recording a span per request"""
+    with span(f"{request.method} {http_client.host_of(request.url)}", "http", url=request.url):
+        return send(request, **kwargs)
+
+
+def events():
+    """Return a copy of the recorded events"""
+    with _lock:
+        return list(_events)
+
+
+def write(path):
+    """Write the recorded spans as a Chrome trace-event JSON file"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events(), "displayTimeUnit": "ms"}, f)
@@ -4,13 +4,36 @@ Work Queue Manager - Utility script for managing forum and git work queues
 import argparse
 import sys
 from db_utils import (
-    init_all_databases, get_unprocessed_forum_threads, get_unprocessed_git_repos,
+    init_all_databases, get_unprocessed_forum_threads,
     mark_forum_thread_processed, mark_git_repo_processed, 
-    get_git_hosts, is_known_non_mod_repo, save_result
+    get_git_hosts, is_known_non_mod_repo, save_result,
+    get_forum_queue_status, get_git_queue_status, get_due_git_queue_items,
+    requeue_dead_forum_threads, requeue_dead_git_queue_items,
+    age_git_queue_priorities, bump_git_queue_priorities,
+    load_non_mod_repo_cache, purge_expired_non_mod_repos, search_results, find_containers,
+    get_mod_count, get_entity_count
 )
 from forum.search import process_forum_work_queue, fetch_forum_thread_list
 from git.utils import check_luanti_mod_repository, get_repository_info
 from git.search import process_git_work_queue
+from recrawl import run_recrawl, DEFAULT_BUDGET
+from reprocess import run_reprocess, DEFAULT_WORKERS
+from dependency_graph import DependencyGraph
+import linkage
+import export
+import metrics
+import tracing
+import profiling
+import replay
+
+def export_metrics():
+    """Update queue depth gauges and write the metrics files, if configured"""
+    if not metrics.export_enabled():
+        return
+    for queue, status in (("forum", get_forum_queue_status()), ("git", get_git_queue_status())):
+        for state, count in status.items():
+            metrics.set_gauge("queue_depth", count, queue=queue, state=state)
+    metrics.export()
 
 def show_queue_status():
     """Show current status of work queues"""
@@ -28,9 +51,14 @@ def show_queue_status():
         for thread_type, count in thread_types.items():
             print(f"  - {thread_type}: {count} threads")
     
+    forum_status = get_forum_queue_status()
+    print(f"Forum threads waiting for retry: {forum_status['waiting']}")
+    print(f"Forum threads dead-lettered: {forum_status['dead']}")
+    
     # Git queue status
-    git_repos = get_unprocessed_git_repos(1000)  # Get up to 1000 to count
-    print(f"Git repositories pending: {len(git_repos)}")
+    git_status = get_git_queue_status()
+    print(f"Git work queue: {git_status['pending']} due, {git_status['waiting']} waiting for retry, "
+          f"{git_status['processed']} processed, {git_status['dead']} dead-lettered")
     
     # Git hosts discovered
     git_hosts = get_git_hosts()
@@ -66,15 +94,13 @@ def process_forum_queue(batch_size=10, max_batches=None):
         
         successful_results = [r for r in results if r.get("status") == "success"]
         error_results = [r for r in results if r.get("status") == "error"]
-        total_mods_found = sum(r.get("luanti_mods_found", 0) for r in successful_results)
         total_git_repos = sum(r.get("git_repos_found", 0) for r in successful_results)
         
         print(f"Batch {batch_count}:")
         print(f"  - Processed: {len(results)} threads")
         print(f"  - Successful: {len(successful_results)}")
         print(f"  - Errors: {len(error_results)}")
-        print(f"  - Git repos found: {total_git_repos}")
-        print(f"  - Luanti mods found: {total_mods_found}")
+        print(f"  - Git repos found (queued for validation): {total_git_repos}")
         
         if error_results:
             print("  - Errors:")
@@ -82,6 +108,7 @@ def process_forum_queue(batch_size=10, max_batches=None):
                 print(f"    * {error_result.get('title', 'Unknown')}: {error_result.get('message', 'Unknown error')}")
         
         print()
+        export_metrics()
     
     print(f"Total threads processed: {total_processed}")
 
@@ -89,6 +116,10 @@ def process_git_queue(batch_size=10, max_batches=None):
     """Process git repository work queue using the new modular system"""
     print(f"=== Processing Git Repository Queue (batch size: {batch_size}) ===")
     
+    aged = age_git_queue_priorities()
+    if aged:
+        print(f"Raised priority of {aged} long-waiting repositories")
+    
     batch_count = 0
     
     while True:
@@ -99,9 +130,10 @@ def process_git_queue(batch_size=10, max_batches=None):
         # Use the new modular git search system
         process_git_work_queue(batch_size)
         batch_count += 1
+        export_metrics()
         
-        # Check if there are more repositories to process
-        remaining_repos = get_unprocessed_git_repos(1)
+        # Check if there are more repositories due for processing
+        remaining_repos = get_due_git_queue_items(1)
         if not remaining_repos:
             print("No more repositories to process")
             break
@@ -110,12 +142,12 @@ def process_git_queue(batch_size=10, max_batches=None):
     
     print(f"Processed {batch_count} batches")
 
-def refresh_forum_threads():
-    """Refresh forum thread lists"""
+def refresh_forum_threads(resume=False):
+    """Refresh forum thread lists, optionally continuing an interrupted refresh"""
     print("=== Refreshing Forum Thread Lists ===")
     
     forums = [
-        ("https://forum.luanti.org/viewforum.php?f=11", "Mod Releases", ["[mod]", "[modpack]"]),
+        ("https://forum.luanti.org/viewforum.php?f=11", "Mod Releases", ["[mod]", "[mod pack]", "[modpack]"]),
         ("https://forum.luanti.org/viewforum.php?f=15", "Games", ["[game]"]),
     ]
     
@@ -123,34 +155,211 @@ def refresh_forum_threads():
     
     for forum_url, forum_name, thread_types in forums:
         print(f"Fetching from {forum_name} forum...")
-        added_threads = fetch_forum_thread_list(forum_url, thread_types)
+        added_threads = fetch_forum_thread_list(forum_url, thread_types, resume=resume)
         print(f"  Added {len(added_threads)} new threads to queue")
         total_added += len(added_threads)
     
     print(f"Total new threads added: {total_added}")
 
+def requeue_dead_items():
+    """Move dead-lettered items back into the work queues"""
+    print("=== Requeueing Dead-Lettered Items ===")
+    print(f"Forum threads requeued: {requeue_dead_forum_threads()}")
+    print(f"Git repositories requeued: {requeue_dead_git_queue_items()}")
+
+def bump_priorities(delta, source=None):
+    """Adjust the priority of pending git repositories in bulk"""
+    count = bump_git_queue_priorities(delta, source_prefix=source)
+    print(f"Changed priority of {count} git repositories by {delta:+d}")
+
+def recrawl_items(budget):
+    """Revisit processed items whose next check is due"""
+    print(f"=== Recrawling Known Items (budget: {budget}) ===")
+    stats = run_recrawl(budget)
+    print(f"Checked: {stats['checked']}")
+    print(f"Changed (requeued): {stats['changed']}")
+    print(f"Errors (postponed): {stats['errors']}")
+
+def reprocess_archive(directory, workers):
+    """Re-run extraction and detection on archived responses"""
+    print(f"=== Reprocessing Archive {directory} (workers: {workers}) ===")
+    stats = run_reprocess(directory, workers)
+    print(f"Forum threads: {stats['forum_threads']}")
+    print(f"Repositories: {stats['repos']}")
+    print(f"Luanti mods (results updated): {stats['mods']}")
+    print(f"Missing from archive: {stats['missing']}")
+
+def search_mods(terms, mod_type=None, source=None, license=None, limit=20):
+    """Full-text search over the discovered mods"""
+    results = search_results(" ".join(terms), mod_type, source, license, limit)
+    if not results:
+        print("No matches")
+        return
+    for result in results:
+        url = result["contentdb_url"] or result["repo_url"] or result["forum_url"]
+        print(f"{result['title'] or result['name']} [{result['type']}, {result['source']}] {url}")
+        print(f"    {result['snippet']}")
+
+def show_dependencies(mods):
+    """Show what mods pull in and which mods need them"""
+    graph = DependencyGraph.from_database()
+    for mod in mods:
+        if mod not in graph:
+            print(f"{mod}: unknown")
+            continue
+        print(f"=== {mod} ===")
+        print(f"Depends on: {', '.join(graph.closure(mod)) or '-'}")
+        print(f"Optionally pulls in: {', '.join(set(graph.closure(mod, optional=True)) - set(graph.closure(mod))) or '-'}")
+        print(f"Needed by: {', '.join(graph.reverse_dependencies(mod, transitive=True)) or '-'}")
+        cycle = graph.find_cycle(mod)
+        if cycle:
+            print(f"Dependency cycle: {' -> '.join(cycle)}")
+
+def show_containers(mods):
+    """Show which modpacks and games contain the given mods"""
+    for mod in mods:
+        containers = find_containers(mod)
+        if not containers:
+            print(f"{mod}: not contained in any known modpack or game")
+            continue
+        print(f"=== {mod} ===")
+        for container in containers:
+            print(f"{container['title'] or container['name']} [{container['type']}] {container['repo_url']} "
+                  f"({container['path']})")
+
+def link_results(full=False):
+    """Merge the results rows describing the same mod into entities"""
+    print(f"=== Linking Results ({'all' if full else 'new and changed'}) ===")
+    stats = linkage.link(full=full)
+    print(f"Results linked: {stats['results']}")
+    print(f"Candidate pairs: {stats['pairs']} ({stats['matches']} matched, "
+          f"{stats['skipped_blocks']} oversized blocks skipped)")
+    print(f"New entities: {stats['new_entities']}, entities merged: {stats['merged']}")
+    print(f"Total: {get_mod_count()} results in {get_entity_count()} entities")
+
+def export_mods(output, fmt, columns, mod_type=None, source=None, license=None, since=None, watermark_file=None):
+    """Stream the results to a file (or stdout), optionally only rows changed since the last export"""
+    if since is None:
+        since = export.read_watermark(watermark_file) if watermark_file else 0
+    count, revision = export.export_results(output, fmt, export.parse_columns(columns), mod_type, source, license,
+                                            since)
+    if watermark_file:
+        export.write_watermark(watermark_file, revision)
+    # Keep stdout clean when the export itself goes there
+    print(f"Exported {count} results (revisions {since}-{revision})",
+          file=sys.stderr if output in (None, "-") else sys.stdout)
+
 def main():
     parser = argparse.ArgumentParser(description="Luanti Mod Search Work Queue Manager")
-    parser.add_argument("action", choices=["status", "process-forum", "process-git", "refresh-forum"],
+    parser.add_argument("action", choices=["status", "process-forum", "process-git", "refresh-forum",
+                                           "requeue-dead", "bump-priority", "recrawl", "reprocess", "search", "deps",
+                                           "contains", "export", "link"],
                        help="Action to perform")
+    parser.add_argument("terms", nargs="*",
+                       help="Search terms for search (words are matched as prefixes), mod names for deps and contains")
     parser.add_argument("--batch-size", type=int, default=10,
                        help="Number of items to process in each batch (default: 10)")
     parser.add_argument("--max-batches", type=int,
                        help="Maximum number of batches to process")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET,
+                       help=f"Maximum number of revisits for recrawl (default: {DEFAULT_BUDGET})")
+    parser.add_argument("--delta", type=int, default=1,
+                       help="Priority change for bump-priority (default: 1)")
+    parser.add_argument("--source",
+                       help="Only bump git repositories / search or export results whose source starts with this "
+                            "(e.g. forum)")
+    parser.add_argument("--type", dest="mod_type",
+                       help="Only search or export results of this type (mod, modpack, game, ...)")
+    parser.add_argument("--license",
+                       help="Only search or export results with this license")
+    parser.add_argument("--limit", type=int, default=20,
+                       help="Maximum number of search results (default: 20)")
+    parser.add_argument("--format", choices=export.FORMATS, default="jsonl",
+                       help="Export format (default: jsonl; parquet requires pyarrow)")
+    parser.add_argument("--columns",
+                       help="Comma-separated columns to export (default: all but canonical_url)")
+    parser.add_argument("--output", "-o",
+                       help="Export file (default: stdout)")
+    parser.add_argument("--since", type=int,
+                       help="Only export results changed after this revision")
+    parser.add_argument("--watermark-file",
+                       help="Export only results changed since the revision stored in this file, then advance it")
+    parser.add_argument("--resume", action="store_true",
+                       help="refresh-forum: continue at the page an interrupted refresh stopped at")
+    parser.add_argument("--full", action="store_true",
+                       help="link: forget the existing entities and link all results again")
+    parser.add_argument("--metrics-file",
+                       help="Write metrics in Prometheus text format to this file")
+    parser.add_argument("--metrics-json",
+                       help="Write a JSON metrics snapshot to this file")
+    parser.add_argument("--trace", metavar="OUT_JSON",
+                       help="Write spans in Chrome trace-event format to this file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                       help=f"Worker processes for reprocess (default: {DEFAULT_WORKERS})")
+    replay.add_replay_arguments(parser, "Store all fetched responses in this archive (for reprocess: read from it)")
+    profiling.add_profile_arguments(parser)
     
     args = parser.parse_args()
+    if args.action == "reprocess" and not args.archive:
+        parser.error("reprocess requires --archive DIR")
+    if args.action in ("search", "deps", "contains") and not args.terms:
+        parser.error(f"{args.action} requires search terms or mod names")
+    if args.action == "export":
+        if args.format == "parquet" and args.output in (None, "-"):
+            parser.error("parquet export requires --output FILE")
+        if args.format == "parquet" and not export.parquet_available():
+            parser.error("parquet export requires pyarrow (pip install pyarrow)")
+        try:
+            export.parse_columns(args.columns)
+        except ValueError as e:
+            parser.error(str(e))
+    metrics.configure_export(args.metrics_file, args.metrics_json)
+    if args.trace:
+        tracing.enable()
+    # reprocess reads the archive instead of adding to it
+    replay.configure(args.archive if args.action != "reprocess" else None, args.replay, args.replay_latency)
     
     # Initialize database
     init_all_databases()
     
-    if args.action == "status":
-        show_queue_status()
-    elif args.action == "process-forum":
-        process_forum_queue(args.batch_size, args.max_batches)
-    elif args.action == "process-git":
-        process_git_queue(args.batch_size, args.max_batches)
-    elif args.action == "refresh-forum":
-        refresh_forum_threads()
+    # Load the negative cache so known non-mod repos cost no requests
+    purge_expired_non_mod_repos()
+    load_non_mod_repo_cache()
+    
+    with profiling.profile(args.profile, args.profile_output):
+        try:
+            if args.action == "status":
+                show_queue_status()
+            elif args.action == "process-forum":
+                process_forum_queue(args.batch_size, args.max_batches)
+            elif args.action == "process-git":
+                process_git_queue(args.batch_size, args.max_batches)
+            elif args.action == "refresh-forum":
+                refresh_forum_threads(args.resume)
+            elif args.action == "requeue-dead":
+                requeue_dead_items()
+            elif args.action == "bump-priority":
+                bump_priorities(args.delta, args.source)
+            elif args.action == "recrawl":
+                recrawl_items(args.budget)
+            elif args.action == "reprocess":
+                reprocess_archive(args.archive, args.workers)
+            elif args.action == "search":
+                search_mods(args.terms, args.mod_type, args.source, args.license, args.limit)
+            elif args.action == "deps":
+                show_dependencies(args.terms)
+            elif args.action == "contains":
+                show_containers(args.terms)
+            elif args.action == "export":
+                export_mods(args.output, args.format, args.columns, args.mod_type, args.source, args.license,
+                            args.since, args.watermark_file)
+            elif args.action == "link":
+                link_results(args.full)
+        finally:
+            export_metrics()
+            if args.trace:
+                tracing.write(args.trace)
+                print(f"Trace written to {args.trace}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()